@@ -0,0 +1,313 @@
+"""
+Load harness for the rule API.
+
+Runs main.app in-process (ASGI transport) or under uvicorn on a local port, with
+the Mongo collections replaced by the in-memory stand-in (or the rules kept in an
+in-memory SQLite store with --store sqlite), and drives a weighted
+mix of create / evaluate / combine / fetch calls from concurrent asyncio workers.
+Reports throughput and p50/p95/p99 latency per endpoint, and exits non-zero when
+a threshold is missed so it can gate regressions.
+
+    cd backend
+    python -m benchmarks.load --requests 5000 --concurrency 32 \\
+        --mix evaluate=8,fetch=2,create=1,combine=1 --max-p99 evaluate=25
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import sys
+import time
+from collections import defaultdict
+from typing import List, Dict, Optional, Any, Tuple
+
+import httpx
+
+from main import app
+from database import get_rules_collection, get_database, get_rule_store
+from storage.rule_store import as_rule_store
+from storage.sqlite_store import SQLiteRuleStore
+from testing.memory_collection import MemoryDatabase
+
+RULE_TEMPLATES = [
+    "age > {age} AND department = '{department}'",
+    "(age < {age} AND department = '{department}') OR salary > {salary}",
+    "department IN ['Sales', 'HR', '{department}'] AND experience >= {experience}",
+    "((age > {age} AND department = '{department}') OR (age < 25 AND department = 'Marketing')) "
+    "AND (salary > {salary} OR experience > {experience})"
+]
+DEPARTMENTS = ["Sales", "Marketing", "HR", "IT", "Finance"]
+DEFAULT_MIX = {"evaluate": 8, "fetch": 2, "create": 1, "combine": 1}
+STARTUP_TIMEOUT = 10.0
+# Dependencies use_memory_database overrides
+HARNESS_OVERRIDES = (get_rules_collection, get_database, get_rule_store)
+
+
+def random_rule(rng: random.Random) -> str:
+    return rng.choice(RULE_TEMPLATES).format(
+        age=rng.randint(20, 50),
+        department=rng.choice(DEPARTMENTS),
+        salary=rng.randint(20, 90) * 1000,
+        experience=rng.randint(0, 10)
+    )
+
+
+def random_record(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "age": rng.randint(18, 65),
+        "department": rng.choice(DEPARTMENTS),
+        "salary": rng.randint(10, 120) * 1000,
+        "experience": rng.randint(0, 20)
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class LoadRun:
+    def __init__(self, client: httpx.AsyncClient, mix: Dict[str, int], seed: int):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.rule_ids: List[str] = []
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def _call(self, endpoint: str, method: str, url: str, **kwargs: Any) -> Optional[Dict]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.latencies[endpoint].append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[endpoint] += 1
+            return None
+        return response.json()
+
+    async def create(self) -> None:
+        result = await self._call("create", "POST", "/api/v1/create/?ast=none", json={
+            "name": "load rule",
+            "rule_string": random_rule(self.rng)
+        })
+        if result:
+            self.rule_ids.append(result["id"])
+
+    async def evaluate(self) -> None:
+        await self._call("evaluate", "POST", "/api/v1/evaluate/", json={
+            "rule_id": self.rng.choice(self.rule_ids),
+            "data": random_record(self.rng)
+        })
+
+    async def combine(self) -> None:
+        result = await self._call("combine", "POST", "/api/v1/combine/?ast=none", json={
+            "rule_ids": self.rng.sample(self.rule_ids, self.rng.randint(2, 3)),
+            "name": "load combined rule",
+            "operator": self.rng.choice(["AND", "OR"])
+        })
+        if result:
+            self.rule_ids.append(result["id"])
+
+    async def fetch(self) -> None:
+        pages = max(1, len(self.rule_ids) // 10)
+        await self._call("fetch", "GET", f"/api/v1/fetch/?page={self.rng.randint(1, pages)}&limit=10")
+
+    async def seed_rules(self, count: int) -> None:
+        for _ in range(count):
+            await self.create()
+        self.latencies.clear()
+        self.errors.clear()
+
+    async def run(self, requests: int, concurrency: int) -> float:
+        """Issue requests from concurrent workers, returning elapsed seconds"""
+        remaining = requests
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                operation = self.rng.choices(self.operations, self.weights)[0]
+                await getattr(self, operation)()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            endpoints[endpoint] = {
+                "requests": len(ordered),
+                "errors": self.errors[endpoint],
+                "throughput": len(ordered) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(ordered, 0.50),
+                "p95_ms": percentile(ordered, 0.95),
+                "p99_ms": percentile(ordered, 0.99),
+                "max_ms": ordered[-1]
+            }
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        return {
+            "elapsed_seconds": elapsed,
+            "requests": total,
+            "throughput": total / elapsed if elapsed else 0.0,
+            "errors": sum(self.errors.values()),
+            "endpoints": endpoints
+        }
+
+
+def use_memory_database(store: str = "memory") -> MemoryDatabase:
+    """Point the app's collection dependencies at a fresh in-memory database"""
+    database = MemoryDatabase()
+    app.dependency_overrides[get_rules_collection] = lambda: database["rules"]
+    app.dependency_overrides[get_database] = lambda: database
+    rule_store = SQLiteRuleStore(":memory:") if store == "sqlite" else as_rule_store(database["rules"])
+    app.dependency_overrides[get_rule_store] = lambda: rule_store
+    return database
+
+
+async def _serve_uvicorn(timeout: float = STARTUP_TIMEOUT) -> Tuple[Any, asyncio.Task, str]:
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    deadline = time.monotonic() + timeout
+    while not server.started:
+        if task.done():
+            # serve() returns without starting when e.g. the port is taken
+            await task
+            raise RuntimeError("uvicorn exited before starting")
+        if time.monotonic() > deadline:
+            server.should_exit = True
+            await task
+            raise RuntimeError(f"uvicorn didn't start within {timeout}s")
+        await asyncio.sleep(0.01)
+    return server, task, f"http://127.0.0.1:{port}"
+
+
+async def run_load(
+    requests: int = 2000,
+    concurrency: int = 16,
+    mix: Optional[Dict[str, int]] = None,
+    seed_rules: int = 20,
+    seed: int = 0,
+    uvicorn: bool = False,
+    store: str = "memory"
+) -> Dict[str, Any]:
+    """Run one load test against the app backed by the in-memory database"""
+    # Only the harness's own overrides are undone afterwards, as they were before the run
+    saved = {key: app.dependency_overrides[key] for key in HARNESS_OVERRIDES if key in app.dependency_overrides}
+    use_memory_database(store)
+    server = task = None
+    try:
+        if uvicorn:
+            server, task, base_url = await _serve_uvicorn()
+            transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=concurrency))
+        else:
+            base_url = "http://loadtest"
+            transport = httpx.ASGITransport(app=app)
+
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30) as client:
+            load = LoadRun(client, mix or DEFAULT_MIX, seed)
+            await load.seed_rules(max(seed_rules, 3))
+            elapsed = await load.run(requests, concurrency)
+            return load.report(elapsed)
+    finally:
+        if server:
+            server.should_exit = True
+            await task
+        for key in HARNESS_OVERRIDES:
+            if key in saved:
+                app.dependency_overrides[key] = saved[key]
+            else:
+                app.dependency_overrides.pop(key, None)
+
+
+def check_thresholds(
+    report: Dict[str, Any],
+    max_p99: Dict[str, float],
+    min_throughput: Optional[float],
+    max_error_rate: float
+) -> List[str]:
+    """Threshold violations, empty when the run passes"""
+    failures = []
+    for endpoint, limit in max_p99.items():
+        stats = report["endpoints"].get(endpoint)
+        if stats and stats["p99_ms"] > limit:
+            failures.append(f"{endpoint} p99 {stats['p99_ms']:.2f}ms > {limit}ms")
+    if min_throughput is not None and report["throughput"] < min_throughput:
+        failures.append(f"throughput {report['throughput']:.1f}/s < {min_throughput}/s")
+    if report["requests"] and report["errors"] / report["requests"] > max_error_rate:
+        failures.append(f"error rate {report['errors'] / report['requests']:.2%} > {max_error_rate:.2%}")
+    return failures
+
+
+def _parse_pairs(value: str) -> Dict[str, float]:
+    pairs = {}
+    for item in filter(None, value.split(",")):
+        name, _, number = item.partition("=")
+        pairs[name.strip()] = float(number)
+    return pairs
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default="evaluate=8,fetch=2,create=1,combine=1",
+                        help="operation weights, e.g. evaluate=8,fetch=2")
+    parser.add_argument("--seed-rules", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--uvicorn", action="store_true", help="serve over HTTP with uvicorn")
+    parser.add_argument("--store", choices=["memory", "sqlite"], default="memory",
+                        help="keep rules in the in-memory collection or an in-memory SQLite store")
+    parser.add_argument("--max-p99", default="", help="per-endpoint p99 limits in ms, e.g. evaluate=25")
+    parser.add_argument("--min-throughput", type=float, default=None, help="requests per second")
+    parser.add_argument("--max-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    mix = {name: int(weight) for name, weight in _parse_pairs(args.mix).items() if weight > 0}
+    report = asyncio.run(run_load(
+        requests=args.requests,
+        concurrency=args.concurrency,
+        mix=mix,
+        seed_rules=args.seed_rules,
+        seed=args.seed,
+        uvicorn=args.uvicorn,
+        store=args.store
+    ))
+
+    print(f"{'endpoint':<10} {'requests':>9} {'errors':>7} {'req/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:<10} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput']:>9.1f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+    print(f"total {report['requests']} requests in {report['elapsed_seconds']:.2f}s, "
+          f"{report['throughput']:.1f} req/s")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = check_thresholds(report, _parse_pairs(args.max_p99), args.min_throughput, args.max_error_rate)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
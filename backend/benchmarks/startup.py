@@ -0,0 +1,119 @@
+"""
+Startup-time benchmark for the API worker.
+
+Imports main in fresh interpreters under `python -X importtime` and reports the
+cumulative import time of the app, the wall time of the whole process and the
+heaviest of its direct imports. It fails when the median import time exceeds the
+budget, or when a module that is meant to load on first use (the Mongo driver,
+uvicorn, dotenv) is imported at startup, so new workers keep accepting traffic
+quickly.
+
+    cd backend
+    python -m benchmarks.startup --runs 5 --budget-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Dict, Optional, Any
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded on first request or only by the CLI entry point, never by importing the app
+DEFERRED = ("motor", "pymongo", "uvicorn", "dotenv")
+
+
+def import_profile(module: str = "main") -> Dict[str, Any]:
+    """Import module in a fresh interpreter, returning its import timings"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    wall = (time.perf_counter() - started) * 1000
+
+    # Lines are "import time: self | cumulative | <2 spaces per level>package", a
+    # package listed after the imports it triggered
+    cumulative: Dict[str, int] = {}
+    direct: Dict[str, int] = {}
+    pending: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, total, name = line.split("|")
+        package = name.strip()
+        cumulative[package] = int(total)
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level == 1:
+            pending[package] = int(total)
+        elif level == 0:
+            if package == module:
+                direct = pending
+            pending = {}
+    return {
+        "wall_ms": wall,
+        "import_ms": cumulative.get(module, 0) / 1000,
+        "modules": list(cumulative),
+        "direct_ms": {package: total / 1000 for package, total in direct.items()}
+    }
+
+
+def measure_startup(runs: int = 5, module: str = "main", top: int = 10) -> Dict[str, Any]:
+    """Median timings over runs fresh imports, with the slowest imports of the last one"""
+    profiles = [import_profile(module) for _ in range(runs)]
+    last = profiles[-1]
+    heaviest = sorted(last["direct_ms"].items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "runs": runs,
+        "import_ms": statistics.median(profile["import_ms"] for profile in profiles),
+        "wall_ms": statistics.median(profile["wall_ms"] for profile in profiles),
+        "heaviest": dict(heaviest),
+        "eager": sorted({
+            name for name in last["modules"] if name.split(".")[0] in DEFERRED
+        })
+    }
+
+
+def check_budget(report: Dict[str, Any], budget_ms: Optional[float]) -> List[str]:
+    """Budget violations, empty when startup passes"""
+    failures = []
+    if budget_ms is not None and report["import_ms"] > budget_ms:
+        failures.append(f"import time {report['import_ms']:.1f}ms > {budget_ms}ms")
+    if report["eager"]:
+        failures.append(f"imported at startup: {', '.join(report['eager'])}")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=10, help="heaviest direct imports of the module to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="median import time limit")
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = measure_startup(args.runs, args.module, args.top)
+    print(f"import {args.module}: {report['import_ms']:.1f}ms, process {report['wall_ms']:.1f}ms "
+          f"(median of {report['runs']})")
+    for package, elapsed in report["heaviest"].items():
+        print(f"  {package:<40} {elapsed:>8.1f}ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = check_budget(report, args.budget_ms)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,102 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
 import os
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, FrozenSet, NamedTuple, Optional, TYPE_CHECKING
+from fastapi import FastAPI
 
-load_dotenv()
+from storage.rule_store import RuleStore, as_rule_store
 
-# Reading the environment variables
-MONGODB_URL = os.getenv('MONGODB_URL')
-DATABASE_NAME = os.getenv('DATABASE_NAME')
-COLLECTION_NAME = os.getenv('COLLECTION_NAME')
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
 
-# Create MongoDB client
-client = AsyncIOMotorClient(MONGODB_URL)
-database = client[DATABASE_NAME]
 
-async def get_rules_collection():
+class Settings(NamedTuple):
+    mongodb_url: Optional[str]
+    database_name: Optional[str]
+    collection_name: Optional[str]
+    # "mongo" or "sqlite", the SQLite store keeps rules in a local file
+    rule_store: str
+    sqlite_path: str
+    # Collections that matching and jobs may name, none when unset
+    scored_collections: FrozenSet[str]
+    # Admission control of the evaluation endpoints, queue targets in seconds
+    admission_max_concurrency: int
+    admission_max_queue: int
+    admission_queue_target: float
+    admission_batch_queue_target: float
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Read the environment variables, and the .env file, once on first use"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return Settings(
+        mongodb_url=os.getenv('MONGODB_URL'),
+        database_name=os.getenv('DATABASE_NAME'),
+        collection_name=os.getenv('COLLECTION_NAME'),
+        rule_store=os.getenv('RULE_STORE', 'mongo'),
+        sqlite_path=os.getenv('SQLITE_PATH', 'rules.db'),
+        scored_collections=frozenset(
+            name.strip() for name in os.getenv('SCORED_COLLECTIONS', '').split(',') if name.strip()
+        ),
+        admission_max_concurrency=int(os.getenv('ADMISSION_MAX_CONCURRENCY', '64')),
+        admission_max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', '256')),
+        admission_queue_target=float(os.getenv('ADMISSION_QUEUE_TARGET_MS', '50')) / 1000,
+        admission_batch_queue_target=float(os.getenv('ADMISSION_BATCH_QUEUE_TARGET_MS', '500')) / 1000
+    )
+
+
+# Built on first use, importing the app neither loads Motor nor starts its monitor threads
+_client: Optional['AsyncIOMotorClient'] = None
+_sqlite_store = None
+
+def get_client() -> 'AsyncIOMotorClient':
+    """MongoDB client of this worker"""
+    global _client
+    if _client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        _client = AsyncIOMotorClient(get_settings().mongodb_url)
+    return _client
+
+def close_clients() -> None:
+    """Close the client and the SQLite store if this worker opened them"""
+    global _client, _sqlite_store
+    if _client is not None:
+        _client.close()
+        _client = None
+    if _sqlite_store is not None:
+        _sqlite_store.close()
+        _sqlite_store = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """App lifespan, the worker accepts requests at once and closes its clients on shutdown"""
+    try:
+        yield
+    finally:
+        close_clients()
+
+async def get_rules_collection() -> 'AsyncIOMotorCollection':
     """Dependency to get the rules collection"""
-    return database[COLLECTION_NAME]
\ No newline at end of file
+    return (await get_database())[get_settings().collection_name]
+
+async def get_database() -> 'AsyncIOMotorDatabase':
+    """Dependency to get the database holding rules and scored collections"""
+    return get_client()[get_settings().database_name]
+
+async def get_scored_collections() -> FrozenSet[str]:
+    """Dependency to get the collections matching and jobs may use, never the rules collection"""
+    settings = get_settings()
+    return settings.scored_collections - {settings.collection_name}
+
+async def get_rule_store() -> RuleStore:
+    """Dependency to get the configured rule store, the SQLite store needs no Mongo settings"""
+    global _sqlite_store
+    settings = get_settings()
+    if settings.rule_store == 'sqlite':
+        if _sqlite_store is None:
+            from storage.sqlite_store import SQLiteRuleStore
+            _sqlite_store = SQLiteRuleStore(settings.sqlite_path)
+        return _sqlite_store
+    return as_rule_store(await get_rules_collection())
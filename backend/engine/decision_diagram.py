@@ -0,0 +1,196 @@
+import sys
+from typing import List, Dict, Any, Callable, Tuple
+from models.rule_models import Node, NodeType, Operator
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+# Terminal node ids
+FALSE = 0
+TRUE = 1
+TERMINAL_VAR = sys.maxsize
+
+DEFAULT_MAX_NODES = 10000
+# Largest diagram a client may ask for, building one costs time and memory per node
+MAX_NODES_LIMIT = 100000
+
+
+def ast_size(node: Node) -> int:
+    """Count the nodes of an AST, operands included"""
+    count = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        count += 1
+        if current.left:
+            stack.append(current.left)
+        if current.right:
+            stack.append(current.right)
+    return count
+
+
+class DiagramTooLarge(Exception):
+    """Raised when a decision diagram grows past its node budget"""
+    pass
+
+
+class DecisionDiagram:
+    """
+    Reduced ordered binary decision diagram over the distinct comparisons of an AST.
+    Every path from the root tests a comparison at most once, so each predicate is
+    evaluated at most once per record.
+    """
+
+    def __init__(self, predicates: List[Predicate], max_nodes: int = DEFAULT_MAX_NODES):
+        self.predicates = predicates
+        self.max_nodes = max_nodes
+        # Terminals sort after every variable
+        self._var = [TERMINAL_VAR, TERMINAL_VAR]
+        self._low = [FALSE, TRUE]
+        self._high = [FALSE, TRUE]
+        self._unique: Dict[Tuple[int, int, int], int] = {}
+        self._apply_memo: Dict[Tuple[Operator, int, int], int] = {}
+        self.root = FALSE
+        self.ast_nodes = 0
+
+    @classmethod
+    def build(
+        cls,
+        node: Node,
+        compile_predicate: Callable[[Node], Predicate],
+        max_nodes: int = DEFAULT_MAX_NODES
+    ) -> 'DecisionDiagram':
+        """
+        Build the diagram for an AST
+        Comparisons are ordered by first appearance; raises DiagramTooLarge past max_nodes
+        """
+        variables: Dict[Tuple[Any, ...], int] = {}
+        diagram = cls([], max_nodes)
+        diagram.ast_nodes = ast_size(node)
+
+        # Iterative post-order walk, combined rules can be thousands of levels deep
+        results: List[int] = []
+        stack = [(node, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if current.type == NodeType.COMPARISON:
+                key = cls._comparison_key(current)
+                if key not in variables:
+                    variables[key] = len(diagram.predicates)
+                    diagram.predicates.append(compile_predicate(current))
+                results.append(diagram._mk(variables[key], FALSE, TRUE))
+            elif not expanded:
+                stack.append((current, True))
+                stack.append((current.right, False))
+                stack.append((current.left, False))
+            else:
+                right = results.pop()
+                left = results.pop()
+                results.append(diagram._apply(current.operator, left, right))
+
+        diagram.root = results[0]
+        diagram._apply_memo.clear()
+        return diagram
+
+    @staticmethod
+    def _comparison_key(node: Node) -> Tuple[Any, ...]:
+        """Identity of an atomic comparison, equal keys share one diagram variable"""
+        return (node.left.value, node.operator.value, repr(node.right.value),
+                node.right.attribute)
+
+    def _mk(self, var: int, low: int, high: int) -> int:
+        """Return the unique node for (var, low, high), skipping redundant tests"""
+        if low == high:
+            return low
+        key = (var, low, high)
+        node = self._unique.get(key)
+        if node is None:
+            if len(self._var) - 2 >= self.max_nodes:
+                raise DiagramTooLarge(
+                    f"Decision diagram exceeds {self.max_nodes} nodes"
+                )
+            node = len(self._var)
+            self._var.append(var)
+            self._low.append(low)
+            self._high.append(high)
+            self._unique[key] = node
+        return node
+
+    def _terminal_case(self, operator: Operator, u: int, v: int) -> int:
+        """Result of u <operator> v when it doesn't need expansion, else -1"""
+        if u == v:
+            return u
+        if operator == Operator.AND:
+            if u == FALSE or v == FALSE:
+                return FALSE
+            if u == TRUE:
+                return v
+            if v == TRUE:
+                return u
+        else:
+            if u == TRUE or v == TRUE:
+                return TRUE
+            if u == FALSE:
+                return v
+            if v == FALSE:
+                return u
+        return -1
+
+    def _apply(self, operator: Operator, u: int, v: int) -> int:
+        """Combine two diagrams with AND/OR, iteratively to bound recursion depth"""
+        memo = self._apply_memo
+        stack = [(u, v, False)]
+        while stack:
+            a, b, expanded = stack.pop()
+            key = (operator, a, b)
+            if key in memo and not expanded:
+                continue
+
+            terminal = self._terminal_case(operator, a, b)
+            if terminal >= 0:
+                memo[key] = terminal
+                continue
+
+            var = min(self._var[a], self._var[b])
+            a_low, a_high = (self._low[a], self._high[a]) if self._var[a] == var else (a, a)
+            b_low, b_high = (self._low[b], self._high[b]) if self._var[b] == var else (b, b)
+
+            if expanded:
+                memo[key] = self._mk(
+                    var,
+                    memo[(operator, a_low, b_low)],
+                    memo[(operator, a_high, b_high)]
+                )
+            else:
+                stack.append((a, b, True))
+                stack.append((a_low, b_low, False))
+                stack.append((a_high, b_high, False))
+        return memo[(operator, u, v)]
+
+    @property
+    def size(self) -> int:
+        """Number of decision nodes reachable from the root, terminals excluded"""
+        seen = set()
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node > TRUE and node not in seen:
+                seen.add(node)
+                stack.append(self._low[node])
+                stack.append(self._high[node])
+        return len(seen)
+
+    def evaluate(self, data: Dict[str, Any]) -> bool:
+        """Walk the diagram from the root, testing one predicate per level"""
+        node = self.root
+        var, low, high, predicates = self._var, self._low, self._high, self.predicates
+        while node > TRUE:
+            node = high[node] if predicates[var[node]](data) else low[node]
+        return node == TRUE
+
+    def report(self) -> Dict[str, int]:
+        """Size of the AST before and of the diagram after compilation"""
+        return {
+            "ast_nodes": self.ast_nodes,
+            "predicates": len(self.predicates),
+            "diagram_nodes": self.size
+        }
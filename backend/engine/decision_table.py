@@ -0,0 +1,264 @@
+"""
+Decision tables: ordered rules, each with an output, evaluated as one lookup.
+
+Each entry's rule is split into AND-ed conjuncts. Equality and IN checks on a
+field become a hash column, numeric range checks a bisect column, and whatever
+is left (OR, negations, patterns) stays a compiled residual predicate. A column
+maps a record value to the bitmask of entries it satisfies, entries without a
+condition on the column always being set. ANDing the column masks leaves the
+candidate entries, and only candidates have their residual evaluated, in
+priority order. A lookup costs one hash probe or bisection per column plus
+word-parallel mask operations, instead of evaluating every rule.
+
+Range columns compare with float() like the evaluator, a value float() rejects
+fails the range checks of that column rather than raising. Date bounds, epoch
+microseconds, get range columns of their own whose record values are converted
+with the cached ISO-8601 parser, so a batch of records is checked against every
+entry's date range with one parse and one bisection per distinct value.
+"""
+
+import math
+from bisect import bisect_left
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from models.rule_models import Node, NodeType, Operator
+from engine.field_path import compile_accessor
+from engine.temporal import DATETIME, record_epoch
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+EQUALITY_OPERATORS = (Operator.EQ, Operator.IN)
+RANGE_OPERATORS = (Operator.GT, Operator.GTE, Operator.LT, Operator.LTE)
+
+
+class Interval:
+    """Numeric interval, intersected one bound at a time"""
+    __slots__ = ("low", "low_open", "high", "high_open")
+
+    def __init__(self):
+        self.low, self.low_open = -math.inf, True
+        self.high, self.high_open = math.inf, True
+
+    def restrict(self, operator: Operator, bound: float) -> None:
+        if operator in (Operator.GT, Operator.GTE):
+            is_open = operator == Operator.GT
+            if bound > self.low or (bound == self.low and is_open):
+                self.low, self.low_open = bound, is_open
+        else:
+            is_open = operator == Operator.LT
+            if bound < self.high or (bound == self.high and is_open):
+                self.high, self.high_open = bound, is_open
+
+
+class HashColumn:
+    """Entries with equality checks on a field, keyed by str() like '='"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.accessor = compile_accessor(field)
+        self.masks: Dict[str, int] = {}
+        self.constrained = 0
+        self.wildcard = 0
+
+    def add(self, bit: int, members: Optional[frozenset]) -> None:
+        if members is None:
+            self.wildcard |= bit
+            return
+        self.constrained |= bit
+        for member in members:
+            self.masks[member] = self.masks.get(member, 0) | bit
+
+    def lookup(self, data: Dict[str, Any]) -> int:
+        value = self.accessor(data)
+        if value is None:
+            return self.wildcard
+        return self.wildcard | self.masks.get(str(value), 0)
+
+
+class RangeColumn:
+    """
+    Entries with numeric or date range checks on a field
+    The bounds split the number line into points and open segments, each with
+    the mask of entries covering it, found by bisection
+    """
+
+    def __init__(self, field: str, attribute: Optional[str] = None):
+        self.field = field
+        self.accessor = compile_accessor(field)
+        self.attribute = attribute
+        self.convert = record_epoch if attribute == DATETIME else _number
+        self.intervals: List[Tuple[int, Interval]] = []
+        self.wildcard = 0
+        self.bounds: List[float] = []
+        self.masks: List[int] = []
+
+    def add(self, bit: int, interval: Optional[Interval]) -> None:
+        if interval is None:
+            self.wildcard |= bit
+        else:
+            self.intervals.append((bit, interval))
+
+    def build(self) -> None:
+        bounds = set()
+        for _, interval in self.intervals:
+            bounds.update(b for b in (interval.low, interval.high) if math.isfinite(b))
+        self.bounds = sorted(bounds)
+
+        # Region 2i is the open segment below bounds[i], region 2i + 1 the point bounds[i]
+        regions = 2 * len(self.bounds) + 1
+        starts = [0] * (regions + 1)
+        ends = [0] * (regions + 1)
+        for bit, interval in self.intervals:
+            first = 0 if interval.low == -math.inf else \
+                2 * bisect_left(self.bounds, interval.low) + (2 if interval.low_open else 1)
+            last = regions - 1 if interval.high == math.inf else \
+                2 * bisect_left(self.bounds, interval.high) + (0 if interval.high_open else 1)
+            if first <= last:
+                starts[first] |= bit
+                ends[last + 1] |= bit
+
+        # Sweep the regions, each interval covers one contiguous run of them
+        self.masks = []
+        current = 0
+        for region in range(regions):
+            current = (current & ~ends[region]) | starts[region]
+            self.masks.append(current)
+        self.intervals = []
+
+    def lookup(self, data: Dict[str, Any]) -> int:
+        value = self.accessor(data)
+        if value is None:
+            return self.wildcard
+        number = self.convert(value)
+        if number is None:
+            return self.wildcard
+
+        index = bisect_left(self.bounds, number)
+        if index < len(self.bounds) and self.bounds[index] == number:
+            return self.wildcard | self.masks[2 * index + 1]
+        return self.wildcard | self.masks[2 * index]
+
+
+class DecisionTable:
+    """Entries in priority order, the first entry has the lowest bit"""
+
+    def __init__(
+        self,
+        rules: List[Node],
+        compile_rule: Callable[[Node], Predicate]
+    ):
+        self.size = len(rules)
+        self.all = (1 << self.size) - 1
+        self.residuals: List[Optional[Predicate]] = []
+
+        conditions = [self._split(node) for node in rules]
+        hash_fields = {f for equalities, _, _ in conditions for f in equalities}
+        range_fields = {f for _, ranges, _ in conditions for f in ranges}
+        self.hash_columns = [HashColumn(field) for field in sorted(hash_fields)]
+        self.range_columns = [
+            RangeColumn(field, attribute) 
+            for field, attribute in sorted(range_fields, key=lambda key: (key[0], key[1] or ""))
+        ]
+
+        for index, (equalities, ranges, residual) in enumerate(conditions):
+            bit = 1 << index
+            for column in self.hash_columns:
+                column.add(bit, equalities.get(column.field))
+            for column in self.range_columns:
+                column.add(bit, ranges.get((column.field, column.attribute)))
+            self.residuals.append(compile_rule(residual) if residual else None)
+        for column in self.range_columns:
+            column.build()
+
+    def _split(
+        self, 
+        node: Node
+    ) -> Tuple[Dict[str, frozenset], Dict[Tuple[str, Optional[str]], Interval], Optional[Node]]:
+        """
+        Split a rule into per-field equality sets, intervals per field and kind of bound
+        (number or date), and the residual
+        """
+        conjuncts = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.type == NodeType.OPERATOR and current.operator == Operator.AND:
+                stack.append(current.right)
+                stack.append(current.left)
+            else:
+                conjuncts.append(current)
+
+        equalities: Dict[str, frozenset] = {}
+        ranges: Dict[Tuple[str, Optional[str]], Interval] = {}
+        residual = []
+        for conjunct in conjuncts:
+            if conjunct.type != NodeType.COMPARISON:
+                residual.append(conjunct)
+                continue
+            field = conjunct.left.value
+            value = conjunct.right.value
+            attribute = conjunct.right.attribute
+            if conjunct.operator in EQUALITY_OPERATORS and attribute is None:
+                members = (frozenset(str(v) for v in value) if conjunct.operator == Operator.IN
+                           else frozenset([str(value)]))
+                equalities[field] = equalities[field] & members if field in equalities else members
+            elif (conjunct.operator in RANGE_OPERATORS and
+                  isinstance(value, (int, float)) and not isinstance(value, bool)):
+                bound = value if attribute == DATETIME else float(value)
+                ranges.setdefault((field, attribute), Interval()).restrict(conjunct.operator, bound)
+            else:
+                residual.append(conjunct)
+
+        combined = None
+        for conjunct in residual:
+            combined = conjunct if combined is None else Node(
+                type=NodeType.OPERATOR,
+                operator=Operator.AND,
+                left=combined,
+                right=conjunct
+            )
+        return equalities, ranges, combined
+
+    def candidates(self, data: Dict[str, Any]) -> int:
+        """Mask of the entries whose indexed conditions the record satisfies"""
+        mask = self.all
+        for column in self.hash_columns:
+            mask &= column.lookup(data)
+            if not mask:
+                return 0
+        for column in self.range_columns:
+            mask &= column.lookup(data)
+            if not mask:
+                return 0
+        return mask
+
+    def evaluate(self, data: Dict[str, Any], first_hit: bool = True) -> List[int]:
+        """Indexes of the matching entries in priority order, at most one with first_hit"""
+        mask = self.candidates(data)
+        hits = []
+        while mask:
+            lowest = mask & -mask
+            index = lowest.bit_length() - 1
+            residual = self.residuals[index]
+            if residual is None or residual(data):
+                hits.append(index)
+                if first_hit:
+                    break
+            mask ^= lowest
+        return hits
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "entries": self.size,
+            "hash_columns": [column.field for column in self.hash_columns],
+            "range_columns": [column.field for column in self.range_columns],
+            "residual_entries": sum(residual is not None for residual in self.residuals)
+        }
+
+
+def _number(value: Any) -> Optional[float]:
+    """float() of a record value, None when float() rejects it or it's NaN"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
@@ -0,0 +1,52 @@
+from functools import lru_cache
+from typing import Dict, Any, Callable
+
+Accessor = Callable[[Dict[str, Any]], Any]
+
+
+@lru_cache(maxsize=4096)
+def compile_accessor(path: str) -> Accessor:
+    """
+    Compile a field path such as "profile.address.city" into a getter
+    A key equal to the whole path wins, so flattened records keep working
+    """
+    if '.' not in path:
+        return lambda data: data.get(path)
+
+    parts = tuple(path.split('.'))
+
+    def accessor(data: Dict[str, Any]) -> Any:
+        value = data.get(path)
+        if value is not None:
+            return value
+
+        value = data
+        for part in parts:
+            if isinstance(value, dict):
+                value = value.get(part)
+            elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+                value = value[int(part)]
+            else:
+                return None
+            if value is None:
+                return None
+        return value
+    return accessor
+
+
+class PathView:
+    """Record view resolving each dotted path at most once, whatever reads it"""
+    __slots__ = ("record", "accessors", "resolved")
+
+    def __init__(self, record: Dict[str, Any], accessors: Dict[str, Accessor]):
+        self.record = record
+        self.accessors = accessors
+        self.resolved = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        accessor = self.accessors.get(key)
+        if accessor is None:
+            return self.record.get(key, default)
+        if key not in self.resolved:
+            self.resolved[key] = accessor(self.record)
+        return self.resolved[key]
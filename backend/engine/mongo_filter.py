@@ -0,0 +1,177 @@
+"""
+Translate rule ASTs into MongoDB filter documents.
+
+The Python evaluator compares with float() for ordering operators and with str()
+for equality, and a missing or null field never matches. The translation keeps
+those semantics explicit:
+
+- Equality (=, !=, IN, NOT IN) matches every BSON value whose str() equals the
+  constant, e.g. `age = 30` becomes {"age": {"$in": ["30", 30]}}. Negations also
+  require the field to be present and non-null.
+- Ordering (>, <, >=, <=) compares numbers by default, which lets MongoDB use
+  indexes but leaves out numeric strings that float() would accept. With
+  coerce_numeric_strings the field goes through $convert to double inside $expr,
+  which matches numeric strings too at the cost of an index-free scan.
+
+- Date constants (operands tagged DATETIME, epoch microseconds) become BSON
+  dates, compared natively and matching date fields only. With
+  coerce_numeric_strings the field goes through $convert to date instead, which
+  also reads ISO-8601 strings like the evaluator does.
+- Patterns (STARTSWITH, CONTAINS, MATCHES) become $regex, with STARTSWITH and
+  CONTAINS escaped and STARTSWITH anchored so it can use an index. $regex only
+  matches string fields, where the Python evaluator also matches the str() of
+  numbers, and MongoDB's PCRE dialect may read some patterns differently.
+
+MongoDB treats 30 and 30.0 as equal and matches array fields element-wise, while
+the Python evaluator compares their str() forms; such records can differ.
+"""
+
+import re
+from datetime import datetime
+from typing import List, Dict, Any
+from models.rule_models import Node, NodeType, Operator
+from engine.regex_guard import check_pattern
+from engine.temporal import DATETIME, from_epoch
+
+RANGE_OPERATORS = {
+    Operator.GT: "$gt",
+    Operator.LT: "$lt",
+    Operator.GTE: "$gte",
+    Operator.LTE: "$lte"
+}
+
+
+def to_mongo_filter(node: Node, coerce_numeric_strings: bool = False) -> Dict[str, Any]:
+    """Translate an AST into an equivalent MongoDB filter document"""
+    if node.type == NodeType.COMPARISON:
+        return _comparison_filter(node, coerce_numeric_strings)
+
+    # Flatten chains of the same operator into one $and / $or
+    clauses = []
+    stack = [node.right, node.left]
+    while stack:
+        current = stack.pop()
+        if current.type == NodeType.OPERATOR and current.operator == node.operator:
+            stack.append(current.right)
+            stack.append(current.left)
+        else:
+            clauses.append(to_mongo_filter(current, coerce_numeric_strings))
+
+    return {"$and" if node.operator == Operator.AND else "$or": clauses}
+
+
+def _comparison_filter(node: Node, coerce_numeric_strings: bool) -> Dict[str, Any]:
+    """Translate a single comparison"""
+    field = node.left.value
+    value = node.right.value
+    operator = node.operator
+
+    if node.right.attribute == DATETIME:
+        return _date_filter(field, operator, from_epoch(value), coerce_numeric_strings)
+
+    if operator in RANGE_OPERATORS:
+        try:
+            bound = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Can't translate non-numeric bound for {field}: {value!r}")
+        if isinstance(value, int) and bound.is_integer():
+            bound = value
+
+        if not coerce_numeric_strings:
+            return {field: {RANGE_OPERATORS[operator]: bound}}
+        return _converted_range(field, operator, "double", bound)
+
+    if operator == Operator.STARTSWITH:
+        return {field: {"$regex": "^" + re.escape(str(value))}}
+    if operator == Operator.CONTAINS:
+        return {field: {"$regex": re.escape(str(value))}}
+    if operator == Operator.MATCHES:
+        # MongoDB's PCRE backtracks too, so the pattern gets the same check as in the evaluator
+        check_pattern(str(value))
+        return {field: {"$regex": str(value)}}
+
+    if operator in (Operator.EQ, Operator.NEQ):
+        candidates = equality_candidates(value)
+    elif operator in (Operator.IN, Operator.NOT_IN):
+        candidates = []
+        seen = set()
+        for member in value:
+            for candidate in equality_candidates(member):
+                # Keyed by type as well, True == 1 but they are distinct BSON values
+                key = (type(candidate).__name__, candidate)
+                if key not in seen:
+                    seen.add(key)
+                    candidates.append(candidate)
+    else:
+        raise ValueError(f"Can't translate operator: {operator.value}")
+
+    if operator in (Operator.EQ, Operator.IN):
+        if len(candidates) == 1:
+            return {field: candidates[0]}
+        return {field: {"$in": candidates}}
+    return {field: {"$ne": None, "$nin": candidates}}
+
+
+def _date_filter(field: str, operator: Operator, moment: datetime, coerce_strings: bool) -> Dict[str, Any]:
+    """Translate a comparison with a date constant"""
+    if operator in RANGE_OPERATORS:
+        if not coerce_strings:
+            return {field: {RANGE_OPERATORS[operator]: moment}}
+        return _converted_range(field, operator, "date", moment)
+    if operator == Operator.EQ:
+        if not coerce_strings:
+            return {field: moment}
+        return {"$expr": {"$eq": [_converted(field, "date"), moment]}}
+    if operator == Operator.NEQ:
+        if not coerce_strings:
+            return {field: {"$ne": None, "$nin": [moment]}}
+        # A present value that isn't a date differs, as in the evaluator
+        return {field: {"$ne": None}, "$expr": {"$ne": [_converted(field, "date"), moment]}}
+    raise ValueError(f"Can't translate operator: {operator.value}")
+
+
+def _converted_range(field: str, operator: Operator, to: str, bound: Any) -> Dict[str, Any]:
+    """Range check on the field converted with $convert, values it can't convert never match"""
+    return {"$expr": {"$let": {
+        "vars": {"value": _converted(field, to)},
+        "in": {"$and": [
+            {"$ne": ["$$value", None]},
+            {RANGE_OPERATORS[operator]: ["$$value", bound]}
+        ]}
+    }}}
+
+
+def _converted(field: str, to: str) -> Dict[str, Any]:
+    """The field converted with $convert, null when it is missing or can't be converted"""
+    return {"$convert": {
+        "input": f"${field}",
+        "to": to,
+        "onError": None,
+        "onNull": None
+    }}
+
+
+def equality_candidates(value: Any) -> List[Any]:
+    """Values whose str() equals str(value), i.e. every value '=' accepts"""
+    text = str(value)
+    candidates: List[Any] = [text]
+
+    if text in ("True", "False"):
+        candidates.append(text == "True")
+        return candidates
+
+    try:
+        number = int(text)
+        if str(number) == text:
+            candidates.append(number)
+            return candidates
+    except ValueError:
+        pass
+
+    try:
+        number = float(text)
+        if str(number) == text:
+            candidates.append(number)
+    except ValueError:
+        pass
+    return candidates
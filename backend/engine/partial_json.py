@@ -0,0 +1,197 @@
+"""
+Incremental extraction of selected top-level keys from a JSON object.
+
+The body is fed in chunks. Values of wanted keys are copied out and decoded,
+every other value is skipped by jumping between structural characters with a
+regex, without building it. Once every wanted key has been seen the extractor
+is done and the rest of the body need not be read, so work and memory follow
+what the rule reads rather than the payload size. The first occurrence of a
+duplicated key is used, and the JSON after the last wanted key isn't validated.
+"""
+
+import re
+from typing import Dict, Any, Iterable, Optional
+import orjson
+
+WHITESPACE = re.compile(rb'[ \t\r\n]*')
+STRING_SPECIAL = re.compile(rb'["\\]')
+# A whole string (or the part of it in this chunk) or a bracket, so skipping a
+# container costs one regex step per string rather than one per escape or quote
+CONTAINER_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*("?)|[{}\[\]]')
+SCALAR_END = re.compile(rb'[,}\]\s]')
+
+# Top-level parser states
+OBJECT_START, KEY_OR_END, KEY, KEY_STRING, COLON, VALUE_START, VALUE, AFTER_VALUE, DONE = range(9)
+
+
+class PartialJSONExtractor:
+    """Collect the values of `keys` from a JSON object fed in chunks"""
+
+    def __init__(self, keys: Iterable[str]):
+        self.wanted = set(keys)
+        self.values: Dict[str, Any] = {}
+        self.state = OBJECT_START
+        self.bytes_read = 0
+        self._key: Optional[str] = None
+        # The value being scanned
+        self._capture: Optional[bytearray] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._scalar = False
+
+    @property
+    def done(self) -> bool:
+        return self.state == DONE
+
+    def feed(self, chunk: bytes) -> None:
+        """Consume the next chunk of the body"""
+        self.bytes_read += len(chunk)
+        pos = 0
+        end = len(chunk)
+        while pos < end and self.state != DONE:
+            if self.state in (KEY_STRING, VALUE):
+                pos = self._scan_value(chunk, pos)
+                continue
+
+            pos = WHITESPACE.match(chunk, pos).end()
+            if pos == end:
+                break
+            char = chunk[pos:pos + 1]
+
+            if self.state == OBJECT_START:
+                if char != b'{':
+                    raise ValueError("Expected a JSON object")
+                self.state = KEY_OR_END
+                pos += 1
+            elif self.state in (KEY_OR_END, KEY):
+                if char == b'}' and self.state == KEY_OR_END:
+                    self.state = DONE
+                    pos += 1
+                elif char == b'"':
+                    self._start_value(capture=True)
+                    self.state = KEY_STRING
+                else:
+                    raise ValueError(f"Expected an object key at byte {self.bytes_read - end + pos}")
+            elif self.state == COLON:
+                if char != b':':
+                    raise ValueError(f"Expected ':' at byte {self.bytes_read - end + pos}")
+                self.state = VALUE_START
+                pos += 1
+            elif self.state == VALUE_START:
+                self._start_value(capture=self._key in self.wanted and self._key not in self.values)
+                self.state = VALUE
+            elif self.state == AFTER_VALUE:
+                if char == b',':
+                    self.state = KEY
+                elif char == b'}':
+                    self.state = DONE
+                else:
+                    raise ValueError(f"Expected ',' or '}}' at byte {self.bytes_read - end + pos}")
+                pos += 1
+
+    def close(self) -> Dict[str, Any]:
+        """Finish after the last chunk, returning the extracted values"""
+        if self.state != DONE:
+            raise ValueError("Truncated JSON object")
+        return self.values
+
+    def _start_value(self, capture: bool) -> None:
+        self._capture = bytearray() if capture else None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._scalar = False
+
+    def _scan_value(self, chunk: bytes, pos: int) -> int:
+        """Advance through the current value, returning the position after what was consumed"""
+        start = pos
+        end = len(chunk)
+        finished = False
+
+        if self._depth == 0 and not self._in_string and not self._scalar:
+            # First byte of the value decides its kind
+            char = chunk[pos:pos + 1]
+            if char == b'"':
+                self._in_string = True
+                pos += 1
+            elif char in (b'{', b'['):
+                self._depth = 1
+                pos += 1
+            elif char in (b'}', b']', b','):
+                raise ValueError(f"Expected a value at byte {self.bytes_read - end + pos}")
+            else:
+                self._scalar = True
+
+        while pos < end and not finished:
+            if self._escape:
+                self._escape = False
+                pos += 1
+            elif self._in_string:
+                match = STRING_SPECIAL.search(chunk, pos)
+                if not match:
+                    pos = end
+                elif chunk[match.start():match.start() + 1] == b'\\':
+                    self._escape = True
+                    pos = match.end()
+                else:
+                    self._in_string = False
+                    pos = match.end()
+                    finished = self._depth == 0
+            elif self._scalar:
+                match = SCALAR_END.search(chunk, pos)
+                if not match:
+                    pos = end
+                else:
+                    pos = match.start()
+                    finished = True
+            else:
+                match = CONTAINER_TOKEN.search(chunk, pos)
+                if not match:
+                    pos = end
+                    continue
+                char = chunk[match.start():match.start() + 1]
+                pos = match.end()
+                if char == b'"':
+                    # Unterminated within this chunk, the string scan picks it up
+                    self._in_string = not match.group(1)
+                elif char in (b'{', b'['):
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    finished = self._depth == 0
+
+        if self._capture is not None:
+            self._capture += chunk[start:pos]
+        if finished:
+            self._finish_value()
+        return pos
+
+    def _finish_value(self) -> None:
+        try:
+            value = orjson.loads(self._capture) if self._capture is not None else None
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"Malformed JSON value: {e}")
+
+        if self.state == KEY_STRING:
+            self._key = value
+            self.state = COLON
+        else:
+            if self._capture is not None:
+                self.values[self._key] = value
+                if len(self.values) == len(self.wanted):
+                    # Everything the rule reads is here
+                    self.state = DONE
+                    return
+            self.state = AFTER_VALUE
+        self._capture = None
+
+
+def extract_fields(chunks: Iterable[bytes], keys: Iterable[str]) -> Dict[str, Any]:
+    """Extract the values of top-level keys from a JSON object given in chunks"""
+    extractor = PartialJSONExtractor(keys)
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if extractor.done:
+            break
+    return extractor.close()
@@ -0,0 +1,64 @@
+"""
+Checks on MATCHES patterns before they are compiled or sent to MongoDB.
+
+Both Python's re and MongoDB's PCRE backtrack, so a pattern with a quantified
+group that is itself quantified, like (a+)+, can take exponential time on a
+short non-matching input. Such nesting is refused outright, along with patterns
+longer than MAX_PATTERN_LENGTH. Some harmless nestings are refused too, they can
+be written without the inner quantifier or with a bounded outer one. Overlapping
+alternatives under a quantifier, like (a|aa)+, are not detected.
+"""
+
+from typing import Any, List
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+MAX_PATTERN_LENGTH = 256
+
+REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, "POSSESSIVE_REPEAT"):
+    REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+
+
+def check_pattern(pattern: str) -> None:
+    """Raise ValueError for a pattern that is too long, invalid or nests quantifiers"""
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        raise ValueError(f"Pattern longer than {MAX_PATTERN_LENGTH} characters")
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception as e:
+        raise ValueError(f"Invalid pattern {pattern!r}: {e}")
+    if _nested_repeat(list(parsed), inside_repeat=False):
+        raise ValueError(f"Pattern {pattern!r} nests quantifiers, which can backtrack without bound")
+
+
+def _nested_repeat(items: List[Any], inside_repeat: bool) -> bool:
+    for op, av in items:
+        if op in REPEATS:
+            low, high, body = av
+            repeats = high > 1
+            if repeats and inside_repeat:
+                return True
+            if _nested_repeat(list(body), inside_repeat or repeats):
+                return True
+        elif op == sre_constants.SUBPATTERN:
+            if _nested_repeat(list(av[-1]), inside_repeat):
+                return True
+        elif op == sre_constants.BRANCH:
+            if any(_nested_repeat(list(branch), inside_repeat) for branch in av[1]):
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if _nested_repeat(list(av[1]), inside_repeat):
+                return True
+        elif op == getattr(sre_constants, "ATOMIC_GROUP", None):
+            if _nested_repeat(list(av), inside_repeat):
+                return True
+        elif op == sre_constants.GROUPREF_EXISTS:
+            if any(_nested_repeat(list(branch), inside_repeat) for branch in av[1:] if branch):
+                return True
+    return False
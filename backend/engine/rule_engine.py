@@ -1,9 +1,23 @@
-from typing import List, Dict, Any
+import re
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from models.rule_models import Node, NodeType, Operator
+from engine.decision_diagram import DecisionDiagram, DiagramTooLarge, DEFAULT_MAX_NODES
+from engine.field_path import Accessor, PathView, compile_accessor
+from engine.rule_set import RuleSet
+from engine.profiler import RuleProfiler
+from engine.decision_table import DecisionTable
+from engine.regex_guard import check_pattern
+from engine.structural_hash import comparison_key, operator_key
+from engine.temporal import DATETIME, parse_literal, record_epoch, to_epoch
 
 class RuleEngine:
-    def __init__(self):
-        """Initialize the rule engine with comparison operators"""
+    def __init__(self, fragments: Optional[Any] = None):
+        """
+        Initialize the rule engine with comparison operators
+        fragments is a cache with get / set holding compiled subtrees by structural key,
+        shared across rules and edits so only subtrees not seen before are compiled
+        """
+        self.fragments = fragments
         self.comparison_ops = {
             '>': lambda x, y: float(x) > float(y),
             '<': lambda x, y: float(x) < float(y),
@@ -12,6 +26,26 @@ class RuleEngine:
             '<=': lambda x, y: float(x) <= float(y),
             '!=': lambda x, y: str(x) != str(y)
         }
+        # Date comparisons convert the record value, the constant is already epoch microseconds
+        self.temporal_ops = {
+            '>': lambda x, y: to_epoch(x) > y,
+            '<': lambda x, y: to_epoch(x) < y,
+            '=': lambda x, y: record_epoch(x) == y,
+            '>=': lambda x, y: to_epoch(x) >= y,
+            '<=': lambda x, y: to_epoch(x) <= y,
+            '!=': lambda x, y: record_epoch(x) != y
+        }
+        # Membership operators test against a precomputed frozenset of str() values
+        self.membership_ops = {
+            'IN': lambda x, members: str(x) in members,
+            'NOT IN': lambda x, members: str(x) not in members
+        }
+        # Pattern operators test the str() value against a pattern compiled at parse time
+        self.pattern_ops = {
+            'STARTSWITH': lambda x, prefix: str(x).startswith(prefix),
+            'CONTAINS': lambda x, substring: substring in str(x),
+            'MATCHES': lambda x, regex: regex.search(str(x)) is not None
+        }
 
     def create_rule(self, rule_string: str) -> Node:
         """
@@ -20,13 +54,10 @@ class RuleEngine:
         """
         rule_string = rule_string.strip()
         tokens = self._tokenize(rule_string)
-        return self._parse_expression(tokens)
+        return self._optimize_ast(self._parse_expression(tokens))
 
     def _tokenize(self, rule_string: str) -> List[str]:
         """Convert rule string into tokens"""
-        # Handle parentheses
-        rule_string = rule_string.replace('(', ' ( ').replace(')', ' ) ')
-        
         # Handle quotes
         tokens = []
         in_quotes = False
@@ -44,6 +75,12 @@ class RuleEngine:
                     in_quotes = True
             elif in_quotes:
                 current_token += char
+            elif char in ['(', ')', '[', ']', ',']:
+                # Parentheses and list delimiters are tokens of their own, unless quoted
+                if current_token:
+                    tokens.append(current_token)
+                    current_token = ''
+                tokens.append(char)
             elif char.isspace():
                 if current_token:
                     tokens.append(current_token)
@@ -92,17 +129,27 @@ class RuleEngine:
                 if i + 2 < len(tokens):
                     field = token
                     op = tokens[i + 1]
-                    value = tokens[i + 2]
+                    if op == 'NOT' and tokens[i + 2] == 'IN':
+                        op = 'NOT IN'
+                        i += 1
                     
                     if op in self.comparison_ops:
+                        value = tokens[i + 2]
                         node = Node(
                             type=NodeType.COMPARISON,
                             operator=Operator(op),
                             left=Node(type=NodeType.OPERAND, value=field),
-                            right=Node(type=NodeType.OPERAND, value=self._convert_value(value))
+                            right=self._operand(value)
                         )
                         output.append(node)
                         i += 2
+                    elif op in self.membership_ops:
+                        values, i = self._parse_list(tokens, i + 2)
+                        output.append(self._membership_node(Operator(op), field, values))
+                    elif op in self.pattern_ops:
+                        value = self._convert_value(tokens[i + 2])
+                        output.append(self._pattern_node(Operator(op), field, value))
+                        i += 2
                     else:
                         raise ValueError(f"Invalid operator: {op}")
             i += 1
@@ -123,6 +170,85 @@ class RuleEngine:
             right=right
         ))
 
+    def _parse_list(self, tokens: List[str], start: int) -> Tuple[List[Any], int]:
+        """
+        Parse a list literal such as ['A', 'B'] or ('A', 'B') starting at tokens[start]
+        Returns the converted values and the index of the closing bracket
+        """
+        closing = {'[': ']', '(': ')'}.get(tokens[start] if start < len(tokens) else None)
+        if not closing:
+            raise ValueError("Expected a list of values after IN")
+
+        values = []
+        i = start + 1
+        while i < len(tokens) and tokens[i] != closing:
+            if tokens[i] != ',':
+                values.append(self._convert_value(tokens[i]))
+            i += 1
+
+        if i == len(tokens):
+            raise ValueError(f"Unterminated list, expected '{closing}'")
+        return values, i
+
+    def _membership_node(self, operator: Operator, field: str, values: List[Any]) -> Node:
+        """Build an IN / NOT IN comparison whose member set is precomputed"""
+        return Node(
+            type=NodeType.COMPARISON,
+            operator=operator,
+            left=Node(type=NodeType.OPERAND, value=field),
+            right=Node(
+                type=NodeType.OPERAND,
+                value=values,
+                compiled=frozenset(str(v) for v in values)
+            )
+        )
+
+    def _pattern_node(self, operator: Operator, field: str, value: Any) -> Node:
+        """Build a pattern comparison whose matcher is compiled once, here"""
+        node = Node(
+            type=NodeType.COMPARISON,
+            operator=operator,
+            left=Node(type=NodeType.OPERAND, value=field),
+            right=Node(type=NodeType.OPERAND, value=value)
+        )
+        self._pattern(node)
+        return node
+
+    def _pattern(self, node: Node) -> Any:
+        """Compiled regex or str of a pattern comparison, computed once for ASTs loaded from storage"""
+        operand = node.right
+        if operand.compiled is None:
+            if node.operator == Operator.MATCHES:
+                check_pattern(str(operand.value))
+                try:
+                    operand.compiled = re.compile(str(operand.value))
+                except re.error as e:
+                    raise ValueError(f"Invalid pattern {operand.value!r}: {e}")
+            else:
+                operand.compiled = str(operand.value)
+        return operand.compiled
+
+    def _members(self, operand: Node) -> frozenset:
+        """Member set of an IN list, computed once for ASTs loaded from storage"""
+        if operand.compiled is None:
+            operand.compiled = frozenset(str(v) for v in operand.value)
+        return operand.compiled
+
+    def _field_accessor(self, operand: Node) -> Accessor:
+        """Getter for a field operand, compiled once and kept on the node"""
+        if operand.compiled is None:
+            operand.compiled = compile_accessor(operand.value)
+        return operand.compiled
+
+    def _operand(self, token: str) -> Node:
+        """Operand of a comparison, a quoted date or datetime becomes an epoch constant"""
+        value = self._convert_value(token)
+        if isinstance(value, str) and token.startswith(("'", '"')):
+            epoch = parse_literal(value)
+            if epoch is not None:
+                return Node(type=NodeType.OPERAND, value=epoch, attribute=DATETIME)
+        return Node(type=NodeType.OPERAND, value=value)
+
     def _convert_value(self, value: str) -> Any:
         """Convert string value to appropriate type"""
         if value.startswith(("'", '"')):
@@ -168,6 +294,12 @@ class RuleEngine:
         if node.right:
             node.right = self._optimize_ast(node.right)
 
+        # Collapse equalities on the same field into set membership
+        if node.type == NodeType.OPERATOR and node.operator == Operator.OR:
+            node = self._rewrite_membership(node)
+            if node.type != NodeType.OPERATOR:
+                return node
+
         # Combine similar conditions
         if node.type == NodeType.OPERATOR:
             if (node.left and node.right and 
@@ -178,24 +310,94 @@ class RuleEngine:
                     node.left.operator == node.right.operator):
                     # Combine the conditions based on operator type
                     if node.operator == Operator.OR:
-                        return self._combine_conditions(node.left, node.right)
+                        return self._combine_conditions(node.left, node.right) or node
 
         return node
 
-    def _combine_conditions(self, node1: Node, node2: Node) -> Node:
-        """Combine similar conditions when possible"""
-        # This is a simple example - can be expanded based on needs
-        if node1.operator == Operator.GT:
-            return Node(
-                type=NodeType.COMPARISON,
-                operator=node1.operator,
-                left=node1.left,
-                right=Node(
-                    type=NodeType.OPERAND,
-                    value=max(node1.right.value, node2.right.value)
-                )
+    def _rewrite_membership(self, node: Node) -> Node:
+        """
+        Rewrite an OR chain holding several equalities (or IN lists) on the same
+        field into a single IN comparison per field
+        """
+        leaves = []
+        self._collect_or_leaves(node, leaves)
+
+        groups = {}
+        for leaf in leaves:
+            # Dates compare as instants, not by str(), so they stay out of IN lists
+            if (leaf.type == NodeType.COMPARISON and 
+                leaf.operator in (Operator.EQ, Operator.IN) and 
+                leaf.right.attribute is None):
+                groups.setdefault(leaf.left.value, []).append(leaf)
+
+        if all(len(group) < 2 for group in groups.values()):
+            return node
+
+        rewritten = []
+        emitted = set()
+        for leaf in leaves:
+            if (leaf.type != NodeType.COMPARISON or 
+                leaf.operator not in (Operator.EQ, Operator.IN) or 
+                leaf.right.attribute is not None or 
+                len(groups[leaf.left.value]) < 2):
+                rewritten.append(leaf)
+            elif leaf.left.value not in emitted:
+                emitted.add(leaf.left.value)
+                values = []
+                seen = set()
+                for member in groups[leaf.left.value]:
+                    member_values = (member.right.value if member.operator == Operator.IN 
+                                     else [member.right.value])
+                    for value in member_values:
+                        if str(value) not in seen:
+                            seen.add(str(value))
+                            values.append(value)
+                rewritten.append(self._membership_node(Operator.IN, leaf.left.value, values))
+
+        combined = rewritten[0]
+        for leaf in rewritten[1:]:
+            combined = Node(
+                type=NodeType.OPERATOR,
+                operator=Operator.OR,
+                left=combined,
+                right=leaf
             )
-        return node1
+        return combined
+
+    def _collect_or_leaves(self, node: Node, leaves: List[Node]) -> None:
+        """Flatten nested OR operators into their operands, left to right"""
+        if node.type == NodeType.OPERATOR and node.operator == Operator.OR:
+            self._collect_or_leaves(node.left, leaves)
+            self._collect_or_leaves(node.right, leaves)
+        else:
+            leaves.append(node)
+
+    def _combine_conditions(self, node1: Node, node2: Node) -> Optional[Node]:
+        """
+        Combine similar conditions under OR when possible
+        Returns None when the pair can't be merged into one comparison
+        """
+        bound1, bound2 = node1.right.value, node2.right.value
+        if not all(isinstance(v, (int, float)) for v in (bound1, bound2)):
+            return None
+        # A date and a number bound never merge
+        if node1.right.attribute != node2.right.attribute:
+            return None
+
+        # x > a OR x > b is x > min(a, b); x < a OR x < b is x < max(a, b)
+        if node1.operator in (Operator.GT, Operator.GTE):
+            bound = min(bound1, bound2)
+        elif node1.operator in (Operator.LT, Operator.LTE):
+            bound = max(bound1, bound2)
+        else:
+            return None
+
+        return Node(
+            type=NodeType.COMPARISON,
+            operator=node1.operator,
+            left=node1.left,
+            right=Node(type=NodeType.OPERAND, value=bound, attribute=node1.right.attribute)
+        )
 
     def evaluate_rule(self, node: Node, data: Dict[str, Any]) -> bool:
         """Evaluate a rule against provided data"""
@@ -203,11 +405,20 @@ class RuleEngine:
             return False
 
         if node.type == NodeType.COMPARISON:
-            left_val = data.get(node.left.value)
+            left_val = self._field_accessor(node.left)(data)
             right_val = node.right.value
             
             if left_val is None:
                 return False
+
+            if node.operator.value in self.membership_ops:
+                return self.membership_ops[node.operator.value](
+                    left_val, self._members(node.right)
+                )
+            if node.operator.value in self.pattern_ops:
+                return self.pattern_ops[node.operator.value](left_val, self._pattern(node))
+            if node.right.attribute == DATETIME:
+                return self.temporal_ops[node.operator.value](left_val, right_val)
                 
             return self.comparison_ops[node.operator.value](left_val, right_val)
             
@@ -222,3 +433,144 @@ class RuleEngine:
                 
         return False
 
+    def referenced_fields(self, node: Node) -> List[str]:
+        """Distinct record fields a rule reads, in order of first appearance"""
+        fields = {}
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.type == NodeType.COMPARISON:
+                fields.setdefault(current.left.value, None)
+            else:
+                stack.append(current.right)
+                stack.append(current.left)
+        return list(fields)
+
+    def required_fields(self, node: Node) -> List[str]:
+        """
+        Fields that must be present for the rule to hold
+        A comparison on a missing field is False, so a record lacking any of them fails the rule
+        """
+        if node.type == NodeType.COMPARISON:
+            return [node.left.value]
+
+        left = self.required_fields(node.left)
+        right = self.required_fields(node.right)
+        if node.operator == Operator.AND:
+            return left + [f for f in right if f not in left]
+        return [f for f in left if f in right]
+
+    def compile_rule(
+        self, 
+        node: Node, 
+        decision_diagram: bool = False, 
+        max_diagram_nodes: int = DEFAULT_MAX_NODES
+    ) -> Callable[[Dict[str, Any]], bool]:
+        """
+        Compile an AST into a callable evaluating a record, for rules evaluated many times
+        With decision_diagram, compile into a BDD and fall back to closures when it's too large
+        """
+        evaluate = None
+        if decision_diagram:
+            try:
+                evaluate = self.compile_decision_diagram(node, max_diagram_nodes).evaluate
+            except DiagramTooLarge:
+                pass
+        if evaluate is None:
+            evaluate = self._compile_node(node)
+
+        # Dotted paths read by several predicates are resolved once per record
+        paths = {
+            field: compile_accessor(field) 
+            for field in self.referenced_fields(node) if '.' in field
+        }
+        if paths:
+            return lambda data: evaluate(PathView(data, paths))
+        return evaluate
+
+    def compile_rule_set(self, rules: Dict[str, Node]) -> RuleSet:
+        """Compile rules evaluated together, sharing a prefix trie per STARTSWITH field"""
+        return RuleSet(rules, self._compile_predicate, self._pattern)
+
+    def compile_decision_table(self, rules: List[Node]) -> DecisionTable:
+        """Compile rules in priority order into hash and bisect lookups over their columns"""
+        return DecisionTable(rules, self.compile_rule)
+
+    def compile_decision_diagram(
+        self, 
+        node: Node, 
+        max_nodes: int = DEFAULT_MAX_NODES
+    ) -> DecisionDiagram:
+        """Compile an AST into a decision diagram testing each comparison at most once"""
+        return DecisionDiagram.build(node, self._compile_predicate, max_nodes)
+
+    def profile_rule(self, node: Node) -> RuleProfiler:
+        """
+        Compile an instrumented copy of an AST, counting calls, results and time per node
+        Separate from compile_rule, which stays uninstrumented
+        """
+        return RuleProfiler(node, self._compile_predicate)
+
+    def _compile_node(self, node: Node) -> Callable[[Dict[str, Any]], bool]:
+        """Compile an AST into nested closures"""
+        if self.fragments is not None:
+            return self._compile_fragment(node)[0]
+        if node.type == NodeType.COMPARISON:
+            return self._compile_predicate(node)
+
+        left = self._compile_node(node.left)
+        right = self._compile_node(node.right)
+        if node.operator == Operator.AND:
+            return lambda data: left(data) and right(data)
+        return lambda data: left(data) or right(data)
+
+    def _compile_fragment(self, node: Node) -> Tuple[Callable[[Dict[str, Any]], bool], bytes]:
+        """Compile an AST bottom-up, reusing any subtree compiled before, with its structural key"""
+        if node.type == NodeType.COMPARISON:
+            key = comparison_key(node)
+            fragment = self.fragments.get(key)
+            if fragment is None:
+                fragment = self._compile_predicate(node)
+                self.fragments.set(key, fragment)
+            return fragment, key
+
+        left, left_key = self._compile_fragment(node.left)
+        right, right_key = self._compile_fragment(node.right)
+        key = operator_key(node, left_key, right_key)
+        fragment = self.fragments.get(key)
+        if fragment is None:
+            if node.operator == Operator.AND:
+                fragment = lambda data: left(data) and right(data)
+            else:
+                fragment = lambda data: left(data) or right(data)
+            self.fragments.set(key, fragment)
+        return fragment, key
+
+    def _compile_predicate(self, node: Node) -> Callable[[Dict[str, Any]], bool]:
+        """Compile a single comparison with its operator and constant bound in"""
+        field = node.left.value
+        if node.operator.value in self.membership_ops:
+            op = self.membership_ops[node.operator.value]
+            value = self._members(node.right)
+        elif node.operator.value in self.pattern_ops:
+            op = self.pattern_ops[node.operator.value]
+            value = self._pattern(node)
+        elif node.right.attribute == DATETIME:
+            op = self.temporal_ops[node.operator.value]
+            value = node.right.value
+        else:
+            op = self.comparison_ops[node.operator.value]
+            value = node.right.value
+
+        if '.' in field:
+            accessor = compile_accessor(field)
+
+            def path_predicate(data: Dict[str, Any]) -> bool:
+                left_val = accessor(data)
+                return left_val is not None and op(left_val, value)
+            return path_predicate
+
+        def predicate(data: Dict[str, Any]) -> bool:
+            left_val = data.get(field)
+            return left_val is not None and op(left_val, value)
+        return predicate
@@ -0,0 +1,98 @@
+from typing import List, Dict, Any, Callable, Set, Tuple
+from models.rule_models import Node, NodeType, Operator
+from engine.field_path import compile_accessor
+
+# A compiled rule of a set reads the record and the prefixes it matched per field
+SetPredicate = Callable[[Dict[str, Any], Dict[str, Set[str]]], bool]
+
+
+class PrefixTrie:
+    """Prefixes of one field, finding all those a value starts with in one walk"""
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+
+    def add(self, prefix: str) -> None:
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        # The empty key marks the end of a prefix, storing the prefix itself
+        node[''] = prefix
+
+    def matches(self, text: str) -> Set[str]:
+        """Every stored prefix of text"""
+        found = set()
+        node = self.root
+        if '' in node:
+            found.add(node[''])
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            if '' in node:
+                found.add(node[''])
+        return found
+
+
+class RuleSet:
+    """
+    Several rules evaluated together against one record
+    STARTSWITH comparisons on the same field share a trie, walked once per record
+    """
+
+    def __init__(
+        self,
+        rules: Dict[str, Node],
+        compile_predicate: Callable[[Node], Callable[[Dict[str, Any]], bool]],
+        pattern: Callable[[Node], Any]
+    ):
+        self.compile_predicate = compile_predicate
+        self.pattern = pattern
+        self.tries: Dict[str, PrefixTrie] = {}
+        for node in rules.values():
+            self._index_prefixes(node)
+        self.accessors = {field: compile_accessor(field) for field in self.tries}
+        self.rules: List[Tuple[str, SetPredicate]] = [
+            (rule_id, self._compile(node)) for rule_id, node in rules.items()
+        ]
+
+    def _index_prefixes(self, node: Node) -> None:
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.type == NodeType.COMPARISON:
+                if current.operator == Operator.STARTSWITH:
+                    trie = self.tries.setdefault(current.left.value, PrefixTrie())
+                    trie.add(self.pattern(current))
+            else:
+                stack.append(current.right)
+                stack.append(current.left)
+
+    def _compile(self, node: Node) -> SetPredicate:
+        if node.type == NodeType.OPERATOR:
+            left = self._compile(node.left)
+            right = self._compile(node.right)
+            if node.operator == Operator.AND:
+                return lambda data, prefixes: left(data, prefixes) and right(data, prefixes)
+            return lambda data, prefixes: left(data, prefixes) or right(data, prefixes)
+
+        if node.operator == Operator.STARTSWITH:
+            field = node.left.value
+            prefix = self.pattern(node)
+            return lambda data, prefixes: prefix in prefixes[field]
+
+        predicate = self.compile_predicate(node)
+        return lambda data, prefixes: predicate(data)
+
+    def prefix_matches(self, data: Dict[str, Any]) -> Dict[str, Set[str]]:
+        """Prefixes matched by each indexed field of the record"""
+        matched = {}
+        for field, trie in self.tries.items():
+            value = self.accessors[field](data)
+            matched[field] = trie.matches(str(value)) if value is not None else set()
+        return matched
+
+    def evaluate(self, data: Dict[str, Any]) -> Dict[str, bool]:
+        """Result of every rule for the record"""
+        prefixes = self.prefix_matches(data)
+        return {rule_id: predicate(data, prefixes) for rule_id, predicate in self.rules}
@@ -0,0 +1,44 @@
+"""
+Structural hashes of AST subtrees.
+
+Two subtrees get the same key exactly when they have the same shape, operators,
+fields and typed constants, wherever they sit and whichever rule holds them. An
+operator's key is derived from its children's keys, so keys for a whole tree are
+computed bottom-up in one pass. Compiled closures are pure functions of their
+subtree, so they can be cached under these keys and shared: after an edit only
+the subtrees on the path to the change get new keys, every other one is found
+compiled already.
+"""
+
+from hashlib import blake2b
+from typing import Any
+from models.rule_models import Node, NodeType
+
+DIGEST_SIZE = 16
+
+
+def comparison_key(node: Node) -> bytes:
+    """Key of a comparison, its constant typed so 30, 30.0, '30' and a date differ"""
+    text = repr((node.operator.value, node.left.value, _typed(node.right.value), node.right.attribute))
+    return blake2b(text.encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def operator_key(node: Node, left_key: bytes, right_key: bytes) -> bytes:
+    """Key of an AND / OR from the keys of its operands"""
+    digest = blake2b(node.operator.value.encode(), digest_size=DIGEST_SIZE)
+    digest.update(left_key)
+    digest.update(right_key)
+    return digest.digest()
+
+
+def subtree_key(node: Node) -> bytes:
+    """Key of a whole subtree"""
+    if node.type == NodeType.COMPARISON:
+        return comparison_key(node)
+    return operator_key(node, subtree_key(node.left), subtree_key(node.right))
+
+
+def _typed(value: Any) -> Any:
+    if isinstance(value, list):
+        return ("list", tuple(_typed(v) for v in value))
+    return (type(value).__name__, value)
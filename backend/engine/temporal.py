@@ -0,0 +1,75 @@
+"""
+Date and datetime comparisons.
+
+A quoted ISO-8601 literal in a comparison, like joined_at < '2023-01-01' or
+'2023-01-01T09:30:00+05:30', is parsed once when the rule is created into an
+integer constant, microseconds since the Unix epoch, on an operand tagged with
+attribute DATETIME. A date is its midnight, and times without an offset are UTC.
+
+Record values are converted at evaluation: datetime and date objects directly,
+strings through a cached ISO-8601 parser, so the repeated timestamps of a batch
+are parsed once. Numbers are not taken as epochs, their unit is ambiguous.
+"""
+
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Optional
+
+DATETIME = "datetime"
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Literals must be a full date with an optional time, so quoted codes and numbers stay strings
+LITERAL = re.compile(
+    r"\d{4}-\d{2}-\d{2}"
+    r"([T ]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?(Z|[+-]\d{2}:?\d{2})?)?"
+)
+
+
+def parse_literal(text: str) -> Optional[int]:
+    """Epoch microseconds of a date or datetime literal, None when text isn't one"""
+    if not LITERAL.fullmatch(text):
+        return None
+    return _parse_iso(text)
+
+
+def to_epoch(value: Any) -> int:
+    """Epoch microseconds of a record value, ValueError when it isn't a date"""
+    epoch = record_epoch(value)
+    if epoch is None:
+        raise ValueError(f"Can't compare {value!r} with a date")
+    return epoch
+
+
+def record_epoch(value: Any) -> Optional[int]:
+    """Epoch microseconds of a record value, None when it isn't a date"""
+    if isinstance(value, str):
+        return _parse_iso(value)
+    if isinstance(value, datetime):
+        return _epoch(value)
+    if isinstance(value, date):
+        return _epoch(datetime(value.year, value.month, value.day))
+    return None
+
+
+def from_epoch(epoch: int) -> datetime:
+    """Naive UTC datetime of an epoch constant, as pymongo stores it"""
+    return EPOCH + epoch * MICROSECOND
+
+
+@lru_cache(maxsize=65536)
+def _parse_iso(text: str) -> Optional[int]:
+    try:
+        # fromisoformat only reads a Z suffix from Python 3.11
+        moment = datetime.fromisoformat(text[:-1] + "+00:00" if text.endswith("Z") else text)
+    except ValueError:
+        return None
+    return _epoch(moment)
+
+
+def _epoch(moment: datetime) -> int:
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - EPOCH) // MICROSECOND
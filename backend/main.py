@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.rule_routes import router as rule_router
-import uvicorn
+from routes.job_routes import router as job_router
+from routes.decision_table_routes import router as decision_table_router
+from database import lifespan
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 origins = ["http://localhost:3000"]
@@ -17,6 +19,9 @@ app.add_middleware(
 
 # Include routes
 app.include_router(rule_router)
+app.include_router(job_router)
+app.include_router(decision_table_router)
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
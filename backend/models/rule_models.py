@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Dict, Optional, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
 class NodeType(Enum):
@@ -17,6 +17,16 @@ class Operator(Enum):
     GTE = ">="
     LTE = "<="
     NEQ = "!="
+    IN = "IN"
+    NOT_IN = "NOT IN"
+    STARTSWITH = "STARTSWITH"
+    CONTAINS = "CONTAINS"
+    MATCHES = "MATCHES"
+
+class AstFormat(Enum):
+    FULL = "full"
+    COMPACT = "compact"
+    NONE = "none"
 
 class RuleCreate(BaseModel):
     name: str
@@ -33,6 +43,70 @@ class RuleEvaluate(BaseModel):
     rule_id: str
     data: Dict
 
+class RuleSetEvaluate(BaseModel):
+    rule_ids: List[str]
+    data: Dict
+
+class ProfileFormat(Enum):
+    JSON = "json"
+    COLLAPSED = "collapsed"
+
+# Most instrumented evaluations one profile request may run
+MAX_PROFILE_EVALUATIONS = 100000
+
+class RuleProfile(BaseModel):
+    records: List[Dict] = Field(min_length=1, max_length=10000)
+    # Passes over the records, more give steadier timings on small samples
+    repeat: int = Field(default=1, ge=1, le=100)
+
+    @model_validator(mode="after")
+    def check_evaluations(self) -> 'RuleProfile':
+        if len(self.records) * self.repeat > MAX_PROFILE_EVALUATIONS:
+            raise ValueError(f"records x repeat may be at most {MAX_PROFILE_EVALUATIONS}")
+        return self
+
+class RuleMatch(BaseModel):
+    rule_id: str
+    collection: str
+    filter: Optional[Dict] = None
+    projection: Optional[List[str]] = None
+    coerce_numeric_strings: bool = False
+    limit: int = 0
+
+class JobStatus(Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+class JobCreate(BaseModel):
+    rule_id: str
+    source_collection: str
+    filter: Optional[Dict] = None
+    result_collection: Optional[str] = None
+    batch_size: int = Field(default=1000, gt=0)
+    decision_diagram: bool = False
+
+class HitPolicy(Enum):
+    FIRST = "FIRST"
+    COLLECT = "COLLECT"
+
+class DecisionTableEntry(BaseModel):
+    rule_id: str
+    priority: int = 0
+    output: Any = None
+
+class DecisionTableCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    hit_policy: HitPolicy = HitPolicy.FIRST
+    entries: List[DecisionTableEntry] = Field(min_length=1)
+    default: Any = None
+
+class DecisionTableEvaluate(BaseModel):
+    data: Dict
+
 class RuleResponse(BaseModel):
     id: str
     name: str
@@ -41,6 +115,7 @@ class RuleResponse(BaseModel):
     created_at: str
     updated_at: str
     parent_rules: Optional[List[str]] = []
+    version: int = 0
 
 
 @dataclass
@@ -52,6 +127,8 @@ class Node:
     attribute: Optional[str] = None
     left: Optional['Node'] = None
     right: Optional['Node'] = None
+    # Parse-time artifact derived from value (e.g. the frozenset of an IN list), never serialized
+    compiled: Any = field(default=None, repr=False, compare=False)
 
     def to_dict(self) -> dict:
         return {
@@ -63,6 +140,42 @@ class Node:
             "right": self.right.to_dict() if self.right else None
         }
 
+    def to_compact(self) -> Any:
+        """
+        Encode the AST as nested lists
+        Operators and comparisons become [operator, left, right], operands their bare value,
+        or {attribute: value} for a tagged constant such as a date
+        """
+        if self.type == NodeType.OPERAND:
+            if self.attribute is not None:
+                return {self.attribute: self.value}
+            return self.value
+        return [self.operator.value, self.left.to_compact(), self.right.to_compact()]
+
+    @classmethod
+    def from_compact(cls, data: Any) -> 'Node':
+        operator = Operator(data[0])
+        if operator in (Operator.AND, Operator.OR):
+            return cls(
+                type=NodeType.OPERATOR,
+                operator=operator,
+                left=cls.from_compact(data[1]),
+                right=cls.from_compact(data[2])
+            )
+        return cls(
+            type=NodeType.COMPARISON,
+            operator=operator,
+            left=cls(type=NodeType.OPERAND, value=data[1]),
+            right=cls._compact_operand(data[2])
+        )
+
+    @classmethod
+    def _compact_operand(cls, data: Any) -> 'Node':
+        if isinstance(data, dict):
+            (attribute, value), = data.items()
+            return cls(type=NodeType.OPERAND, value=value, attribute=attribute)
+        return cls(type=NodeType.OPERAND, value=data)
+
     @classmethod
     def from_dict(cls, data: dict) -> 'Node':
         node = cls(
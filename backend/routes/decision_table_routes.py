@@ -0,0 +1,57 @@
+from typing import TYPE_CHECKING
+from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
+
+from models.rule_models import DecisionTableCreate, DecisionTableEvaluate
+from services.decision_table_service import DecisionTableService
+from services.admission import Lane, admission
+from storage.rule_store import RuleStore
+from database import get_rule_store, get_database
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
+router = APIRouter(prefix="/api/v1/tables", default_response_class=ORJSONResponse)
+
+async def get_decision_table_service(
+    database: 'AsyncIOMotorDatabase' = Depends(get_database),
+    store: RuleStore = Depends(get_rule_store)
+) -> DecisionTableService:
+    return DecisionTableService(database, store)
+
+@router.post("/")
+async def create_table(
+    table: DecisionTableCreate,
+    service: DecisionTableService = Depends(get_decision_table_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.create_table(table))
+
+@router.put("/{table_id}")
+async def update_table(
+    table_id: str,
+    table: DecisionTableCreate,
+    service: DecisionTableService = Depends(get_decision_table_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.update_table(table_id, table))
+
+@router.get("/{table_id}")
+async def get_table(
+    table_id: str,
+    service: DecisionTableService = Depends(get_decision_table_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.get_table(table_id))
+
+@router.get("/{table_id}/report")
+async def get_table_report(
+    table_id: str,
+    service: DecisionTableService = Depends(get_decision_table_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.get_table_report(table_id))
+
+@router.post("/{table_id}/evaluate", dependencies=[admission(Lane.SINGLE)])
+async def evaluate_table(
+    table_id: str,
+    evaluation: DecisionTableEvaluate,
+    service: DecisionTableService = Depends(get_decision_table_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.evaluate_table(table_id, evaluation.data))
@@ -0,0 +1,47 @@
+from typing import FrozenSet, TYPE_CHECKING
+from fastapi import APIRouter, Depends
+from fastapi.responses import ORJSONResponse
+
+from models.rule_models import JobCreate
+from services.job_service import JobService
+from storage.rule_store import RuleStore
+from database import get_rule_store, get_database, get_scored_collections
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
+router = APIRouter(prefix="/api/v1/jobs", default_response_class=ORJSONResponse)
+
+async def get_job_service(
+    database: 'AsyncIOMotorDatabase' = Depends(get_database),
+    store: RuleStore = Depends(get_rule_store),
+    collections: FrozenSet[str] = Depends(get_scored_collections)
+) -> JobService:
+    return JobService(database, store, collections)
+
+@router.post("/")
+async def submit_job(
+    job: JobCreate,
+    service: JobService = Depends(get_job_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.submit_job(job))
+
+@router.get("/")
+async def list_jobs(
+    service: JobService = Depends(get_job_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.list_jobs())
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    service: JobService = Depends(get_job_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.get_job(job_id))
+
+@router.delete("/{job_id}")
+async def cancel_job(
+    job_id: str,
+    service: JobService = Depends(get_job_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.cancel_job(job_id))
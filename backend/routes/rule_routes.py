@@ -1,58 +1,191 @@
-from fastapi import APIRouter, Depends
-from typing import Dict, Any
-from motor.motor_asyncio import AsyncIOMotorCollection
+import hashlib
+import orjson
+from typing import Dict, Any, Optional, FrozenSet, TYPE_CHECKING
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, WebSocket
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 
-from models.rule_models import RuleCreate, RuleCombine, RuleEvaluate
+from models.rule_models import (
+    RuleCreate, RuleCombine, RuleEvaluate, RuleSetEvaluate, RuleMatch, RuleProfile, AstFormat, ProfileFormat
+)
 from services.rule_service import RuleService
-from database import get_rules_collection
+from services.evaluation_session import EvaluationSession
+from services.collection_access import check_collection
+from services.admission import AdmissionController, Lane, admission, get_admission_controller
+from engine.decision_diagram import DEFAULT_MAX_NODES, MAX_NODES_LIMIT
+from storage.rule_store import RuleStore
+from database import get_rule_store, get_database, get_scored_collections
 
-router = APIRouter(prefix="/api/v1")
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
+# Handlers return ORJSONResponse directly so payloads skip jsonable_encoder
+router = APIRouter(prefix="/api/v1", default_response_class=ORJSONResponse)
 
 async def get_rule_service(
-    collection: AsyncIOMotorCollection = Depends(get_rules_collection)
+    store: RuleStore = Depends(get_rule_store)
 ) -> RuleService:
-    return RuleService(collection)
+    return RuleService(store)
 
 @router.post("/create/")
 async def create_rule(
     rule: RuleCreate,
+    ast: AstFormat = AstFormat.FULL,
     service: RuleService = Depends(get_rule_service)
-) -> Dict[str, Any]:
-    return await service.create_rule(rule)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.create_rule(rule, ast))
 
 @router.put("/update/{rule_id}")
 async def edit_rule(
     rule_id: str,
     rule: RuleCreate,
+    ast: AstFormat = AstFormat.FULL,
     service: RuleService = Depends(get_rule_service)
-) -> Dict[str, Any]:
-    return await service.edit_rule(rule_id, rule)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.edit_rule(rule_id, rule, ast))
 
 @router.post("/combine/")
 async def combine_rules(
     rules: RuleCombine,
+    ast: AstFormat = AstFormat.FULL,
     service: RuleService = Depends(get_rule_service)
-) -> Dict[str, Any]:
-    return await service.combine_rules(rules)
+) -> ORJSONResponse:
+    return ORJSONResponse(await service.combine_rules(rules, ast))
 
-@router.post("/evaluate/")
+@router.post("/evaluate/", dependencies=[admission(Lane.SINGLE)])
 async def evaluate_rule(
     evaluation: RuleEvaluate,
     service: RuleService = Depends(get_rule_service)
-) -> Dict[str, Any]:
-    return await service.evaluate_rule(evaluation.rule_id, evaluation.data)
+) -> ORJSONResponse:
+    return ORJSONResponse(
+        await service.evaluate_rule(evaluation.rule_id, evaluation.data)
+    )
+
+@router.post("/evaluate/rules/", dependencies=[admission(Lane.BATCH)])
+async def evaluate_rules(
+    evaluation: RuleSetEvaluate,
+    service: RuleService = Depends(get_rule_service)
+) -> ORJSONResponse:
+    return ORJSONResponse(
+        await service.evaluate_rules(evaluation.rule_ids, evaluation.data)
+    )
+
+@router.post("/evaluate/{rule_id}/raw", dependencies=[admission(Lane.SINGLE)])
+async def evaluate_raw(
+    rule_id: str,
+    request: Request,
+    service: RuleService = Depends(get_rule_service)
+) -> ORJSONResponse:
+    # The body is the record itself, read as a stream instead of being parsed into RuleEvaluate
+    return ORJSONResponse(
+        await service.evaluate_raw(rule_id, request.stream())
+    )
+
+@router.get("/admission/")
+async def get_admission_stats(
+    controller: AdmissionController = Depends(get_admission_controller)
+) -> ORJSONResponse:
+    return ORJSONResponse(controller.stats())
+
+@router.websocket("/ws/evaluate")
+async def evaluate_stream(
+    websocket: WebSocket,
+    service: RuleService = Depends(get_rule_service)
+) -> None:
+    # Rules are pinned once per connection, then records are streamed against them
+    await websocket.accept()
+    await EvaluationSession(service).run(websocket)
+
+@router.post("/match/count/", dependencies=[admission(Lane.BATCH)])
+async def count_matches(
+    match: RuleMatch,
+    service: RuleService = Depends(get_rule_service),
+    database: 'AsyncIOMotorDatabase' = Depends(get_database),
+    collections: FrozenSet[str] = Depends(get_scored_collections)
+) -> ORJSONResponse:
+    check_collection(match.collection, collections)
+    return ORJSONResponse(
+        await service.count_matches(match, database[match.collection])
+    )
+
+@router.post("/match/stream/")
+async def stream_matches(
+    match: RuleMatch,
+    service: RuleService = Depends(get_rule_service),
+    database: 'AsyncIOMotorDatabase' = Depends(get_database),
+    collections: FrozenSet[str] = Depends(get_scored_collections)
+) -> StreamingResponse:
+    check_collection(match.collection, collections)
+    # Build the filter up front so a bad rule fails before the stream starts
+    match_filter = await service.build_match_filter(match)
+    documents = service.stream_matches(match, match_filter, database[match.collection])
+
+    async def ndjson():
+        async for document in documents:
+            yield orjson.dumps(document, default=str) + b"\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 @router.get("/rule/{rule_id}")
 async def get_rule(
     rule_id: str,
+    if_none_match: Optional[str] = Header(None),
+    service: RuleService = Depends(get_rule_service)
+) -> Response:
+    rule = await service.get_rule(rule_id)
+    etag = f'"{rule["id"]}-{rule["version"]}"'
+    return _conditional_response(rule, etag, if_none_match)
+
+@router.get("/rule/{rule_id}/diagram")
+async def get_decision_diagram_report(
+    rule_id: str,
+    max_nodes: int = Query(DEFAULT_MAX_NODES, ge=1, le=MAX_NODES_LIMIT),
     service: RuleService = Depends(get_rule_service)
-) -> Dict[str, Any]:
-    return await service.get_rule(rule_id)
+) -> ORJSONResponse:
+    return ORJSONResponse(
+        await service.get_decision_diagram_report(rule_id, max_nodes)
+    )
+
+@router.post("/rule/{rule_id}/profile", dependencies=[admission(Lane.BATCH)])
+async def profile_rule(
+    rule_id: str,
+    sample: RuleProfile,
+    format: ProfileFormat = ProfileFormat.JSON,
+    service: RuleService = Depends(get_rule_service)
+) -> Response:
+    report, collapsed = await service.profile_rule(rule_id, sample)
+    if format == ProfileFormat.COLLAPSED:
+        # Input for flamegraph.pl, speedscope and the like
+        return PlainTextResponse(collapsed)
+    return ORJSONResponse(report)
 
 @router.get("/fetch/")
 async def list_rules(
     page: int = 1,
     limit: int = 10,
+    since: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
     service: RuleService = Depends(get_rule_service)
-) -> Dict[str, Any]:
-    return await service.get_rules(page, limit)
\ No newline at end of file
+) -> Response:
+    rules = await service.get_rules(page, limit, since)
+    # The page changes whenever one of its rules changes version or the total moves
+    fingerprint = orjson.dumps([
+        page, limit, since, rules["total"],
+        [(rule["id"], rule["version"]) for rule in rules["rules"]]
+    ])
+    etag = f'"{hashlib.sha1(fingerprint).hexdigest()}"'
+    return _conditional_response(rules, etag, if_none_match)
+
+def _conditional_response(
+    content: Dict[str, Any], 
+    etag: str, 
+    if_none_match: Optional[str]
+) -> Response:
+    """Return 304 when the client already holds this representation"""
+    headers = {"ETag": etag}
+    if if_none_match:
+        # If-None-Match uses weak comparison, so a W/ prefix still matches
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in candidates or etag in candidates:
+            return Response(status_code=304, headers=headers)
+    return ORJSONResponse(content, headers=headers)
+
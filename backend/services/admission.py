@@ -0,0 +1,167 @@
+"""
+Admission control for the evaluation endpoints.
+
+At most max_concurrency evaluations run at once, the rest wait in a bounded
+queue, in one of two lanes: single-record calls are always admitted before
+batch calls, which only get the slots single calls leave. Every waiter has a
+deadline, its lane's queue target, and a request is refused with 503 instead of
+queued when the queue is full, or when the wait it would see, estimated from the
+callers ahead of it and the recent time a slot is held, already exceeds the
+target. Under overload requests are shed at once rather than piling up on the
+event loop and the Mongo pool and raising latency for everyone.
+
+A slot freed while callers wait is handed straight to the next waiter, so a new
+arrival never overtakes the queue.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+from fastapi import Depends, HTTPException
+
+from database import Settings, get_settings
+
+
+class Lane(Enum):
+    SINGLE = "single"
+    BATCH = "batch"
+
+
+# Lanes in priority order
+LANES = (Lane.SINGLE, Lane.BATCH)
+
+# Weight of the latest slot hold in the service time average
+SERVICE_TIME_WEIGHT = 0.1
+RETRY_AFTER = "1"
+
+
+class AdmissionController:
+    """Bounded concurrency and a bounded, deadline-limited wait queue with priority lanes"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 64,
+        max_queue: int = 256,
+        queue_target: float = 0.05,
+        batch_queue_target: float = 0.5
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.targets = {Lane.SINGLE: queue_target, Lane.BATCH: batch_queue_target}
+        self.in_flight = 0
+        self.waiters: Dict[Lane, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        # Exponential average of how long a slot is held, in seconds
+        self.service_time = 0.0
+        self.admitted = {lane: 0 for lane in LANES}
+        self.shed = {lane: {"queue_full": 0, "overload": 0, "timeout": 0} for lane in LANES}
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'AdmissionController':
+        return cls(
+            max_concurrency=settings.admission_max_concurrency,
+            max_queue=settings.admission_max_queue,
+            queue_target=settings.admission_queue_target,
+            batch_queue_target=settings.admission_batch_queue_target
+        )
+
+    @asynccontextmanager
+    async def admit(self, lane: Lane) -> AsyncIterator[None]:
+        """Hold an evaluation slot for the body, HTTPException 503 when the request is shed"""
+        await self._acquire(lane)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - started
+            self.service_time += SERVICE_TIME_WEIGHT * (held - self.service_time)
+            self._release()
+
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self.waiters.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": {lane.value: len(self.waiters[lane]) for lane in LANES},
+            "queue_target_ms": {lane.value: self.targets[lane] * 1000 for lane in LANES},
+            "service_time_ms": self.service_time * 1000,
+            "admitted": {lane.value: self.admitted[lane] for lane in LANES},
+            "shed": {lane.value: dict(self.shed[lane]) for lane in LANES}
+        }
+
+    async def _acquire(self, lane: Lane) -> None:
+        # Waiters of this lane and the lanes before it are served first
+        ahead = sum(len(self.waiters[other]) for other in LANES[:LANES.index(lane) + 1])
+        if self.in_flight < self.max_concurrency and not ahead:
+            self.in_flight += 1
+            self.admitted[lane] += 1
+            return
+
+        if self.queued() >= self.max_queue:
+            self._refuse(lane, "queue_full")
+        target = self.targets[lane]
+        if (ahead + 1) * self.service_time / max(self.max_concurrency, 1) > target:
+            self._refuse(lane, "overload")
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[lane].append(future)
+        try:
+            await asyncio.wait({future}, timeout=target)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over as the caller went away
+                self._release()
+            else:
+                self._forget(lane, future)
+            raise
+        if not future.done():
+            self._forget(lane, future)
+            self._refuse(lane, "timeout")
+        self.admitted[lane] += 1
+
+    def _release(self) -> None:
+        for lane in LANES:
+            if self.waiters[lane]:
+                future = self.waiters[lane].popleft()
+                # The slot passes to the waiter, in_flight is unchanged
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _forget(self, lane: Lane, future: asyncio.Future) -> None:
+        self.waiters[lane].remove(future)
+        future.cancel()
+
+    def _refuse(self, lane: Lane, reason: str) -> None:
+        self.shed[lane][reason] += 1
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server overloaded ({reason}), retry later",
+            headers={"Retry-After": RETRY_AFTER}
+        )
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Dependency to get the worker's controller, configured from the settings and .env on first use"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController.from_settings(get_settings())
+    return _controller
+
+
+def admission(lane: Lane) -> Any:
+    """Route dependency holding an evaluation slot of lane while the handler runs"""
+    async def admitted(
+        controller: AdmissionController = Depends(get_admission_controller)
+    ) -> AsyncIterator[None]:
+        async with controller.admit(lane):
+            yield
+    return Depends(admitted)
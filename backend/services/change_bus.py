@@ -0,0 +1,32 @@
+from typing import Dict, Callable, Set
+
+# Called with the rule id and its new version
+Listener = Callable[[str, int], None]
+
+
+class ChangeBus:
+    """
+    Notifies listeners of rule changes made through this worker
+    Listeners run synchronously in publish, so they must not block
+    """
+
+    def __init__(self):
+        self._listeners: Dict[str, Set[Listener]] = {}
+
+    def subscribe(self, rule_id: str, listener: Listener) -> None:
+        self._listeners.setdefault(rule_id, set()).add(listener)
+
+    def unsubscribe(self, rule_id: str, listener: Listener) -> None:
+        listeners = self._listeners.get(rule_id)
+        if listeners:
+            listeners.discard(listener)
+            if not listeners:
+                del self._listeners[rule_id]
+
+    def publish(self, rule_id: str, version: int) -> None:
+        for listener in list(self._listeners.get(rule_id, ())):
+            listener(rule_id, version)
+
+
+# Shared by every service, like the compiled rule caches
+change_bus = ChangeBus()
@@ -0,0 +1,25 @@
+from typing import Any, AbstractSet
+from fastapi import HTTPException
+
+# Operators that run JavaScript on the database server
+FORBIDDEN_OPERATORS = frozenset({"$where", "$function", "$accumulator"})
+
+
+def check_collection(name: str, allowed: AbstractSet[str]) -> None:
+    """Refuse a caller-named collection that isn't configured for matching and jobs"""
+    if name not in allowed:
+        raise HTTPException(status_code=403, detail=f"Collection not allowed: {name}")
+
+
+def check_filter(filter: Any) -> None:
+    """Refuse a caller-supplied filter using a forbidden operator at any depth"""
+    stack = [filter]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            for key, value in current.items():
+                if key in FORBIDDEN_OPERATORS:
+                    raise HTTPException(status_code=400, detail=f"Operator not allowed in filter: {key}")
+                stack.append(value)
+        elif isinstance(current, list):
+            stack.extend(current)
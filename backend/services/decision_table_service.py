@@ -0,0 +1,163 @@
+from typing import Dict, Any, Union, TYPE_CHECKING
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+
+from models.rule_models import DecisionTableCreate, HitPolicy, Node
+from engine.rule_engine import RuleEngine
+from engine.decision_table import DecisionTable
+from services.eval_cache import TTLCache
+from storage.rule_store import RuleStore, as_rule_store
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+TABLES_COLLECTION = "decision_tables"
+
+# Compiled tables, keyed on the table revision and the rule version counter when compiled
+_compiled_tables = TTLCache(maxsize=100, ttl=None)
+
+
+class DecisionTableService:
+    def __init__(
+        self,
+        database: 'AsyncIOMotorDatabase',
+        rules: Union[RuleStore, 'AsyncIOMotorCollection']
+    ):
+        self.collection = database[TABLES_COLLECTION]
+        self.rules = as_rule_store(rules)
+        self.rule_engine = RuleEngine()
+
+    async def create_table(self, table: DecisionTableCreate) -> Dict[str, Any]:
+        """Create a decision table over stored rules"""
+        await self._check_rules(table)
+        table_doc = {
+            **self._table_fields(table),
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
+        }
+        result = await self.collection.insert_one(table_doc)
+        return {"id": str(result.inserted_id), "entries": len(table_doc["entries"])}
+
+    async def update_table(self, table_id: str, table: DecisionTableCreate) -> Dict[str, Any]:
+        """Replace the entries and settings of a decision table"""
+        await self._check_rules(table)
+        table_doc = {**self._table_fields(table), "updated_at": datetime.utcnow()}
+        try:
+            result = await self.collection.update_one(
+                {"_id": ObjectId(table_id)},
+                {"$set": table_doc}
+            )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail="Decision table not found")
+        return {"id": table_id, "entries": len(table_doc["entries"])}
+
+    async def get_table(self, table_id: str) -> Dict[str, Any]:
+        """Get a decision table, entries in priority order"""
+        return self._format_table(await self._find_table(table_id))
+
+    async def evaluate_table(self, table_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Find the entries of a table matching the data, by its hit policy"""
+        table = await self._find_table(table_id)
+        compiled = await self._compiled_table(table)
+        first_hit = table["hit_policy"] == HitPolicy.FIRST.value
+
+        try:
+            hits = [table["entries"][index] for index in compiled.evaluate(data, first_hit)]
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if first_hit:
+            hit = hits[0] if hits else None
+            return {
+                "id": table_id,
+                "hit_policy": table["hit_policy"],
+                "hit": hit,
+                "output": hit["output"] if hit else table.get("default")
+            }
+        return {
+            "id": table_id,
+            "hit_policy": table["hit_policy"],
+            "hits": hits,
+            "output": [hit["output"] for hit in hits]
+        }
+
+    async def get_table_report(self, table_id: str) -> Dict[str, Any]:
+        """Report how a table compiles into lookups"""
+        table = await self._find_table(table_id)
+        compiled = await self._compiled_table(table)
+        return {"id": table_id, **compiled.report()}
+
+    async def _find_table(self, table_id: str) -> Dict[str, Any]:
+        """Helper method to fetch a table or fail with 404"""
+        try:
+            table = await self.collection.find_one({"_id": ObjectId(table_id)})
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not table:
+            raise HTTPException(status_code=404, detail="Decision table not found")
+        return table
+
+    async def _check_rules(self, table: DecisionTableCreate) -> None:
+        """Helper method to verify every entry refers to a stored rule"""
+        rule_ids = [entry.rule_id for entry in table.entries]
+        try:
+            found = {str(rule["_id"]) for rule in await self.rules.find_many(rule_ids)}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        missing = [rule_id for rule_id in dict.fromkeys(rule_ids) if rule_id not in found]
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Rules not found: {', '.join(missing)}"
+            )
+
+    async def _compiled_table(self, table: Dict[str, Any]) -> DecisionTable:
+        """
+        Helper method to compile a table once per revision
+        Any rule change moves the version counter, which triggers a recompile
+        """
+        version = await self.rules.current_version()
+        key = (str(table["_id"]), table["updated_at"], version)
+        compiled = _compiled_tables.get(key)
+        if compiled is None:
+            rule_ids = [entry["rule_id"] for entry in table["entries"]]
+            rules = {str(rule["_id"]): rule for rule in await self.rules.find_many(rule_ids)}
+            missing = [rule_id for rule_id in rule_ids if rule_id not in rules]
+            if missing:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Table refers to missing rules: {', '.join(missing)}"
+                )
+            compiled = self.rule_engine.compile_decision_table([
+                Node.from_dict(rules[rule_id]["ast"]) for rule_id in rule_ids
+            ])
+            _compiled_tables.set(key, compiled)
+        return compiled
+
+    def _table_fields(self, table: DecisionTableCreate) -> Dict[str, Any]:
+        """Helper method to build the stored fields, entries sorted by descending priority"""
+        # sorted() is stable, so entries of equal priority keep their order
+        entries = sorted(table.entries, key=lambda entry: -entry.priority)
+        return {
+            "name": table.name,
+            "description": table.description,
+            "hit_policy": table.hit_policy.value,
+            "entries": [entry.model_dump() for entry in entries],
+            "default": table.default
+        }
+
+    def _format_table(self, table: Dict[str, Any]) -> Dict[str, Any]:
+        """Helper method to format table response"""
+        return {
+            "id": str(table["_id"]),
+            "name": table["name"],
+            "description": table.get("description"),
+            "hit_policy": table["hit_policy"],
+            "entries": table["entries"],
+            "default": table.get("default"),
+            "created_at": table["created_at"],
+            "updated_at": table["updated_at"]
+        }
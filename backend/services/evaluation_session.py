@@ -0,0 +1,254 @@
+"""
+Evaluation over a WebSocket, one session per connection.
+
+Messages are JSON objects with a "type":
+
+- {"type": "pin", "rule_ids": [...]} compiles the rules into the session's rule
+  set, answered with {"type": "pinned", "rules": [{"id", "version"}]}
+- {"type": "unpin", "rule_ids": [...]} drops them
+- {"type": "eval", "id": ..., "data": {...}} evaluates a record against every
+  pinned rule
+
+Clients may send many eval messages without waiting. The session evaluates
+whatever has queued up as one micro-batch and answers it with a single
+{"type": "results", "items": [{"id", "results", "matched"}]} frame, items in
+request order. When a pinned rule is edited the session recompiles it and sends
+{"type": "rule_changed", "rule_id", "version"}. Edits made through this worker
+arrive through the change bus at once, edits made by other workers are found by
+polling the version counter every POLL_INTERVAL seconds. Problems are reported
+as {"type": "error", "id", "detail"}, and binary frames are refused that way.
+"""
+
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Iterable
+import orjson
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+from models.rule_models import Node
+from engine.rule_set import RuleSet
+from services.rule_service import RuleService
+from services.change_bus import change_bus
+
+MAX_PENDING = 1024
+MAX_BATCH = 256
+POLL_INTERVAL = 2.0
+
+logger = logging.getLogger(__name__)
+
+# Inbox markers besides client messages
+_CLOSED = object()
+_CHANGED = object()
+
+
+class EvaluationSession:
+    def __init__(self, service: RuleService):
+        self.service = service
+        self.nodes: Dict[str, Node] = {}
+        self.versions: Dict[str, int] = {}
+        self.rule_set: Optional[RuleSet] = None
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING)
+        self.changed: Dict[str, int] = {}
+        self.closed = False
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def run(self, websocket: WebSocket) -> None:
+        """Serve the connection until the client disconnects"""
+        self.loop = asyncio.get_running_loop()
+        tasks = [
+            asyncio.create_task(self._receive(websocket)),
+            asyncio.create_task(self._poll_versions())
+        ]
+        try:
+            while True:
+                batch = [await self.inbox.get()]
+                while len(batch) < MAX_BATCH and not self.inbox.empty():
+                    batch.append(self.inbox.get_nowait())
+
+                for frame in await self._process([m for m in batch if m is not _CLOSED]):
+                    await websocket.send_text(frame.decode())
+                if self.closed and self.inbox.empty():
+                    return
+        except WebSocketDisconnect:
+            return
+        finally:
+            for task in tasks:
+                task.cancel()
+            for rule_id in self.nodes:
+                change_bus.unsubscribe(rule_id, self._on_change)
+
+    async def _receive(self, websocket: WebSocket) -> None:
+        """Queue client messages, blocking the client while the inbox is full"""
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                raw = message.get("text")
+                if raw is None:
+                    await self.inbox.put({"type": "invalid", "detail": "Messages must be JSON text frames"})
+                    continue
+                try:
+                    await self.inbox.put(orjson.loads(raw))
+                except orjson.JSONDecodeError as e:
+                    await self.inbox.put({"type": "invalid", "detail": f"Invalid JSON: {e}"})
+        finally:
+            self.closed = True
+            try:
+                self.inbox.put_nowait(_CLOSED)
+            except asyncio.QueueFull:
+                # run() sees closed once it drains the inbox
+                pass
+
+    async def _poll_versions(self) -> None:
+        """
+        Catch edits made by other workers, which the change bus doesn't see
+        A failed poll is logged and retried, seen only moves once its rules were checked
+        """
+        seen = None
+        while True:
+            try:
+                latest = await self.service.latest_version()
+                # Until a poll succeeds nothing is known, pinned rules are checked against their versions
+                if latest != seen and self.nodes:
+                    for rule in await self.service.find_rules(list(self.nodes)):
+                        rule_id = str(rule["_id"])
+                        version = rule.get("version", 0)
+                        if rule_id in self.versions and version != self.versions[rule_id]:
+                            self._notify_change(rule_id, version)
+                seen = latest
+            except Exception:
+                logger.exception("Polling rule versions failed, retrying")
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _on_change(self, rule_id: str, version: int) -> None:
+        # The edit may be published from another thread, whose loop can't wake ours
+        self.loop.call_soon_threadsafe(self._notify_change, rule_id, version)
+
+    def _notify_change(self, rule_id: str, version: int) -> None:
+        self.changed[rule_id] = version
+        try:
+            self.inbox.put_nowait(_CHANGED)
+        except asyncio.QueueFull:
+            # The pending batch picks the change up
+            pass
+
+    async def _process(self, batch: List[Any]) -> List[bytes]:
+        """Handle a batch in order, evaluating consecutive eval messages together"""
+        frames = []
+        evals = []
+        for message in batch:
+            if isinstance(message, dict) and message.get("type") == "eval":
+                evals.append(message)
+                continue
+            if evals:
+                frames.append(self._evaluate(evals))
+                evals = []
+            if message is _CHANGED:
+                continue
+            frames.append(await self._command(message))
+        if evals:
+            frames.append(self._evaluate(evals))
+        if self.changed:
+            frames.extend(await self._refresh())
+        return [frame for frame in frames if frame]
+
+    async def _command(self, message: Any) -> Optional[bytes]:
+        message_id = message.get("id") if isinstance(message, dict) else None
+        message_type = message.get("type") if isinstance(message, dict) else None
+        try:
+            if message_type == "pin":
+                return await self._pin(message.get("rule_ids") or [])
+            if message_type == "unpin":
+                return self._unpin(message.get("rule_ids") or [])
+            if message_type == "invalid":
+                return _error(None, message["detail"])
+            return _error(message_id, f"Unknown message type: {message_type}")
+        except HTTPException as e:
+            return _error(message_id, e.detail)
+        except Exception as e:
+            # e.g. a stored pattern that no longer compiles, the connection stays open
+            return _error(message_id, str(e))
+
+    async def _pin(self, rule_ids: List[str]) -> bytes:
+        rules = await self.service.find_rules(rule_ids)
+        found = {str(rule["_id"]): rule for rule in rules}
+        missing = [rule_id for rule_id in rule_ids if rule_id not in found]
+        if missing:
+            return _error(None, f"Rules not found: {', '.join(missing)}")
+
+        # Compile first so a rule that fails leaves the pinned set as it was
+        nodes = {**self.nodes, **{rule_id: Node.from_dict(rule["ast"]) for rule_id, rule in found.items()}}
+        rule_set = self.service.rule_engine.compile_rule_set(nodes)
+
+        for rule_id, rule in found.items():
+            if rule_id not in self.nodes:
+                change_bus.subscribe(rule_id, self._on_change)
+            self.versions[rule_id] = rule.get("version", 0)
+        self.nodes, self.rule_set = nodes, rule_set
+        return orjson.dumps({"type": "pinned", "rules": self._pinned()})
+
+    def _unpin(self, rule_ids: Iterable[str]) -> bytes:
+        for rule_id in rule_ids:
+            if self.nodes.pop(rule_id, None) is not None:
+                self.versions.pop(rule_id)
+                change_bus.unsubscribe(rule_id, self._on_change)
+        self._compile()
+        return orjson.dumps({"type": "pinned", "rules": self._pinned()})
+
+    async def _refresh(self) -> List[bytes]:
+        """Recompile pinned rules edited since the last batch"""
+        changed, self.changed = self.changed, {}
+        rule_ids = [rule_id for rule_id in changed if rule_id in self.nodes]
+        if not rule_ids:
+            return []
+
+        frames = []
+        try:
+            nodes = dict(self.nodes)
+            rules = await self.service.find_rules(rule_ids)
+            for rule in rules:
+                nodes[str(rule["_id"])] = Node.from_dict(rule["ast"])
+            rule_set = self.service.rule_engine.compile_rule_set(nodes)
+        except Exception as e:
+            return [_error(None, f"Can't recompile changed rules: {e}")]
+
+        self.nodes, self.rule_set = nodes, rule_set
+        for rule in rules:
+            rule_id = str(rule["_id"])
+            self.versions[rule_id] = rule.get("version", 0)
+            frames.append(orjson.dumps({
+                "type": "rule_changed",
+                "rule_id": rule_id,
+                "version": self.versions[rule_id]
+            }))
+        return frames
+
+    def _compile(self) -> None:
+        self.rule_set = self.service.rule_engine.compile_rule_set(self.nodes) if self.nodes else None
+
+    def _pinned(self) -> List[Dict[str, Any]]:
+        return [{"id": rule_id, "version": version} for rule_id, version in self.versions.items()]
+
+    def _evaluate(self, messages: List[Dict[str, Any]]) -> bytes:
+        """Evaluate a micro-batch of records, answered in one frame"""
+        items = []
+        for message in messages:
+            if self.rule_set is None:
+                items.append({"id": message.get("id"), "error": "No rules pinned"})
+                continue
+            try:
+                results = self.rule_set.evaluate(message.get("data") or {})
+            except Exception as e:
+                items.append({"id": message.get("id"), "error": str(e)})
+                continue
+            items.append({
+                "id": message.get("id"),
+                "results": results,
+                "matched": [rule_id for rule_id, result in results.items() if result]
+            })
+        return orjson.dumps({"type": "results", "items": items})
+
+
+def _error(message_id: Any, detail: str) -> bytes:
+    return orjson.dumps({"type": "error", "id": message_id, "detail": detail})
@@ -0,0 +1,220 @@
+import asyncio
+import time
+from typing import List, Dict, Optional, Any, Callable, Union, AbstractSet, TYPE_CHECKING
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+
+from models.rule_models import JobCreate, JobStatus, Node
+from engine.rule_engine import RuleEngine
+from storage.rule_store import RuleStore, as_rule_store
+from services.collection_access import check_collection, check_filter
+from services.decision_table_service import TABLES_COLLECTION
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+# Jobs run in the worker that accepted them, so the registry is per process
+_jobs: Dict[str, 'ScoringJob'] = {}
+
+# Finished jobs are forgotten after FINISHED_JOB_TTL seconds, and beyond the newest MAX_FINISHED_JOBS
+FINISHED_JOB_TTL = 3600
+MAX_FINISHED_JOBS = 100
+
+
+class ScoringJob:
+    """State and progress of one dataset-scoring run"""
+
+    def __init__(self, job: JobCreate, result_collection: str, total: int):
+        self.id = str(ObjectId())
+        self.rule_id = job.rule_id
+        self.source_collection = job.source_collection
+        self.result_collection = result_collection
+        self.filter = job.filter or {}
+        self.batch_size = job.batch_size
+        self.status = JobStatus.PENDING
+        self.total = total
+        self.processed = 0
+        self.matched = 0
+        self.errors = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+    def progress(self) -> Dict[str, Any]:
+        """Snapshot of the job with throughput and ETA"""
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        throughput = self.processed / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.processed, 0)
+        eta = remaining / throughput if throughput > 0 and self.status == JobStatus.RUNNING else None
+
+        return {
+            "id": self.id,
+            "rule_id": self.rule_id,
+            "source_collection": self.source_collection,
+            "result_collection": self.result_collection,
+            "status": self.status.value,
+            "total": self.total,
+            "processed": self.processed,
+            "matched": self.matched,
+            "errors": self.errors,
+            "error": self.error,
+            "progress": self.processed / self.total if self.total else 1.0,
+            "elapsed_seconds": elapsed,
+            "throughput_per_second": throughput,
+            "eta_seconds": eta,
+            "created_at": self.created_at
+        }
+
+
+class JobService:
+    def __init__(
+        self,
+        database: 'AsyncIOMotorDatabase',
+        rules: Union[RuleStore, 'AsyncIOMotorCollection'],
+        collections: AbstractSet[str]
+    ):
+        self.database = database
+        self.rules = as_rule_store(rules)
+        # Jobs read and write only configured collections, never the rules or decision tables
+        rules_collection = getattr(self.rules, "collection", None)
+        reserved = {TABLES_COLLECTION, getattr(rules_collection, "name", None)}
+        self.collections = frozenset(collections) - reserved
+        self.rule_engine = RuleEngine()
+
+    async def submit_job(self, job: JobCreate) -> Dict[str, Any]:
+        """Validate and start a scoring job, returning its id"""
+        result_collection = job.result_collection or f"{job.source_collection}_scores"
+        check_collection(job.source_collection, self.collections)
+        check_collection(result_collection, self.collections)
+        if job.filter:
+            check_filter(job.filter)
+        try:
+            rule = await self.rules.find_one(job.rule_id)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not rule:
+            raise HTTPException(status_code=404, detail="Rule not found")
+
+        try:
+            node = Node.from_dict(rule["ast"])
+            compiled = self.rule_engine.compile_rule(node, decision_diagram=job.decision_diagram)
+            # Only the fields the rule reads are fetched from the source
+            projection = self.rule_engine.referenced_fields(node)
+        except Exception as e:
+            # e.g. a stored pattern the regex guard now refuses
+            raise HTTPException(status_code=400, detail=str(e))
+
+        source = self.database[job.source_collection]
+        total = await source.count_documents(job.filter or {})
+
+        scoring_job = ScoringJob(job, result_collection, total)
+        _prune_jobs()
+        _jobs[scoring_job.id] = scoring_job
+        scoring_job.task = asyncio.create_task(
+            self._run(scoring_job, compiled, projection, source, self.database[result_collection])
+        )
+        return {"job_id": scoring_job.id, "status": scoring_job.status.value, "total": total}
+
+    async def _run(
+        self,
+        job: ScoringJob,
+        compiled: Callable[[Dict[str, Any]], bool],
+        projection: List[str],
+        source: 'AsyncIOMotorCollection',
+        results: 'AsyncIOMotorCollection'
+    ) -> None:
+        """Read the source in cursor batches, score each chunk and write it in one batch"""
+        job.status = JobStatus.RUNNING
+        job.started_at = time.monotonic()
+        try:
+            cursor = source.find(job.filter, projection, batch_size=job.batch_size)
+            chunk = []
+            async for document in cursor:
+                chunk.append(document)
+                if len(chunk) >= job.batch_size:
+                    await self._score_chunk(job, compiled, chunk, results)
+                    chunk = []
+            if chunk:
+                await self._score_chunk(job, compiled, chunk, results)
+            job.status = JobStatus.COMPLETED
+        except asyncio.CancelledError:
+            job.status = JobStatus.CANCELLED
+            raise
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.monotonic()
+
+    async def _score_chunk(
+        self,
+        job: ScoringJob,
+        compiled: Callable[[Dict[str, Any]], bool],
+        chunk: List[Dict[str, Any]],
+        results: 'AsyncIOMotorCollection'
+    ) -> None:
+        scored = []
+        for document in chunk:
+            result_doc = {"job_id": job.id, "rule_id": job.rule_id, "source_id": document["_id"]}
+            try:
+                result_doc["result"] = compiled(document)
+                job.matched += result_doc["result"]
+            except Exception as e:
+                # A record the rule can't compare (e.g. non-numeric value for '>') is kept as an error
+                result_doc["result"] = None
+                result_doc["error"] = str(e)
+                job.errors += 1
+            scored.append(result_doc)
+
+        await results.insert_many(scored, ordered=False)
+        job.processed += len(chunk)
+
+    async def get_job(self, job_id: str) -> Dict[str, Any]:
+        """Get the progress of a job"""
+        job = _jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job.progress()
+
+    async def list_jobs(self) -> Dict[str, Any]:
+        """Get the progress of every job known to this worker"""
+        _prune_jobs()
+        return {"jobs": [job.progress() for job in _jobs.values()]}
+
+    async def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a pending or running job"""
+        job = _jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job.task and not job.task.done():
+            job.task.cancel()
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+        if job.status == JobStatus.PENDING:
+            # Cancelled before its first step ran
+            job.status = JobStatus.CANCELLED
+            job.finished_at = time.monotonic()
+        return job.progress()
+
+
+def _prune_jobs() -> None:
+    """Forget finished jobs past their TTL, then all but the newest MAX_FINISHED_JOBS"""
+    now = time.monotonic()
+    finished = sorted(
+        (job for job in _jobs.values() if job.finished() and job.finished_at is not None),
+        key=lambda job: job.finished_at
+    )
+    expired = [job for job in finished if now - job.finished_at > FINISHED_JOB_TTL]
+    kept = finished[len(expired):]
+    for job in expired + kept[:max(len(kept) - MAX_FINISHED_JOBS, 0)]:
+        del _jobs[job.id]
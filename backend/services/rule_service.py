@@ -1,70 +1,124 @@
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, AsyncIterator, Callable, Tuple, Union, TYPE_CHECKING
 from datetime import datetime
-from bson import ObjectId
-from motor.motor_asyncio import AsyncIOMotorCollection
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 
-from models.rule_models import RuleCreate, RuleCombine, Node, Operator
+from models.rule_models import RuleCreate, RuleCombine, RuleMatch, RuleProfile, Node, Operator, AstFormat
 from engine.rule_engine import RuleEngine
+from engine.decision_diagram import DiagramTooLarge, DEFAULT_MAX_NODES, ast_size
+from engine.mongo_filter import to_mongo_filter
+from engine.field_path import compile_accessor
+from engine.partial_json import PartialJSONExtractor
+from engine.rule_set import RuleSet
+from engine.profiler import RuleProfiler
+from services.eval_cache import TTLCache
+from services.change_bus import change_bus
+from services.collection_access import check_filter
+from storage.rule_store import RuleStore, as_rule_store
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
+# Shared by every RuleService, a service is created per request
+_compiled_rules = TTLCache(maxsize=1000, ttl=None)
+_evaluation_cache = TTLCache(maxsize=100000, ttl=300)
+_rule_sets = TTLCache(maxsize=100, ttl=None)
+# Compiled subtrees by structural key, so an edited rule only compiles the subtrees it changed
+_compiled_fragments = TTLCache(maxsize=10000, ttl=None)
+
+def _freeze(value: Any) -> Any:
+    """Hashable cache key for a record value, typed since 1, 1.0 and True compare differently"""
+    if isinstance(value, dict):
+        return ("dict", tuple((k, _freeze(v)) for k, v in sorted(value.items())))
+    if isinstance(value, list):
+        return ("list", tuple(_freeze(v) for v in value))
+    return (type(value).__name__, value)
 
 class RuleService:
-    def __init__(self, collection: AsyncIOMotorCollection):
-        self.collection = collection
-        self.rule_engine = RuleEngine()
+    def __init__(self, store: Union[RuleStore, 'AsyncIOMotorCollection']):
+        # A Motor collection is wrapped in the Mongo store
+        self.store = as_rule_store(store)
+        self.collection = getattr(self.store, "collection", None)
+        self.rule_engine = RuleEngine(_compiled_fragments)
 
-    async def create_rule(self, rule: RuleCreate) -> Dict[str, Any]:
+    async def create_rule(
+        self, 
+        rule: RuleCreate, 
+        ast_format: AstFormat = AstFormat.FULL
+    ) -> Dict[str, Any]:
         """Create a new rule"""
         try:
             # Validate and create AST
             ast = self.rule_engine.create_rule(rule.rule_string)
+            ast_dict = ast.to_dict()
             
             # Prepare document
             rule_doc = {
                 "name": rule.name,
                 "description": rule.description,
                 "rule_string": rule.rule_string,
-                "ast": ast.to_dict(),
+                "ast": ast_dict,
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow()
             }
             
-            result = await self.collection.insert_one(rule_doc)
+            rule_id = await self.store.insert(rule_doc)
             return {
-                "id": str(result.inserted_id),
-                "ast": ast.to_dict()
+                "id": rule_id,
+                "version": rule_doc["version"],
+                **self._ast_payload(ast, ast_dict, ast_format)
             }
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
-    async def edit_rule(self, rule_id: str, rule: RuleCreate) -> Dict[str, Any]:
+    async def edit_rule(
+        self, 
+        rule_id: str, 
+        rule: RuleCreate, 
+        ast_format: AstFormat = AstFormat.FULL
+    ) -> Dict[str, Any]:
         """Edit an existing rule"""
         try:
             ast = self.rule_engine.create_rule(rule.rule_string)
+            ast_dict = ast.to_dict()
             
             rule_doc = {
                 "name": rule.name,
                 "description": rule.description,
                 "rule_string": rule.rule_string,
-                "ast": ast.to_dict(),
+                "ast": ast_dict,
+                # A combined rule edited by hand no longer follows its parents
+                "operator": None,
                 "updated_at": datetime.utcnow()
             }
             
-            result = await self.collection.update_one(
-                {"_id": ObjectId(rule_id)}, 
-                {"$set": rule_doc}
-            )
+            # Derived rules are rebuilt up front, so one that can't be leaves everything unchanged
+            recombined = await self._plan_recombination(rule_id, rule_doc)
+            version = await self.store.update(rule_id, rule_doc)
             
-            if result.modified_count == 0:
+            if version is None:
                 raise HTTPException(
                     status_code=404, 
                     detail="Rule not found or no changes made"
                 )
+            change_bus.publish(rule_id, version)
             
-            return {"id": rule_id, "ast": ast.to_dict()}
+            return {
+                "id": rule_id, 
+                "version": version, 
+                **self._ast_payload(ast, ast_dict, ast_format),
+                "recombined": await self._save_recombined(recombined)
+            }
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
-    async def combine_rules(self, rules_data: RuleCombine) -> Dict[str, Any]:
+    async def combine_rules(
+        self, 
+        rules_data: RuleCombine, 
+        ast_format: AstFormat = AstFormat.FULL
+    ) -> Dict[str, Any]:
         """Combine multiple rules into one"""
         try:
             # Validate rule count
@@ -82,21 +136,12 @@ class RuleService:
                     detail="One or more rules not found"
                 )
 
-            # Create nodes from stored ASTs
-            nodes = [Node.from_dict(rule["ast"]) for rule in rules]
-            
-            # Create the combined rule string
-            original_rules = [rule["rule_string"] for rule in rules]
-            combined_rule_string = f" {rules_data.operator} ".join(
-                f"({rule})" for rule in original_rules
-            )
-
-            # Combine rules
+            # Combine in the order the rules were given
+            operator = Operator(rules_data.operator.value)
+            order = {rule_id: index for index, rule_id in enumerate(rules_data.rule_ids)}
+            rules.sort(key=lambda rule: order.get(str(rule["_id"]), len(order)))
             try:
-                combined_ast = self.rule_engine.combine_rules(
-                    nodes, 
-                    Operator(rules_data.operator)
-                )
+                combined_ast, combined_rule_string = self._combine(rules, operator)
             except Exception as e:
                 raise HTTPException(
                     status_code=400,
@@ -104,23 +149,27 @@ class RuleService:
                 )
 
             # Save combined rule
+            combined_ast_dict = combined_ast.to_dict()
             rule_doc = {
                 "name": rules_data.name,
                 "description": rules_data.description,
                 "rule_string": combined_rule_string,
-                "ast": combined_ast.to_dict(),
+                "ast": combined_ast_dict,
                 "parent_rules": [str(rule["_id"]) for rule in rules],
+                # Kept so the rule can be recombined when a parent is edited
+                "operator": operator.value,
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow()
             }
             
-            result = await self.collection.insert_one(rule_doc)
+            rule_id = await self.store.insert(rule_doc)
             return {
-                "id": str(result.inserted_id),
+                "id": rule_id,
                 "name": rules_data.name,
                 "description": rules_data.description,
                 "rule_string": combined_rule_string,
-                "ast": combined_ast.to_dict()
+                "version": rule_doc["version"],
+                **self._ast_payload(combined_ast, combined_ast_dict, ast_format)
             }
         except HTTPException:
             raise
@@ -134,60 +183,377 @@ class RuleService:
     ) -> Dict[str, Any]:
         """Evaluate a rule against provided data"""
         try:
-            rule = await self.collection.find_one({"_id": ObjectId(rule_id)})
+            rule = await self.store.find_one(rule_id)
             if not rule:
                 raise HTTPException(status_code=404, detail="Rule not found")
-            
-            node = Node.from_dict(rule["ast"])
-            result = self.rule_engine.evaluate_rule(node, data)
-            
-            return {
-                "result": result,
-                "rule_name": rule["name"],
-                "rule_string": rule["rule_string"]
-            }
+            return self._evaluate(rule_id, rule, data)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def evaluate_rules(
+        self, 
+        rule_ids: List[str], 
+        data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Evaluate several rules against the same data, compiled together as a rule set"""
+        rules = await self._find_multiple_rules(rule_ids)
+        by_id = {str(rule["_id"]): rule for rule in rules}
+        missing = [rule_id for rule_id in rule_ids if rule_id not in by_id]
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Rules not found: {', '.join(missing)}"
+            )
+
+        try:
+            rule_set = self._compiled_rule_set(rule_ids, by_id)
+            results = rule_set.evaluate(data)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {
+            "results": results,
+            "matched": [rule_id for rule_id, result in results.items() if result]
+        }
+
+    async def evaluate_raw(
+        self, 
+        rule_id: str, 
+        body: AsyncIterator[bytes]
+    ) -> Dict[str, Any]:
+        """
+        Evaluate a rule against a raw JSON record
+        Only the top-level keys the rule reads are extracted, the rest is skipped unparsed
+        """
+        try:
+            rule = await self.store.find_one(rule_id)
+            if not rule:
+                raise HTTPException(status_code=404, detail="Rule not found")
+
+            _, fields, _ = self._compiled_rule(rule_id, rule)
+            # A dotted path reads either the literal key or its first segment
+            keys = {key for field in fields for key in (field, field.split('.', 1)[0])}
+            extractor = PartialJSONExtractor(keys)
+            async for chunk in body:
+                extractor.feed(chunk)
+                if extractor.done:
+                    break
+            return self._evaluate(rule_id, rule, extractor.close())
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
+    async def build_match_filter(self, match: RuleMatch) -> Dict[str, Any]:
+        """Translate a stored rule into a MongoDB filter for a scored collection"""
+        if match.filter:
+            check_filter(match.filter)
+        rule = await self.store.find_one(match.rule_id)
+        if not rule:
+            raise HTTPException(status_code=404, detail="Rule not found")
+
+        try:
+            rule_filter = to_mongo_filter(
+                Node.from_dict(rule["ast"]), 
+                match.coerce_numeric_strings
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if match.filter:
+            return {"$and": [match.filter, rule_filter]}
+        return rule_filter
+
+    async def count_matches(
+        self, 
+        match: RuleMatch, 
+        target: 'AsyncIOMotorCollection'
+    ) -> Dict[str, Any]:
+        """Count documents of a collection matching a rule, evaluated server-side"""
+        match_filter = await self.build_match_filter(match)
+        count = await target.count_documents(match_filter)
+        return {"count": count, "filter": match_filter}
+
+    async def stream_matches(
+        self, 
+        match: RuleMatch, 
+        match_filter: Dict[str, Any], 
+        target: 'AsyncIOMotorCollection', 
+        batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over documents of a collection matching a filter from build_match_filter"""
+        cursor = target.find(match_filter, match.projection, batch_size=batch_size)
+        if match.limit:
+            cursor = cursor.limit(match.limit)
+        async for document in cursor:
+            yield document
+
+    async def get_decision_diagram_report(
+        self, 
+        rule_id: str, 
+        max_nodes: int = DEFAULT_MAX_NODES
+    ) -> Dict[str, Any]:
+        """Report AST and decision diagram sizes for a rule"""
+        rule = await self.store.find_one(rule_id)
+        if not rule:
+            raise HTTPException(status_code=404, detail="Rule not found")
+
+        node = Node.from_dict(rule["ast"])
+        try:
+            report = self.rule_engine.compile_decision_diagram(node, max_nodes).report()
+            report["fallback"] = False
+        except DiagramTooLarge:
+            # Evaluation falls back to the regular evaluator for this rule
+            report = {
+                "ast_nodes": ast_size(node),
+                "predicates": None,
+                "diagram_nodes": None,
+                "fallback": True
+            }
+        return {"id": rule_id, "max_nodes": max_nodes, **report}
+
+    async def profile_rule(
+        self, 
+        rule_id: str, 
+        sample: RuleProfile
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Evaluate a rule over sample records with per-node counters and timings
+        Returns the annotated tree report and its collapsed stacks, bypassing the evaluation cache
+        """
+        rule = await self.store.find_one(rule_id)
+        if not rule:
+            raise HTTPException(status_code=404, detail="Rule not found")
+
+        def profile() -> RuleProfiler:
+            profiler = self.rule_engine.profile_rule(Node.from_dict(rule["ast"]))
+            for _ in range(sample.repeat):
+                profiler.run(sample.records)
+            return profiler
+
+        try:
+            # Up to MAX_PROFILE_EVALUATIONS evaluations, off the event loop
+            profiler = await run_in_threadpool(profile)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        report = {
+            "id": rule_id,
+            "version": rule.get("version", 0),
+            "rule_string": rule["rule_string"],
+            "repeat": sample.repeat,
+            **profiler.report()
+        }
+        return report, profiler.collapsed()
+
     async def get_rules(
         self, 
         page: int = 1, 
-        limit: int = 10
+        limit: int = 10, 
+        since: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Get paginated list of rules"""
+        """
+        Get paginated list of rules
+        With since, only rules changed after that version, oldest change first
+        """
         skip = (page - 1) * limit
-        total = await self.collection.count_documents({})
-        
-        rules = await self.collection.find() \
-            .skip(skip) \
-            .limit(limit) \
-            .to_list(length=limit)
+        # Rules past a write still in flight are left for the next sync, or its rule would be skipped
+        until = await self.store.current_version() if since is not None else None
+        total, rules = await self.store.find_page(skip, limit, since, until)
         
-        return {
-            "rules": [self._format_rule_response(rule) for rule in rules],
+        formatted = [self._format_rule_response(rule) for rule in rules]
+        response = {
+            "rules": formatted,
             "total": total,
             "page": page,
             "pages": (total + limit - 1) // limit
         }
+        if since is not None:
+            # Clients resume from the highest version they have seen
+            response["latest_version"] = max(
+                [rule["version"] for rule in formatted], default=since
+            )
+        return response
 
     async def get_rule(self, rule_id: str) -> Dict[str, Any]:
         """Get a single rule by ID"""
-        rule = await self.collection.find_one({"_id": ObjectId(rule_id)})
+        rule = await self.store.find_one(rule_id)
         if not rule:
             raise HTTPException(status_code=404, detail="Rule not found")
         return self._format_rule_response(rule)
 
+    async def find_rules(self, rule_ids: List[str]) -> List[Dict]:
+        """Get the stored documents of the rules among rule_ids that exist"""
+        return await self._find_multiple_rules(rule_ids)
+
+    async def latest_version(self) -> int:
+        """Version up to which every worker's rule writes have finished"""
+        return await self.store.current_version()
+
     async def _find_multiple_rules(self, rule_ids: List[str]) -> List[Dict]:
         """Helper method to find multiple rules by IDs"""
         try:
-            object_ids = [ObjectId(id) for id in rule_ids]
-            rules = await self.collection.find(
-                {"_id": {"$in": object_ids}}
-            ).to_list(length=None)
-            return rules
+            return await self.store.find_many(rule_ids)
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
+    def _combine(self, rules: List[Dict], operator: Operator) -> Tuple[Node, str]:
+        """Helper method to combine stored rules into one AST and rule string"""
+        nodes = [Node.from_dict(rule["ast"]) for rule in rules]
+        rule_string = f" {operator.value} ".join(f"({rule['rule_string']})" for rule in rules)
+        return self.rule_engine.combine_rules(nodes, operator), rule_string
+
+    async def _plan_recombination(
+        self, 
+        rule_id: str, 
+        rule_doc: Dict
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Helper method to rebuild the combined rules derived from an edited rule, without saving them
+        A combined rule is created after its parents, so rebuilding in creation order
+        always reads parents that are already rebuilt
+        """
+        descendants: Dict[str, Dict] = {}
+        pending = [rule_id]
+        while pending:
+            for child in await self.store.find_children(pending.pop()):
+                child_id = str(child["_id"])
+                if child_id not in descendants:
+                    descendants[child_id] = child
+                    pending.append(child_id)
+
+        # Rules as they will be once the edit and the rebuilt rules before them are saved
+        rebuilt: Dict[str, Dict] = {rule_id: rule_doc}
+        planned = []
+        for child_id, child in sorted(
+            descendants.items(), key=lambda item: (item[1]["created_at"], item[0])
+        ):
+            # Edited by hand, or combined before the operator was stored
+            if not child.get("operator"):
+                continue
+            stored = [parent_id for parent_id in child["parent_rules"] if parent_id not in rebuilt]
+            parents_by_id = {
+                str(parent["_id"]): parent 
+                for parent in (await self._find_multiple_rules(stored) if stored else [])
+            }
+            parents_by_id.update(rebuilt)
+            if any(parent_id not in parents_by_id for parent_id in child["parent_rules"]):
+                continue
+            parents = [parents_by_id[parent_id] for parent_id in child["parent_rules"]]
+
+            try:
+                ast, rule_string = self._combine(parents, Operator(child["operator"]))
+            except Exception as e:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Can't recombine derived rule {child_id}: {str(e)}"
+                )
+            fields = {
+                "rule_string": rule_string,
+                "ast": ast.to_dict(),
+                "updated_at": datetime.utcnow()
+            }
+            rebuilt[child_id] = fields
+            planned.append((child_id, fields))
+        return planned
+
+    async def _save_recombined(
+        self, 
+        planned: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Helper method to save the rules rebuilt by _plan_recombination"""
+        recombined = []
+        for child_id, fields in planned:
+            version = await self.store.update(child_id, fields)
+            if version is not None:
+                change_bus.publish(child_id, version)
+                recombined.append({"id": child_id, "version": version})
+        return recombined
+
+    def _compiled_rule(
+        self, 
+        rule_id: str, 
+        rule: Dict
+    ) -> Tuple[Callable[[Dict[str, Any]], bool], List[str], List[str]]:
+        """Helper method to compile a stored rule once per revision"""
+        key = (rule_id, rule.get("version"), rule.get("updated_at"))
+        entry = _compiled_rules.get(key)
+        if entry is None:
+            node = Node.from_dict(rule["ast"])
+            entry = (
+                self.rule_engine.compile_rule(node),
+                self.rule_engine.referenced_fields(node),
+                self.rule_engine.required_fields(node)
+            )
+            _compiled_rules.set(key, entry)
+        return entry
+
+    def _compiled_rule_set(
+        self, 
+        rule_ids: List[str], 
+        rules: Dict[str, Dict]
+    ) -> RuleSet:
+        """Helper method to compile a rule set once per combination of revisions"""
+        rule_ids = list(dict.fromkeys(rule_ids))
+        key = tuple(
+            (rule_id, rules[rule_id].get("version"), rules[rule_id].get("updated_at")) 
+            for rule_id in rule_ids
+        )
+        rule_set = _rule_sets.get(key)
+        if rule_set is None:
+            rule_set = self.rule_engine.compile_rule_set({
+                rule_id: Node.from_dict(rules[rule_id]["ast"]) for rule_id in rule_ids
+            })
+            _rule_sets.set(key, rule_set)
+        return rule_set
+
+    def _evaluate(
+        self, 
+        rule_id: str, 
+        rule: Dict, 
+        data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Helper method to evaluate a stored rule, through the evaluation cache"""
+        compiled, fields, required = self._compiled_rule(rule_id, rule)
+        values = {field: compile_accessor(field)(data) for field in fields}
+
+        # A missing required field makes the rule False, no need to evaluate
+        missing = [field for field in required if values[field] is None]
+        if missing:
+            return {
+                "result": False,
+                "rule_name": rule["name"],
+                "rule_string": rule["rule_string"],
+                "missing_fields": missing
+            }
+
+        # Repeat checks of the same values hit the cache, keyed on the fields the rule reads
+        cache_key = (rule_id, rule.get("version"), rule.get("updated_at"), 
+                     tuple(_freeze(values[field]) for field in fields))
+        try:
+            result = _evaluation_cache.get(cache_key)
+        except TypeError:
+            cache_key, result = None, None
+        if result is None:
+            result = compiled(data)
+            if cache_key is not None:
+                _evaluation_cache.set(cache_key, result)
+        
+        return {
+            "result": result,
+            "rule_name": rule["name"],
+            "rule_string": rule["rule_string"]
+        }
+
+    def _ast_payload(
+        self, 
+        ast: Node, 
+        ast_dict: Dict, 
+        ast_format: AstFormat
+    ) -> Dict[str, Any]:
+        """Helper method to encode the AST of a response in the requested format"""
+        if ast_format == AstFormat.NONE:
+            return {}
+        if ast_format == AstFormat.COMPACT:
+            return {"ast": ast.to_compact()}
+        return {"ast": ast_dict}
+
     def _format_rule_response(self, rule: Dict) -> Dict:
         """Helper method to format rule response"""
         return {
@@ -197,5 +563,6 @@ class RuleService:
             "rule_string": rule["rule_string"],
             "created_at": rule["created_at"],
             "updated_at": rule["updated_at"],
-            "parent_rules": rule.get("parent_rules", [])
+            "parent_rules": rule.get("parent_rules", []),
+            "version": rule.get("version", 0)
         }
\ No newline at end of file
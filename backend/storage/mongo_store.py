@@ -0,0 +1,155 @@
+from typing import List, Dict, Optional, Any, Tuple
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from storage.rule_store import RuleStore
+
+# Versions come from a counter document kept in the rules collection
+VERSION_COUNTER_ID = "rule_version"
+# A write still pending after this long is taken to have died with its worker
+STALE_WRITE = timedelta(seconds=60)
+
+
+class MongoRuleStore(RuleStore):
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def find_one(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": ObjectId(rule_id)})
+
+    async def find_many(self, rule_ids: List[str]) -> List[Dict[str, Any]]:
+        object_ids = [ObjectId(id) for id in rule_ids]
+        return await self.collection.find(
+            {"_id": {"$in": object_ids}}
+        ).to_list(length=None)
+
+    async def find_children(self, rule_id: str) -> List[Dict[str, Any]]:
+        # Ids first, most rules have no children and then the lookup ends here
+        object_ids = list(await self.collection.distinct("_id", {"parent_rules": rule_id}))
+        if not object_ids:
+            return []
+        return await self.collection.find(
+            {"_id": {"$in": object_ids}}
+        ).to_list(length=None)
+
+    async def insert(self, rule_doc: Dict[str, Any]) -> str:
+        rule_doc["version"], token = await self._begin_write()
+        try:
+            result = await self.collection.insert_one(rule_doc)
+        finally:
+            await self._end_write(token)
+        return str(result.inserted_id)
+
+    async def update(self, rule_id: str, fields: Dict[str, Any]) -> Optional[int]:
+        # Only matches when a field would change, so a no-op edit leaves the rule as it is
+        differs = [
+            {field: {"$ne": value}} 
+            for field, value in fields.items() 
+            if field not in ("version", "updated_at")
+        ]
+        if not differs:
+            return None
+        version, token = await self._begin_write()
+        try:
+            result = await self.collection.update_one(
+                {"_id": ObjectId(rule_id), "$or": differs}, 
+                {"$set": {**fields, "version": version}}
+            )
+        finally:
+            await self._end_write(token)
+        return version if result.modified_count > 0 else None
+
+    async def find_page(
+        self, 
+        skip: int, 
+        limit: int, 
+        since: Optional[int] = None,
+        until: Optional[int] = None
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        query = {"_id": {"$ne": VERSION_COUNTER_ID}}
+        if since is not None:
+            query["version"] = {"$gt": since}
+            if until is not None:
+                query["version"]["$lte"] = until
+        total = await self.collection.count_documents(query)
+
+        cursor = self.collection.find(query)
+        if since is not None:
+            cursor = cursor.sort("version", 1)
+        rules = await cursor \
+            .skip(skip) \
+            .limit(limit) \
+            .to_list(length=limit)
+        return total, rules
+
+    async def current_version(self) -> int:
+        counter = await self.collection.find_one({"_id": VERSION_COUNTER_ID})
+        if not counter:
+            return 0
+        # A write below the counter may still land, so only versions before the oldest one count
+        settled = counter["settled"] if "settled" in counter else 0
+        return max(settled, _settled(counter))
+
+    async def _begin_write(self) -> Tuple[int, ObjectId]:
+        """Allocate the next version, marking a write in flight until _end_write"""
+        # The token's ObjectId timestamp dates the write, and pending keeps tokens in version order
+        token = ObjectId()
+        counter = await self.collection.find_one_and_update(
+            {"_id": VERSION_COUNTER_ID},
+            {"$inc": {"seq": 1}, "$push": {"pending": token}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        # Until the version is recorded too, the write holds back every version from the previous settle
+        await self.collection.find_one_and_update(
+            {"_id": VERSION_COUNTER_ID},
+            {"$push": {"versions": {"token": token, "version": counter["seq"]}}}
+        )
+        return counter["seq"], token
+
+    async def _end_write(self, token: ObjectId) -> None:
+        """
+        Clear a write once it has finished or failed
+        Every version below the oldest write still in flight is written, so settled moves up
+        to it, and to the counter when none is left
+        """
+        counter = await self.collection.find_one_and_update(
+            {"_id": VERSION_COUNTER_ID},
+            {"$pull": {"pending": token}},
+            return_document=ReturnDocument.AFTER
+        )
+        live = _live(counter)
+        pending = counter["pending"] if "pending" in counter else []
+        versions = counter["versions"] if "versions" in counter else []
+        update = {"$max": {"settled": _settled(counter)}}
+        pulls = {}
+        stale = [pending_token for pending_token in pending if pending_token not in live]
+        if stale:
+            pulls["pending"] = {"$in": stale}
+        # This write's entry, and those of writes that died, are no longer needed
+        finished = [entry for entry in versions if entry["token"] not in live]
+        if finished:
+            pulls["versions"] = {"$in": finished}
+        if pulls:
+            update["$pull"] = pulls
+        await self.collection.find_one_and_update({"_id": VERSION_COUNTER_ID}, update)
+
+
+def _live(counter: Dict[str, Any]) -> List[ObjectId]:
+    """Writes in flight, less those of workers that died mid-write, oldest version first"""
+    cutoff = datetime.now(timezone.utc) - STALE_WRITE
+    pending = counter["pending"] if "pending" in counter else []
+    return [token for token in pending if token.generation_time > cutoff]
+
+
+def _settled(counter: Dict[str, Any]) -> int:
+    """Highest version below every write in flight, 0 when that isn't known yet"""
+    live = _live(counter)
+    if not live:
+        return counter["seq"]
+    versions = counter["versions"] if "versions" in counter else []
+    oldest = next((entry["version"] for entry in versions if entry["token"] == live[0]), None)
+    # The oldest write hasn't recorded its version yet, what settled before stands
+    return oldest - 1 if oldest is not None else 0
@@ -0,0 +1,69 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional, Any, Tuple
+
+
+class RuleStore(ABC):
+    """
+    Storage operations RuleService relies on
+    Rules are documents with an "_id" plus the fields RuleService writes
+    """
+
+    @abstractmethod
+    async def find_one(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        """Get a rule by id, None when it doesn't exist"""
+
+    @abstractmethod
+    async def find_many(self, rule_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get the rules among rule_ids that exist"""
+
+    @abstractmethod
+    async def find_children(self, rule_id: str) -> List[Dict[str, Any]]:
+        """Get the combined rules with rule_id among their parent_rules"""
+
+    @abstractmethod
+    async def insert(self, rule_doc: Dict[str, Any]) -> str:
+        """Store a new rule with the next version, set on rule_doc, returning its id"""
+
+    @abstractmethod
+    async def update(self, rule_id: str, fields: Dict[str, Any]) -> Optional[int]:
+        """
+        Set fields of a rule with the next version, returning that version
+        None when the rule doesn't exist or the fields leave it unchanged
+        """
+
+    @abstractmethod
+    async def find_page(
+        self, 
+        skip: int, 
+        limit: int, 
+        since: Optional[int] = None,
+        until: Optional[int] = None
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Get the total count and one page of rules
+        With since, only rules with a higher version up to until, ordered by version
+        """
+
+    @abstractmethod
+    async def current_version(self) -> int:
+        """
+        Version up to which every write has finished, 0 before the first
+        A rule with a lower version can no longer appear, so delta sync resumes from it
+        """
+
+
+def changes(current: Dict[str, Any], fields: Dict[str, Any]) -> bool:
+    """Whether setting fields would change a rule, ignoring its version and timestamp"""
+    return any(
+        current.get(field) != value 
+        for field, value in fields.items() 
+        if field not in ("version", "updated_at")
+    )
+
+
+def as_rule_store(source: Any) -> RuleStore:
+    """Use a store as is, and wrap a Motor collection in the Mongo store"""
+    if isinstance(source, RuleStore):
+        return source
+    from storage.mongo_store import MongoRuleStore
+    return MongoRuleStore(source)
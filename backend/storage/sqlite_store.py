@@ -0,0 +1,165 @@
+"""
+Embedded SQLite rule store for deployments with a small, read-mostly rule set.
+
+Statements run on the event loop thread: they are sub-millisecond local reads, so
+handing them to a thread pool would cost more than it saves. Every statement has
+fixed SQL text so sqlite3 reuses the prepared statement from its cache, including
+the batched id lookups whose IN lists are padded to a few fixed sizes. A write
+takes its version from the counter in the same transaction, so a version is
+never visible before the rule that holds it.
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import List, Dict, Optional, Any, Tuple
+import orjson
+from bson import ObjectId
+
+from storage.rule_store import RuleStore, changes
+
+# Batched id lookups use IN lists of these sizes, within SQLite's variable limit
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64, 128, 256, 500)
+MAX_VERSION = 2 ** 63 - 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    created_at TEXT,
+    updated_at TEXT,
+    document BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rules_version ON rules (version);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+"""
+
+SELECT_ONE = "SELECT id, version, created_at, updated_at, document FROM rules WHERE id = ?"
+SELECT_MANY = "SELECT id, version, created_at, updated_at, document FROM rules WHERE id IN ({})"
+SELECT_CHILDREN = ("SELECT id, version, created_at, updated_at, document FROM rules WHERE EXISTS "
+                   "(SELECT 1 FROM json_each(CAST(document AS TEXT), '$.parent_rules') WHERE value = ?)")
+SELECT_PAGE = ("SELECT id, version, created_at, updated_at, document FROM rules "
+               "ORDER BY rowid LIMIT ? OFFSET ?")
+SELECT_SINCE = ("SELECT id, version, created_at, updated_at, document FROM rules "
+                "WHERE version > ? AND version <= ? ORDER BY version LIMIT ? OFFSET ?")
+COUNT_ALL = "SELECT COUNT(*) FROM rules"
+COUNT_SINCE = "SELECT COUNT(*) FROM rules WHERE version > ? AND version <= ?"
+INSERT = "INSERT INTO rules (id, version, created_at, updated_at, document) VALUES (?, ?, ?, ?, ?)"
+UPDATE = "UPDATE rules SET version = ?, created_at = ?, updated_at = ?, document = ? WHERE id = ?"
+NEXT_VERSION = ("INSERT INTO counters (name, seq) VALUES ('rule_version', 1) "
+                "ON CONFLICT (name) DO UPDATE SET seq = seq + 1 RETURNING seq")
+CURRENT_VERSION = "SELECT seq FROM counters WHERE name = 'rule_version'"
+
+
+class SQLiteRuleStore(RuleStore):
+    def __init__(self, path: str = ":memory:"):
+        self.connection = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+        if path != ":memory:":
+            # Readers in other workers don't block on the occasional write
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    async def find_one(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute(SELECT_ONE, (_rule_id(rule_id),)).fetchone()
+        return _to_document(row) if row else None
+
+    async def find_many(self, rule_ids: List[str]) -> List[Dict[str, Any]]:
+        ids = list(dict.fromkeys(_rule_id(id) for id in rule_ids))
+        found = {}
+        start = 0
+        while start < len(ids):
+            batch = ids[start:start + BATCH_SIZES[-1]]
+            size = next(size for size in BATCH_SIZES if size >= len(batch))
+            # Padding with NULL keeps the statement text, and so the prepared statement, shared
+            params = batch + [None] * (size - len(batch))
+            sql = SELECT_MANY.format(", ".join("?" * size))
+            for row in self.connection.execute(sql, params):
+                found[row[0]] = _to_document(row)
+            start += len(batch)
+        return [found[id] for id in ids if id in found]
+
+    async def find_children(self, rule_id: str) -> List[Dict[str, Any]]:
+        rows = self.connection.execute(SELECT_CHILDREN, (_rule_id(rule_id),))
+        return [_to_document(row) for row in rows]
+
+    async def insert(self, rule_doc: Dict[str, Any]) -> str:
+        rule_id = str(rule_doc.get("_id") or ObjectId())
+        with self.connection:
+            rule_doc["version"] = self.connection.execute(NEXT_VERSION).fetchone()[0]
+            self.connection.execute(INSERT, (rule_id, *_to_row(rule_doc)))
+        rule_doc["_id"] = rule_id
+        return rule_id
+
+    async def update(self, rule_id: str, fields: Dict[str, Any]) -> Optional[int]:
+        rule_id = _rule_id(rule_id)
+        with self.connection:
+            row = self.connection.execute(SELECT_ONE, (rule_id,)).fetchone()
+            if not row:
+                return None
+            current = _to_document(row)
+            if not changes(current, fields):
+                return None
+            version = self.connection.execute(NEXT_VERSION).fetchone()[0]
+            updated = {**current, **fields, "version": version}
+            self.connection.execute(UPDATE, (*_to_row(updated), rule_id))
+        return version
+
+    async def find_page(
+        self,
+        skip: int,
+        limit: int,
+        since: Optional[int] = None,
+        until: Optional[int] = None
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        if since is None:
+            total = self.connection.execute(COUNT_ALL).fetchone()[0]
+            rows = self.connection.execute(SELECT_PAGE, (limit, skip))
+        else:
+            bounds = (since, MAX_VERSION if until is None else until)
+            total = self.connection.execute(COUNT_SINCE, bounds).fetchone()[0]
+            rows = self.connection.execute(SELECT_SINCE, (*bounds, limit, skip))
+        return total, [_to_document(row) for row in rows]
+
+    async def current_version(self) -> int:
+        row = self.connection.execute(CURRENT_VERSION).fetchone()
+        return row[0] if row else 0
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _rule_id(rule_id: str) -> str:
+    """Ids are ObjectId strings, a malformed id fails like it does with Mongo"""
+    return str(ObjectId(rule_id))
+
+
+def _to_row(rule_doc: Dict[str, Any]) -> Tuple[int, Optional[str], Optional[str], bytes]:
+    body = {k: v for k, v in rule_doc.items()
+            if k not in ("_id", "version", "created_at", "updated_at")}
+    return (
+        rule_doc.get("version", 0),
+        _encode_datetime(rule_doc.get("created_at")),
+        _encode_datetime(rule_doc.get("updated_at")),
+        orjson.dumps(body)
+    )
+
+
+def _to_document(row: Tuple) -> Dict[str, Any]:
+    rule_id, version, created_at, updated_at, document = row
+    return {
+        "_id": rule_id,
+        **orjson.loads(document),
+        "version": version,
+        "created_at": _decode_datetime(created_at),
+        "updated_at": _decode_datetime(updated_at)
+    }
+
+
+def _encode_datetime(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _decode_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
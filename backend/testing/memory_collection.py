@@ -0,0 +1,409 @@
+"""
+In-memory stand-in for the AsyncIOMotorCollection methods used by the services.
+It implements the subset of MongoDB query semantics the rule translator emits, so
+filters can be checked against the Python evaluator without a server.
+"""
+
+import copy
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Any, Iterable, Tuple
+from bson import ObjectId
+
+_MISSING = object()
+
+
+@dataclass
+class InsertOneResult:
+    inserted_id: Any
+
+
+@dataclass
+class InsertManyResult:
+    inserted_ids: List[Any]
+
+
+@dataclass
+class UpdateResult:
+    matched_count: int
+    modified_count: int
+
+
+class MemoryCursor:
+    """Async cursor over a snapshot of matching documents"""
+
+    def __init__(self, documents: List[Dict], projection: Optional[Any] = None):
+        self._documents = documents
+        self._projection = projection
+        self._skip = 0
+        self._limit = 0
+        self._position = None
+
+    def skip(self, count: int) -> 'MemoryCursor':
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> 'MemoryCursor':
+        self._limit = count
+        return self
+
+    def sort(self, key: Any, direction: int = 1) -> 'MemoryCursor':
+        keys = [(key, direction)] if isinstance(key, str) else list(key)
+        for field, order in reversed(keys):
+            self._documents.sort(
+                key=lambda doc: _sort_key(_resolve(doc, field)),
+                reverse=order < 0
+            )
+        return self
+
+    def batch_size(self, size: int) -> 'MemoryCursor':
+        return self
+
+    def _window(self) -> List[Dict]:
+        end = self._skip + self._limit if self._limit else None
+        return [_project(doc, self._projection) for doc in self._documents[self._skip:end]]
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        documents = self._window()
+        return documents if length is None else documents[:length]
+
+    def __aiter__(self) -> 'MemoryCursor':
+        self._position = iter(self._window())
+        return self
+
+    async def __anext__(self) -> Dict:
+        try:
+            return next(self._position)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryCollection:
+    """Documents kept in insertion order in a list"""
+
+    def __init__(self, documents: Optional[Iterable[Dict]] = None, name: str = "memory"):
+        self.name = name
+        self.documents: List[Dict] = []
+        self._by_id: Dict[Any, Dict] = {}
+        for document in documents or []:
+            self._insert(document)
+
+    def _insert(self, document: Dict) -> Any:
+        document = copy.deepcopy(document)
+        document.setdefault("_id", ObjectId())
+        self.documents.append(document)
+        self._by_id[document["_id"]] = document
+        return document["_id"]
+
+    def _candidates(self, filter: Optional[Dict]) -> List[Dict]:
+        """Documents that may match, a lookup by _id skips the scan"""
+        if filter and len(filter) == 1 and "_id" in filter and not isinstance(filter["_id"], dict):
+            document = self._by_id.get(filter["_id"])
+            return [document] if document is not None else []
+        return self.documents
+
+    def _matching(self, filter: Optional[Dict]) -> List[Dict]:
+        return [doc for doc in self._candidates(filter) if matches(doc, filter or {})]
+
+    async def insert_one(self, document: Dict) -> InsertOneResult:
+        inserted_id = self._insert(document)
+        document["_id"] = inserted_id
+        return InsertOneResult(inserted_id)
+
+    async def insert_many(self, documents: Iterable[Dict], ordered: bool = True) -> InsertManyResult:
+        return InsertManyResult([self._insert(document) for document in documents])
+
+    async def find_one(
+        self,
+        filter: Optional[Dict] = None,
+        projection: Optional[Any] = None
+    ) -> Optional[Dict]:
+        for document in self._candidates(filter):
+            if matches(document, filter or {}):
+                return _project(document, projection)
+        return None
+
+    def find(
+        self,
+        filter: Optional[Dict] = None,
+        projection: Optional[Any] = None,
+        **kwargs: Any
+    ) -> MemoryCursor:
+        return MemoryCursor(self._matching(filter), projection)
+
+    async def distinct(self, key: str, filter: Optional[Dict] = None) -> List[Any]:
+        """Distinct values of a field, array elements counted one by one"""
+        values = []
+        for document in self._matching(filter):
+            value = _resolve(document, key)
+            for element in (value if isinstance(value, list) else [value]):
+                if element is not _MISSING and not any(_equals(element, v) for v in values):
+                    values.append(element)
+        return values
+
+    async def count_documents(self, filter: Dict) -> int:
+        return len(self._matching(filter))
+
+    async def update_one(self, filter: Dict, update: Dict, upsert: bool = False) -> UpdateResult:
+        for document in self._candidates(filter):
+            if matches(document, filter):
+                return UpdateResult(1, int(_apply_update(document, update)))
+        if upsert:
+            document = {k: v for k, v in filter.items() if not k.startswith("$")}
+            _apply_update(document, update)
+            self._insert(document)
+        return UpdateResult(0, 0)
+
+    async def find_one_and_update(
+        self,
+        filter: Dict,
+        update: Dict,
+        projection: Optional[Any] = None,
+        upsert: bool = False,
+        return_document: bool = False
+    ) -> Optional[Dict]:
+        """return_document is pymongo's ReturnDocument, where AFTER is True"""
+        for document in self._candidates(filter):
+            if matches(document, filter):
+                before = _project(document, projection)
+                _apply_update(document, update)
+                return _project(document, projection) if return_document else before
+        if upsert:
+            document = {k: v for k, v in filter.items() if not k.startswith("$")}
+            _apply_update(document, update)
+            self._insert(document)
+            return _project(document, projection) if return_document else None
+        return None
+
+    async def delete_one(self, filter: Dict) -> None:
+        for index, document in enumerate(self.documents):
+            if matches(document, filter):
+                del self.documents[index]
+                self._by_id.pop(document["_id"], None)
+                return
+
+
+
+class MemoryDatabase:
+    """Collections created on first access, like a Motor database"""
+
+    def __init__(self):
+        self.collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(name=name)
+        return self.collections[name]
+
+def _apply_update(document: Dict, update: Dict) -> bool:
+    """Apply the update operators the stores use, returning whether the document changed"""
+    before = copy.deepcopy(document)
+    for field, value in update.get("$set", {}).items():
+        document[field] = copy.deepcopy(value)
+    for field, value in update.get("$inc", {}).items():
+        document[field] = document.get(field, 0) + value
+    for field, value in update.get("$max", {}).items():
+        if field not in document or value > document[field]:
+            document[field] = value
+    for field, value in update.get("$push", {}).items():
+        document[field] = document.get(field, []) + [copy.deepcopy(value)]
+    for field, value in update.get("$pull", {}).items():
+        removed = value["$in"] if isinstance(value, dict) and "$in" in value else [value]
+        document[field] = [item for item in document.get(field, []) if item not in removed]
+    return document != before
+
+
+def _project(document: Dict, projection: Optional[Any]) -> Dict:
+    document = copy.deepcopy(document)
+    if not projection:
+        return document
+    if not isinstance(projection, dict):
+        projection = {field: 1 for field in projection}
+
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        result = {field: document[field] for field in included if field in document}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    return {k: v for k, v in document.items() if projection.get(k, 1)}
+
+
+def _resolve(document: Any, path: str) -> Any:
+    """Value at a dotted path, or _MISSING"""
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _type_rank(value: Any) -> int:
+    """BSON comparison order of the types we store"""
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    rank = _type_rank(value)
+    return (rank, None if rank == 1 else value)
+
+
+def _equals(left: Any, right: Any) -> bool:
+    """Equality between BSON values, numbers compare across int/double but not bool"""
+    if _type_rank(left) != _type_rank(right):
+        return False
+    return left == right or (left is _MISSING and right is None)
+
+
+def _field_equals(value: Any, target: Any) -> bool:
+    """Query equality, which also matches array elements"""
+    if isinstance(value, list) and not isinstance(target, list):
+        return any(_equals(element, target) for element in value)
+    if value is _MISSING:
+        return target is None
+    return _equals(value, target)
+
+
+def _ordered(value: Any, target: Any, operator: str) -> bool:
+    """Range operators in queries only compare values of the same type bracket"""
+    if isinstance(value, list):
+        return any(_ordered(element, target, operator) for element in value)
+    if value is _MISSING or _type_rank(value) != _type_rank(target):
+        return False
+    return _compare(value, target, operator)
+
+
+def _compare(left: Any, right: Any, operator: str) -> bool:
+    if operator == "$gt":
+        return left > right
+    if operator == "$gte":
+        return left >= right
+    if operator == "$lt":
+        return left < right
+    return left <= right
+
+
+def _regex_matches(value: Any, pattern: str) -> bool:
+    """$regex only matches strings, or string elements of arrays"""
+    if isinstance(value, list):
+        return any(_regex_matches(element, pattern) for element in value)
+    return isinstance(value, str) and re.search(pattern, value) is not None
+
+
+def _field_matches(value: Any, condition: Any) -> bool:
+    if not (isinstance(condition, dict) and condition and
+            all(key.startswith("$") for key in condition)):
+        return _field_equals(value, condition)
+
+    for operator, target in condition.items():
+        if operator == "$eq" and not _field_equals(value, target):
+            return False
+        if operator == "$ne" and _field_equals(value, target):
+            return False
+        if operator in ("$gt", "$gte", "$lt", "$lte") and not _ordered(value, target, operator):
+            return False
+        if operator == "$in" and not any(_field_equals(value, t) for t in target):
+            return False
+        if operator == "$nin" and any(_field_equals(value, t) for t in target):
+            return False
+        if operator == "$exists" and (value is not _MISSING) != bool(target):
+            return False
+        if operator == "$regex" and not _regex_matches(value, target):
+            return False
+    return True
+
+
+def matches(document: Dict, filter: Dict) -> bool:
+    """Whether a document satisfies a MongoDB query filter"""
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches(document, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, clause) for clause in condition):
+                return False
+        elif key == "$expr":
+            if not _evaluate_expression(document, condition, {}):
+                return False
+        elif not _field_matches(_resolve(document, key), condition):
+            return False
+    return True
+
+
+def _evaluate_expression(document: Dict, expression: Any, variables: Dict[str, Any]) -> Any:
+    """Evaluate the aggregation expression operators the translator emits"""
+    if isinstance(expression, str) and expression.startswith("$$"):
+        return variables.get(expression[2:])
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _resolve(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, list):
+        return [_evaluate_expression(document, item, variables) for item in expression]
+    if not isinstance(expression, dict) or len(expression) != 1:
+        return expression
+
+    operator, argument = next(iter(expression.items()))
+    if operator == "$let":
+        scope = dict(variables)
+        for name, value in argument["vars"].items():
+            scope[name] = _evaluate_expression(document, value, variables)
+        return _evaluate_expression(document, argument["in"], scope)
+    if operator == "$convert":
+        value = _evaluate_expression(document, argument["input"], variables)
+        if value is None:
+            return argument.get("onNull")
+        try:
+            if argument["to"] == "date":
+                return _to_date(value)
+            return float(value)
+        except (TypeError, ValueError):
+            return argument.get("onError")
+    if operator == "$and":
+        return all(_evaluate_expression(document, item, variables) for item in argument)
+    if operator == "$or":
+        return any(_evaluate_expression(document, item, variables) for item in argument)
+
+    left, right = _evaluate_expression(document, argument, variables)
+    if operator == "$eq":
+        return _equals(left, right)
+    if operator == "$ne":
+        return not _equals(left, right)
+    # Aggregation comparisons order values of different types by BSON type
+    if _type_rank(left) != _type_rank(right):
+        return _compare(_type_rank(left), _type_rank(right), operator)
+    return _compare(left, right, operator)
+
+
+def _to_date(value: Any) -> datetime:
+    """$convert to date: dates as is, ISO-8601 strings parsed, numbers as epoch milliseconds"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        moment = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return moment
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime(1970, 1, 1) + timedelta(milliseconds=value)
+    raise TypeError(f"Can't convert {value!r} to a date")
@@ -0,0 +1,157 @@
+import asyncio
+import pytest
+import dotenv.main
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from backend.services.admission import AdmissionController, Lane
+from main import app
+# The app imports its modules without the backend prefix
+import services.admission as route_admission
+import database as route_database
+
+
+async def hold(controller, lane, release, admitted=None, name=None):
+    async with controller.admit(lane):
+        if admitted is not None:
+            admitted.append(name)
+        await release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+class TestAdmissionController:
+    async def test_bounds_concurrency_and_hands_over_slots(self):
+        controller = AdmissionController(max_concurrency=2, queue_target=1.0)
+        release = asyncio.Event()
+        admitted = []
+        tasks = [asyncio.create_task(hold(controller, Lane.SINGLE, release, admitted, i)) for i in range(3)]
+        await settle()
+
+        assert admitted == [0, 1]
+        assert controller.stats()["in_flight"] == 2
+        assert controller.stats()["queued"] == {"single": 1, "batch": 0}
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert admitted == [0, 1, 2]
+        assert controller.in_flight == 0
+        assert controller.stats()["admitted"]["single"] == 3
+
+    async def test_single_lane_first(self):
+        controller = AdmissionController(max_concurrency=1, queue_target=1.0, batch_queue_target=1.0)
+        release = asyncio.Event()
+        admitted = []
+        first = asyncio.create_task(hold(controller, Lane.BATCH, release, admitted, "first"))
+        await settle()
+        batch = asyncio.create_task(hold(controller, Lane.BATCH, release, admitted, "batch"))
+        await settle()
+        single = asyncio.create_task(hold(controller, Lane.SINGLE, release, admitted, "single"))
+        await settle()
+
+        release.set()
+        await asyncio.gather(first, batch, single)
+        assert admitted == ["first", "single", "batch"]
+
+    async def test_sheds_when_queue_full(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=0)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(controller, Lane.SINGLE, release))
+        await settle()
+
+        with pytest.raises(HTTPException) as error:
+            await controller._acquire(Lane.SINGLE)
+        assert error.value.status_code == 503
+        assert error.value.headers["Retry-After"] == "1"
+        assert controller.stats()["shed"]["single"]["queue_full"] == 1
+
+        release.set()
+        await holder
+
+    async def test_sheds_after_queue_target(self):
+        controller = AdmissionController(max_concurrency=1, queue_target=0.01)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(controller, Lane.SINGLE, release))
+        await settle()
+
+        with pytest.raises(HTTPException):
+            await controller._acquire(Lane.SINGLE)
+        assert controller.stats()["shed"]["single"]["timeout"] == 1
+        assert controller.queued() == 0
+
+        release.set()
+        await holder
+        assert controller.in_flight == 0
+
+    async def test_sheds_at_once_when_expected_wait_exceeds_target(self):
+        controller = AdmissionController(max_concurrency=1, queue_target=0.05)
+        # Slots have recently been held for a second each
+        controller.service_time = 1.0
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(controller, Lane.SINGLE, release))
+        await settle()
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with pytest.raises(HTTPException):
+            await controller._acquire(Lane.SINGLE)
+        assert loop.time() - started < 0.05
+        assert controller.stats()["shed"]["single"]["overload"] == 1
+
+        release.set()
+        await holder
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        controller = AdmissionController(max_concurrency=1, queue_target=1.0)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(controller, Lane.SINGLE, release))
+        await settle()
+        waiter = asyncio.create_task(hold(controller, Lane.SINGLE, release))
+        await settle()
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.queued() == 0
+
+        release.set()
+        await holder
+        assert controller.in_flight == 0
+
+
+class TestAdmissionRoutes:
+    def test_shed_request_gets_503(self):
+        controller = route_admission.AdmissionController(max_concurrency=0, max_queue=0)
+        app.dependency_overrides[route_admission.get_admission_controller] = lambda: controller
+        try:
+            client = TestClient(app)
+            response = client.post("/api/v1/evaluate/", json={"rule_id": "123", "data": {}})
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+
+            stats = client.get("/api/v1/admission/").json()
+            assert stats["shed"]["single"]["queue_full"] == 1
+            assert stats["in_flight"] == 0
+        finally:
+            app.dependency_overrides.pop(route_admission.get_admission_controller, None)
+
+    def test_reads_settings_from_env_file(self, monkeypatch, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text('ADMISSION_MAX_CONCURRENCY = "3"\nADMISSION_QUEUE_TARGET_MS = "20"\n')
+        for name in ("ADMISSION_MAX_CONCURRENCY", "ADMISSION_QUEUE_TARGET_MS"):
+            # Recorded so the values loaded from the file are removed afterwards
+            monkeypatch.setenv(name, "")
+            monkeypatch.delenv(name)
+        monkeypatch.setattr(dotenv.main, "find_dotenv", lambda *args, **kwargs: str(env_file))
+        monkeypatch.setattr(route_admission, "_controller", None)
+        route_database.get_settings.cache_clear()
+        try:
+            # The controller is the first thing of the worker to read settings
+            stats = TestClient(app).get("/api/v1/admission/").json()
+            assert stats["max_concurrency"] == 3
+            assert stats["queue_target_ms"]["single"] == 20
+        finally:
+            route_database.get_settings.cache_clear()
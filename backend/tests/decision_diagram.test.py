@@ -0,0 +1,79 @@
+import pytest
+import random
+from backend.engine.rule_engine import RuleEngine, Operator, DiagramTooLarge
+
+RULES = [
+    "((age > 30 AND department = 'Sales') OR (age < 25 AND department = 'Marketing')) AND (salary > 50000 OR experience > 5)",
+    "((age > 30 AND department = 'Marketing')) AND (salary > 20000 OR experience > 5)",
+    "department IN ['HR', 'IT'] AND age >= 40"
+]
+
+class CountingRecord(dict):
+    """Record counting attribute lookups made by the evaluator"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lookups = 0
+
+    def get(self, key, default=None):
+        self.lookups += 1
+        return super().get(key, default)
+
+@pytest.fixture
+def rule_engine():
+    return RuleEngine()
+
+@pytest.fixture
+def combined_rule(rule_engine):
+    nodes = [rule_engine.create_rule(rule) for rule in RULES]
+    return rule_engine.combine_rules(nodes, Operator.OR)
+
+def random_record(rng):
+    record = {
+        "age": rng.randint(18, 60),
+        "department": rng.choice(["Sales", "Marketing", "HR", "IT"]),
+        "salary": rng.randint(10000, 90000),
+        "experience": rng.randint(0, 10)
+    }
+    if rng.random() < 0.2:
+        record.pop("salary")
+    return record
+
+class TestDecisionDiagram:
+    def test_matches_evaluator(self, rule_engine, combined_rule):
+        diagram = rule_engine.compile_decision_diagram(combined_rule)
+        compiled = rule_engine.compile_rule(combined_rule)
+        rng = random.Random(7)
+
+        for _ in range(500):
+            record = random_record(rng)
+            expected = rule_engine.evaluate_rule(combined_rule, record)
+            assert diagram.evaluate(record) == expected
+            assert compiled(record) == expected
+
+    def test_each_predicate_tested_once(self, rule_engine, combined_rule):
+        diagram = rule_engine.compile_decision_diagram(combined_rule)
+        rng = random.Random(11)
+
+        for _ in range(100):
+            record = CountingRecord(random_record(rng))
+            diagram.evaluate(record)
+            assert record.lookups <= len(diagram.predicates)
+
+    def test_report_counts(self, rule_engine, combined_rule):
+        report = rule_engine.compile_decision_diagram(combined_rule).report()
+
+        assert report["ast_nodes"] == 47
+        assert report["predicates"] == 9
+        assert 0 < report["diagram_nodes"] < report["ast_nodes"]
+
+    def test_size_limit(self, rule_engine, combined_rule):
+        with pytest.raises(DiagramTooLarge):
+            rule_engine.compile_decision_diagram(combined_rule, max_nodes=2)
+
+    def test_compile_rule_falls_back(self, rule_engine, combined_rule):
+        compiled = rule_engine.compile_rule(
+            combined_rule, decision_diagram=True, max_diagram_nodes=2
+        )
+        record = {"age": 45, "department": "IT"}
+
+        assert compiled(record) == rule_engine.evaluate_rule(combined_rule, record)
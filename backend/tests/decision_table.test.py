@@ -0,0 +1,127 @@
+import random
+import pytest
+from backend.engine.rule_engine import RuleEngine
+from backend.services.decision_table_service import (
+    DecisionTableService, DecisionTableCreate, HitPolicy
+)
+from backend.services.rule_service import RuleService, RuleCreate
+from backend.testing.memory_collection import MemoryDatabase
+
+TIERS = [
+    "salary >= 100000 AND department IN ['Sales', 'IT']",
+    "salary >= 60000 AND salary < 100000 AND department = 'Sales'",
+    "age > 40 AND (experience > 10 OR department = 'HR')",
+    "salary > 30000 AND age <= 25",
+    "department != 'Marketing' AND salary < 30000",
+    "code STARTSWITH 'A' AND age >= 30",
+    "salary > 50000 AND salary < 40000",
+    "experience = 3 AND experience = 4"
+]
+
+@pytest.fixture
+def rule_engine():
+    return RuleEngine()
+
+def random_record(rng):
+    record = {
+        "age": rng.randint(18, 60),
+        "department": rng.choice(["Sales", "Marketing", "HR", "IT"]),
+        "salary": rng.choice([rng.randint(10000, 150000), 60000, 100000, 30000]),
+        "experience": rng.randint(0, 15),
+        "code": rng.choice(["A1", "B2", 7])
+    }
+    for field in ["salary", "department", "age"]:
+        if rng.random() < 0.1:
+            record.pop(field)
+    return record
+
+class TestDecisionTable:
+    def test_compiles_columns(self, rule_engine):
+        table = rule_engine.compile_decision_table([rule_engine.create_rule(r) for r in TIERS])
+
+        report = table.report()
+        assert report["hash_columns"] == ["department", "experience"]
+        assert report["range_columns"] == ["age", "salary"]
+        assert report["residual_entries"] == 3
+
+    def test_matches_sequential_evaluation(self, rule_engine):
+        nodes = [rule_engine.create_rule(r) for r in TIERS]
+        table = rule_engine.compile_decision_table(nodes)
+        rng = random.Random(11)
+
+        for _ in range(500):
+            record = random_record(rng)
+            expected = [i for i, node in enumerate(nodes) if rule_engine.evaluate_rule(node, record)]
+            assert table.evaluate(record, first_hit=False) == expected
+            assert table.evaluate(record) == expected[:1]
+
+    def test_range_boundaries(self, rule_engine):
+        nodes = [rule_engine.create_rule(r) for r in ["score < 10", "score >= 10 AND score <= 20", "score > 20"]]
+        table = rule_engine.compile_decision_table(nodes)
+
+        assert [table.evaluate({"score": s}) for s in [9.99, 10, 15, "20", 20.01]] == \
+            [[0], [1], [1], [1], [2]]
+        assert table.evaluate({"score": "n/a"}) == []
+
+    def test_date_range_columns(self, rule_engine):
+        nodes = [rule_engine.create_rule(r) for r in [
+            "joined_at < '2022-01-01'",
+            "joined_at >= '2022-01-01' AND joined_at < '2023-01-01T00:00:00Z' AND tenure > 1",
+            "joined_at >= '2023-01-01'"
+        ]]
+        table = rule_engine.compile_decision_table(nodes)
+
+        assert table.report()["range_columns"] == ["joined_at", "tenure"]
+        assert table.report()["residual_entries"] == 0
+        assert [table.evaluate({"joined_at": d, "tenure": 2}) for d in
+                ["2021-12-31T23:59:59", "2022-01-01", "2022-12-31T23:00:00-01:00", "2023-06-01"]] == \
+            [[0], [1], [2], [2]]
+        assert table.evaluate({"joined_at": "n/a", "tenure": 2}) == []
+
+
+@pytest.mark.asyncio
+class TestDecisionTableService:
+    async def test_first_hit_and_collect(self):
+        database = MemoryDatabase()
+        rules = RuleService(database["rules"])
+        gold = await rules.create_rule(RuleCreate(name="Gold", rule_string="salary >= 100000"))
+        silver = await rules.create_rule(RuleCreate(name="Silver", rule_string="salary >= 50000"))
+        service = DecisionTableService(database, database["rules"])
+
+        table = DecisionTableCreate(name="Tiers", default="bronze", entries=[
+            {"rule_id": silver["id"], "priority": 1, "output": "silver"},
+            {"rule_id": gold["id"], "priority": 2, "output": "gold"}
+        ])
+        created = await service.create_table(table)
+
+        result = await service.evaluate_table(created["id"], {"salary": 120000})
+        assert result["output"] == "gold"
+        assert result["hit"]["rule_id"] == gold["id"]
+        assert (await service.evaluate_table(created["id"], {"salary": 10}))["output"] == "bronze"
+
+        table.hit_policy = HitPolicy.COLLECT
+        await service.update_table(created["id"], table)
+        result = await service.evaluate_table(created["id"], {"salary": 120000})
+        assert result["output"] == ["gold", "silver"]
+
+    async def test_recompiles_after_rule_edit(self):
+        database = MemoryDatabase()
+        rules = RuleService(database["rules"])
+        senior = await rules.create_rule(RuleCreate(name="Senior", rule_string="age > 50"))
+        service = DecisionTableService(database, database["rules"])
+        created = await service.create_table(DecisionTableCreate(
+            name="Age", entries=[{"rule_id": senior["id"], "output": "senior"}]
+        ))
+
+        assert (await service.evaluate_table(created["id"], {"age": 45}))["output"] is None
+        await rules.edit_rule(senior["id"], RuleCreate(name="Senior", rule_string="age > 40"))
+        assert (await service.evaluate_table(created["id"], {"age": 45}))["output"] == "senior"
+
+    async def test_unknown_rule(self):
+        database = MemoryDatabase()
+        service = DecisionTableService(database, database["rules"])
+
+        with pytest.raises(Exception):
+            await service.create_table(DecisionTableCreate(
+                name="Broken", entries=[{"rule_id": "0" * 24, "output": 1}]
+            ))
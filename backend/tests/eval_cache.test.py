@@ -0,0 +1,80 @@
+import pytest
+from unittest.mock import patch
+from backend.services.eval_cache import TTLCache
+from backend.services import rule_service as rule_service_module
+from backend.services.rule_service import RuleService
+from backend.models.rule_models import RuleCreate
+from backend.testing.memory_collection import MemoryCollection
+
+class TestTTLCache:
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=None)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_ttl_expiry(self):
+        cache = TTLCache(maxsize=10, ttl=5)
+        with patch("time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("time.monotonic", return_value=104.0):
+            assert cache.get("a") == 1
+        with patch("time.monotonic", return_value=106.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+@pytest.fixture
+def service():
+    rule_service_module._evaluation_cache.clear()
+    rule_service_module._compiled_rules.clear()
+    return RuleService(MemoryCollection())
+
+@pytest.mark.asyncio
+class TestEvaluationMemoization:
+    async def test_repeat_evaluation_is_cached(self, service):
+        created = await service.create_rule(
+            RuleCreate(name="Rule", rule_string="age > 30 AND department = 'Sales'")
+        )
+        cache = rule_service_module._evaluation_cache
+
+        first = await service.evaluate_rule(
+            created["id"], {"age": 35, "department": "Sales", "notes": "a"}
+        )
+        second = await service.evaluate_rule(
+            created["id"], {"age": 35, "department": "Sales", "notes": "b"}
+        )
+
+        assert first["result"] == second["result"] == True
+        assert cache.hits == 1
+        assert len(cache) == 1
+
+    async def test_cache_key_is_typed(self, service):
+        created = await service.create_rule(RuleCreate(name="Rule", rule_string="code = 1"))
+
+        assert (await service.evaluate_rule(created["id"], {"code": 1}))["result"] == True
+        assert (await service.evaluate_rule(created["id"], {"code": 1.0}))["result"] == False
+        assert (await service.evaluate_rule(created["id"], {"code": True}))["result"] == False
+
+    async def test_edit_invalidates(self, service):
+        created = await service.create_rule(RuleCreate(name="Rule", rule_string="age > 30"))
+        assert (await service.evaluate_rule(created["id"], {"age": 35}))["result"] == True
+
+        await service.edit_rule(created["id"], RuleCreate(name="Rule", rule_string="age > 40"))
+
+        assert (await service.evaluate_rule(created["id"], {"age": 35}))["result"] == False
+
+    async def test_missing_required_field_rejected(self, service):
+        created = await service.create_rule(
+            RuleCreate(name="Rule", rule_string="age > 30 AND (salary > 10 OR experience > 2)")
+        )
+
+        result = await service.evaluate_rule(created["id"], {"salary": 50})
+
+        assert result["result"] == False
+        assert result["missing_fields"] == ["age"]
+        assert len(rule_service_module._evaluation_cache) == 0
@@ -0,0 +1,159 @@
+import asyncio
+import orjson
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from main import app
+import services.evaluation_session as evaluation_session
+from routes.rule_routes import get_rule_service
+from services.rule_service import RuleService
+from testing.memory_collection import MemoryCollection
+
+def make_client(collection=None):
+    collection = collection if collection is not None else MemoryCollection()
+    app.dependency_overrides[get_rule_service] = lambda: RuleService(collection)
+    return TestClient(app)
+
+def receive(websocket):
+    return orjson.loads(websocket.receive_text())
+
+def receive_results(websocket, count):
+    """Collect result items across however many micro-batches they arrive in"""
+    items = []
+    while len(items) < count:
+        message = receive(websocket)
+        assert message["type"] == "results"
+        items.extend(message["items"])
+    return items
+
+class TestEvaluationSession:
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def test_pin_and_pipeline(self):
+        client = make_client()
+        senior = client.post("/api/v1/create/", json={"name": "Senior", "rule_string": "age > 50"}).json()
+        sales = client.post(
+            "/api/v1/create/", json={"name": "Sales", "rule_string": "department STARTSWITH 'Sal'"}
+        ).json()
+
+        with client.websocket_connect("/api/v1/ws/evaluate") as websocket:
+            websocket.send_text(orjson.dumps({"type": "pin", "rule_ids": [senior["id"], sales["id"]]}).decode())
+            pinned = receive(websocket)
+            assert pinned["type"] == "pinned"
+            assert [rule["id"] for rule in pinned["rules"]] == [senior["id"], sales["id"]]
+
+            for i in range(20):
+                websocket.send_text(orjson.dumps({
+                    "type": "eval", "id": i, "data": {"age": 40 + i, "department": "Sales"}
+                }).decode())
+            items = receive_results(websocket, 20)
+
+        assert [item["id"] for item in items] == list(range(20))
+        assert items[5]["matched"] == [sales["id"]]
+        assert items[15]["matched"] == [senior["id"], sales["id"]]
+
+    def test_notified_when_pinned_rule_changes(self):
+        client = make_client()
+        senior = client.post("/api/v1/create/", json={"name": "Senior", "rule_string": "age > 50"}).json()
+
+        with client.websocket_connect("/api/v1/ws/evaluate") as websocket:
+            websocket.send_text(orjson.dumps({"type": "pin", "rule_ids": [senior["id"]]}).decode())
+            receive(websocket)
+
+            client.put(f"/api/v1/update/{senior['id']}", json={"name": "Senior", "rule_string": "age > 30"})
+            changed = receive(websocket)
+            assert changed["type"] == "rule_changed"
+            assert changed["rule_id"] == senior["id"]
+            assert changed["version"] > senior["version"]
+
+            websocket.send_text(orjson.dumps({"type": "eval", "id": "a", "data": {"age": 40}}).decode())
+            assert receive_results(websocket, 1)[0]["results"] == {senior["id"]: True}
+
+    def test_errors(self):
+        client = make_client()
+
+        with client.websocket_connect("/api/v1/ws/evaluate") as websocket:
+            websocket.send_text(orjson.dumps({"type": "eval", "id": 1, "data": {}}).decode())
+            assert receive_results(websocket, 1)[0]["error"] == "No rules pinned"
+
+            websocket.send_text("{not json")
+            assert receive(websocket)["type"] == "error"
+
+            websocket.send_text(orjson.dumps({"type": "pin", "rule_ids": ["0" * 24]}).decode())
+            assert "not found" in receive(websocket)["detail"]
+
+    def test_notified_of_other_workers_changes(self, monkeypatch):
+        # Another worker's edit moves the stored version without reaching this change bus
+        monkeypatch.setattr(evaluation_session, "POLL_INTERVAL", 0.05)
+        monkeypatch.setattr(evaluation_session.change_bus, "publish", lambda rule_id, version: None)
+        client = make_client()
+        senior = client.post("/api/v1/create/", json={"name": "Senior", "rule_string": "age > 50"}).json()
+
+        with client.websocket_connect("/api/v1/ws/evaluate") as websocket:
+            websocket.send_text(orjson.dumps({"type": "pin", "rule_ids": [senior["id"]]}).decode())
+            receive(websocket)
+
+            client.put(f"/api/v1/update/{senior['id']}", json={"name": "Senior", "rule_string": "age > 30"})
+            changed = receive(websocket)
+            assert changed["type"] == "rule_changed"
+            assert changed["version"] > senior["version"]
+
+            websocket.send_text(orjson.dumps({"type": "eval", "id": "a", "data": {"age": 40}}).decode())
+            assert receive_results(websocket, 1)[0]["results"] == {senior["id"]: True}
+
+    def test_keeps_polling_after_store_errors(self, monkeypatch):
+        monkeypatch.setattr(evaluation_session, "POLL_INTERVAL", 0.05)
+        monkeypatch.setattr(evaluation_session.change_bus, "publish", lambda rule_id, version: None)
+        latest_version = RuleService.latest_version
+        failures = []
+
+        async def flaky_latest_version(service):
+            if len(failures) < 3:
+                failures.append(True)
+                raise ConnectionError("store unavailable")
+            return await latest_version(service)
+
+        monkeypatch.setattr(RuleService, "latest_version", flaky_latest_version)
+        client = make_client()
+        senior = client.post("/api/v1/create/", json={"name": "Senior", "rule_string": "age > 50"}).json()
+
+        with client.websocket_connect("/api/v1/ws/evaluate") as websocket:
+            websocket.send_text(orjson.dumps({"type": "pin", "rule_ids": [senior["id"]]}).decode())
+            receive(websocket)
+
+            client.put(f"/api/v1/update/{senior['id']}", json={"name": "Senior", "rule_string": "age > 30"})
+            changed = receive(websocket)
+            assert changed["type"] == "rule_changed"
+            assert len(failures) == 3
+
+    def test_binary_and_empty_frames_are_errors(self):
+        client = make_client()
+
+        with client.websocket_connect("/api/v1/ws/evaluate") as websocket:
+            websocket.send_bytes(b'{"type": "eval", "id": 1, "data": {}}')
+            assert receive(websocket)["detail"] == "Messages must be JSON text frames"
+            websocket.send_bytes(b"")
+            assert receive(websocket)["type"] == "error"
+            websocket.send_text("")
+            assert receive(websocket)["type"] == "error"
+
+            # The connection stays usable
+            websocket.send_text(orjson.dumps({"type": "eval", "id": 1, "data": {}}).decode())
+            assert receive_results(websocket, 1)[0]["error"] == "No rules pinned"
+
+    def test_invalid_stored_pattern_is_an_error_message(self):
+        collection = MemoryCollection()
+        client = make_client(collection)
+        rule = client.post("/api/v1/create/", json={"name": "Code", "rule_string": "code MATCHES 'a'"}).json()
+        # Written past the service, which refuses invalid patterns
+        ast = {**rule["ast"], "right": {**rule["ast"]["right"], "value": "("}}
+        asyncio.run(collection.update_one({"_id": ObjectId(rule["id"])}, {"$set": {"ast": ast}}))
+
+        with client.websocket_connect("/api/v1/ws/evaluate") as websocket:
+            websocket.send_text(orjson.dumps({"type": "pin", "rule_ids": [rule["id"]]}).decode())
+            error = receive(websocket)
+            assert error["type"] == "error"
+
+            # The connection stays usable
+            websocket.send_text(orjson.dumps({"type": "eval", "id": 1, "data": {}}).decode())
+            assert receive_results(websocket, 1)[0]["error"] == "No rules pinned"
@@ -0,0 +1,139 @@
+import pytest
+import asyncio
+from bson import ObjectId
+from fastapi import HTTPException
+from backend.models.rule_models import RuleCreate, JobCreate
+from backend.services.rule_service import RuleService
+from backend.services import job_service as job_module
+from backend.services.job_service import JobService
+from backend.testing.memory_collection import MemoryCollection, MemoryDatabase
+
+@pytest.fixture
+def database():
+    database = MemoryDatabase()
+    database.collections["people"] = MemoryCollection(
+        ({"_id": i, "age": 20 + i % 30, "salary": "n/a" if i == 25 else 1000 * i, "bio": "x" * 50}
+         for i in range(250)),
+        name="people"
+    )
+    return database
+
+@pytest.fixture
+def job_service(database):
+    return JobService(database, database["rules"], {"people", "people_scores", "scores", "rules"})
+
+async def create_rule(database, rule_string):
+    service = RuleService(database["rules"])
+    created = await service.create_rule(RuleCreate(name="Rule", rule_string=rule_string))
+    return created["id"]
+
+async def wait_for(job_service, job_id):
+    job = await job_service.get_job(job_id)
+    while job["status"] in ("PENDING", "RUNNING"):
+        await asyncio.sleep(0.01)
+        job = await job_service.get_job(job_id)
+    return job
+
+@pytest.mark.asyncio
+class TestJobService:
+    async def test_job_scores_collection(self, database, job_service):
+        rule_id = await create_rule(database, "age > 40 AND salary > 5000")
+
+        submitted = await job_service.submit_job(
+            JobCreate(rule_id=rule_id, source_collection="people", batch_size=64)
+        )
+        job = await wait_for(job_service, submitted["job_id"])
+
+        results = database["people_scores"].documents
+        assert job["status"] == "COMPLETED"
+        assert job["processed"] == len(results) == 250
+        assert job["errors"] == 1
+        assert job["matched"] == sum(1 for r in results if r["result"])
+        assert job["matched"] == sum(
+            1 for i in range(250) if 20 + i % 30 > 40 and i != 25 and 1000 * i > 5000
+        )
+
+    async def test_job_with_filter(self, database, job_service):
+        rule_id = await create_rule(database, "age < 25")
+
+        submitted = await job_service.submit_job(JobCreate(
+            rule_id=rule_id, 
+            source_collection="people", 
+            filter={"age": {"$gte": 45}}, 
+            result_collection="scores"
+        ))
+        await wait_for(job_service, submitted["job_id"])
+
+        assert submitted["total"] == len(database["scores"].documents)
+        assert not any(r["result"] for r in database["scores"].documents)
+
+    async def test_cancel_job(self, database, job_service):
+        rule_id = await create_rule(database, "age > 40")
+
+        submitted = await job_service.submit_job(
+            JobCreate(rule_id=rule_id, source_collection="people")
+        )
+        job = await job_service.cancel_job(submitted["job_id"])
+
+        assert job["status"] == "CANCELLED"
+        assert database["people_scores"].documents == []
+
+    async def test_unknown_rule(self, job_service):
+        with pytest.raises(HTTPException):
+            await job_service.submit_job(
+                JobCreate(rule_id="5f0000000000000000000000", source_collection="people")
+            )
+
+    async def test_rule_that_fails_to_compile(self, database, job_service):
+        rule_id = await create_rule(database, "bio MATCHES 'x'")
+        # Saved before patterns were checked
+        rule = await database["rules"].find_one({"_id": ObjectId(rule_id)})
+        ast = {**rule["ast"], "right": {**rule["ast"]["right"], "value": "(a+)+$"}}
+        await database["rules"].update_one({"_id": ObjectId(rule_id)}, {"$set": {"ast": ast}})
+
+        with pytest.raises(HTTPException) as error:
+            await job_service.submit_job(JobCreate(rule_id=rule_id, source_collection="people"))
+        assert error.value.status_code == 400
+
+    async def test_collections_refused(self, database, job_service):
+        rule_id = await create_rule(database, "age > 40")
+
+        # rules is configured in the fixture but stays reserved, like decision_tables
+        for source, result in (("other", None), ("people", "rules"), ("people", "decision_tables")):
+            with pytest.raises(HTTPException) as error:
+                await job_service.submit_job(
+                    JobCreate(rule_id=rule_id, source_collection=source, result_collection=result)
+                )
+            assert error.value.status_code == 403
+
+    async def test_cancelled_task_stays_cancelled(self, database, job_service, monkeypatch):
+        async def slow_chunk(*args):
+            await asyncio.sleep(10)
+        monkeypatch.setattr(job_service, "_score_chunk", slow_chunk)
+        rule_id = await create_rule(database, "age > 40")
+        submitted = await job_service.submit_job(
+            JobCreate(rule_id=rule_id, source_collection="people", batch_size=10)
+        )
+        while job_module._jobs[submitted["job_id"]].status.value != "RUNNING":
+            await asyncio.sleep(0)
+
+        await job_service.cancel_job(submitted["job_id"])
+
+        assert job_module._jobs[submitted["job_id"]].task.cancelled()
+
+    async def test_finished_jobs_pruned(self, database, job_service, monkeypatch):
+        monkeypatch.setattr(job_module, "MAX_FINISHED_JOBS", 2)
+        monkeypatch.setattr(job_module, "_jobs", {})
+        rule_id = await create_rule(database, "age > 40")
+
+        job_ids = []
+        for _ in range(4):
+            submitted = await job_service.submit_job(JobCreate(rule_id=rule_id, source_collection="people"))
+            await wait_for(job_service, submitted["job_id"])
+            job_ids.append(submitted["job_id"])
+
+        listed = [job["id"] for job in (await job_service.list_jobs())["jobs"]]
+        assert listed == job_ids[-2:]
+
+        monkeypatch.setattr(job_module, "FINISHED_JOB_TTL", 0)
+        assert (await job_service.list_jobs())["jobs"] == []
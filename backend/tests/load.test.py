@@ -0,0 +1,46 @@
+import pytest
+from backend.benchmarks.load import run_load, check_thresholds, percentile, app, _serve_uvicorn
+from database import get_database, get_scored_collections
+
+@pytest.mark.asyncio
+class TestLoadHarness:
+    async def test_run_load_in_process(self):
+        report = await run_load(requests=60, concurrency=4, seed_rules=5)
+
+        assert report["requests"] == 60
+        assert report["errors"] == 0
+        assert set(report["endpoints"]) <= {"create", "evaluate", "combine", "fetch"}
+        for stats in report["endpoints"].values():
+            assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+
+    async def test_thresholds_gate(self):
+        report = await run_load(requests=20, concurrency=2, mix={"evaluate": 1}, seed_rules=3)
+
+        assert check_thresholds(report, {"evaluate": 10000}, None, 0.0) == []
+        assert check_thresholds(report, {"evaluate": 0}, None, 0.0)
+        assert check_thresholds(report, {}, 1e9, 0.0)
+
+    async def test_restores_other_overrides(self):
+        previous = lambda: None
+        other = lambda: frozenset()
+        app.dependency_overrides[get_database] = previous
+        app.dependency_overrides[get_scored_collections] = other
+        try:
+            await run_load(requests=5, concurrency=1, seed_rules=3)
+
+            assert app.dependency_overrides[get_database] is previous
+            assert app.dependency_overrides[get_scored_collections] is other
+        finally:
+            app.dependency_overrides.clear()
+
+    async def test_uvicorn_startup_deadline(self):
+        with pytest.raises(RuntimeError):
+            await _serve_uvicorn(timeout=0)
+
+class TestPercentile:
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+
+        assert percentile(values, 0.50) == 50
+        assert percentile(values, 0.99) == 99
+        assert percentile([], 0.99) == 0.0
@@ -0,0 +1,229 @@
+import pytest
+import random
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from backend.engine.rule_engine import RuleEngine
+from backend.engine.mongo_filter import to_mongo_filter
+from backend.services.rule_service import RuleService
+from backend.models.rule_models import RuleCreate, RuleMatch
+from backend.testing.memory_collection import MemoryCollection, MemoryDatabase, matches
+from main import app
+from database import get_database, get_scored_collections
+from routes.rule_routes import get_rule_service
+# The app imports its modules without the backend prefix
+import services.rule_service as route_services
+
+RULES = [
+    "((age > 30 AND department = 'Sales') OR (age < 25 AND department = 'Marketing')) AND (salary > 50000 OR experience > 5)",
+    "department IN ['HR', 'IT'] AND age >= 40",
+    "department NOT IN ['HR', 'IT'] OR salary <= 20000",
+    "department != 'Sales' AND experience = 3",
+    "code = '7' OR code = 'A'",
+    "department STARTSWITH 'Ma' OR (department CONTAINS 'al' AND age > 30)",
+    "department MATCHES '^(HR|I.)$' AND code != 8"
+]
+
+DATE_RULES = [
+    "joined_at < '2023-01-01' AND age > 30",
+    "joined_at >= '2022-06-15T12:00:00Z' OR joined_at <= '2021-01-01T05:30:00+05:30'",
+    "joined_at = '2023-01-01' OR joined_at != '2022-03-01'"
+]
+
+@pytest.fixture
+def rule_engine():
+    return RuleEngine()
+
+def random_record(rng, numeric_strings=False):
+    record = {
+        "age": rng.randint(18, 60),
+        "department": rng.choice(["Sales", "Marketing", "HR", "IT", None]),
+        "salary": rng.choice([rng.randint(10000, 90000), rng.random() * 90000]),
+        "experience": rng.randint(0, 10),
+        "code": rng.choice([7, "7", "A", 8, True])
+    }
+    record["joined_at"] = datetime(2021, 1, 1) + timedelta(
+        days=rng.choice([0, rng.randint(0, 1000)]), hours=rng.choice([0, 12])
+    )
+    if numeric_strings:
+        record["age"] = str(record["age"])
+        record["joined_at"] = record["joined_at"].isoformat()
+    for field in ["salary", "department", "experience"]:
+        if rng.random() < 0.2:
+            record.pop(field)
+    return record
+
+class TestMongoFilter:
+    def test_translate_comparison(self, rule_engine):
+        node = rule_engine.create_rule("age > 30 AND department = 'Sales' AND level = 3")
+
+        assert to_mongo_filter(node) == {"$and": [
+            {"age": {"$gt": 30}},
+            {"department": "Sales"},
+            {"level": {"$in": ["3", 3]}}
+        ]}
+
+    def test_translate_negation_requires_field(self, rule_engine):
+        node = rule_engine.create_rule("department != 'Sales'")
+
+        assert to_mongo_filter(node) == {"department": {"$ne": None, "$nin": ["Sales"]}}
+
+    def test_translate_patterns(self, rule_engine):
+        node = rule_engine.create_rule("email STARTSWITH 'a.b' AND name CONTAINS '(x)'")
+        assert to_mongo_filter(node) == {"$and": [
+            {"email": {"$regex": "^a\\.b"}},
+            {"name": {"$regex": "\\(x\\)"}}
+        ]}
+
+    def test_backtracking_regex_not_sent(self, rule_engine):
+        from backend.engine.rule_engine import Node as EngineNode
+        stored = rule_engine.create_rule("code MATCHES 'a'").to_dict()
+        stored["right"]["value"] = "(a+)+$"
+
+        with pytest.raises(ValueError):
+            to_mongo_filter(EngineNode.from_dict(stored))
+
+    def test_non_numeric_bound(self, rule_engine):
+        node = rule_engine.create_rule("department > 'Sales'")
+
+        with pytest.raises(ValueError):
+            to_mongo_filter(node)
+
+    @pytest.mark.parametrize("rule", RULES)
+    def test_matches_evaluator(self, rule_engine, rule):
+        node = rule_engine.create_rule(rule)
+        rule_filter = to_mongo_filter(node)
+        rng = random.Random(3)
+
+        for _ in range(300):
+            record = random_record(rng)
+            assert matches(record, rule_filter) == rule_engine.evaluate_rule(node, record)
+
+    @pytest.mark.parametrize("rule", RULES)
+    def test_coerced_matches_evaluator(self, rule_engine, rule):
+        node = rule_engine.create_rule(rule)
+        rule_filter = to_mongo_filter(node, coerce_numeric_strings=True)
+        rng = random.Random(5)
+
+        for _ in range(300):
+            record = random_record(rng, numeric_strings=True)
+            assert matches(record, rule_filter) == rule_engine.evaluate_rule(node, record)
+
+    @pytest.mark.parametrize("rule", DATE_RULES)
+    def test_dates_match_evaluator(self, rule_engine, rule):
+        node = rule_engine.create_rule(rule)
+        rule_filter = to_mongo_filter(node)
+        rng = random.Random(7)
+
+        for _ in range(300):
+            record = random_record(rng)
+            assert matches(record, rule_filter) == rule_engine.evaluate_rule(node, record)
+
+    @pytest.mark.parametrize("rule", DATE_RULES)
+    def test_coerced_dates_match_evaluator(self, rule_engine, rule):
+        node = rule_engine.create_rule(rule)
+        rule_filter = to_mongo_filter(node, coerce_numeric_strings=True)
+        rng = random.Random(9)
+
+        for _ in range(300):
+            record = random_record(rng, numeric_strings=True)
+            assert matches(record, rule_filter) == rule_engine.evaluate_rule(node, record)
+
+    def test_coerced_date_equality_matches_strings(self, rule_engine):
+        node = rule_engine.create_rule("joined_at = '2023-01-01'")
+        rule_filter = to_mongo_filter(node, coerce_numeric_strings=True)
+        records = [
+            {"joined_at": "2023-01-01"},
+            {"joined_at": "2023-01-01T00:00:00Z"},
+            {"joined_at": datetime(2023, 1, 1)},
+            {"joined_at": "2023-01-02"},
+            {"joined_at": "soon"},
+            {}
+        ]
+        assert [matches(record, rule_filter) for record in records] == [True, True, True, False, False, False]
+
+        node = rule_engine.create_rule("joined_at != '2023-01-01'")
+        rule_filter = to_mongo_filter(node, coerce_numeric_strings=True)
+        assert [matches(record, rule_filter) for record in records] == [False, False, False, True, True, False]
+        for record in records:
+            assert matches(record, rule_filter) == rule_engine.evaluate_rule(node, record)
+
+    def test_translate_dates(self, rule_engine):
+        node = rule_engine.create_rule("joined_at < '2023-01-01T09:30:00+05:30'")
+        assert to_mongo_filter(node) == {"joined_at": {"$lt": datetime(2023, 1, 1, 4, 0)}}
+
+
+@pytest.mark.asyncio
+class TestMatchService:
+    async def test_count_matches(self, rule_engine):
+        service = RuleService(MemoryCollection())
+        created = await service.create_rule(
+            RuleCreate(name="Seniors", rule_string="age > 30 AND department = 'Sales'")
+        )
+        rng = random.Random(9)
+        records = [random_record(rng) for _ in range(200)]
+        expected = sum(
+            rule_engine.evaluate_rule(rule_engine.create_rule("age > 30 AND department = 'Sales'"), r)
+            for r in records
+        )
+
+        result = await service.count_matches(
+            RuleMatch(rule_id=created["id"], collection="people"),
+            MemoryCollection(records)
+        )
+
+        assert result["count"] == expected
+
+    async def test_stream_matches_with_filter(self):
+        service = RuleService(MemoryCollection())
+        created = await service.create_rule(RuleCreate(name="Adults", rule_string="age >= 18"))
+        target = MemoryCollection([
+            {"age": 20, "team": "a"},
+            {"age": 40, "team": "b"},
+            {"age": 10, "team": "a"}
+        ])
+        match = RuleMatch(
+            rule_id=created["id"], 
+            collection="people", 
+            filter={"team": "a"}, 
+            projection=["age"]
+        )
+
+        match_filter = await service.build_match_filter(match)
+        documents = [doc async for doc in service.stream_matches(match, match_filter, target)]
+
+        assert [doc["age"] for doc in documents] == [20]
+        assert "team" not in documents[0]
+
+    async def test_javascript_operators_refused(self):
+        service = RuleService(MemoryCollection())
+        created = await service.create_rule(RuleCreate(name="Adults", rule_string="age >= 18"))
+
+        for filter in ({"$where": "sleep(1000)"}, {"$or": [{"a": 1}, {"b": {"$function": {}}}]}):
+            with pytest.raises(HTTPException) as error:
+                await service.build_match_filter(
+                    RuleMatch(rule_id=created["id"], collection="people", filter=filter)
+                )
+            assert error.value.status_code == 400
+
+class TestMatchRoutes:
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def test_collection_allowlist(self):
+        database = MemoryDatabase()
+        database.collections["people"] = MemoryCollection([{"age": 20}, {"age": 10}], name="people")
+        service = route_services.RuleService(database["rules"])
+        app.dependency_overrides[get_rule_service] = lambda: service
+        app.dependency_overrides[get_database] = lambda: database
+        app.dependency_overrides[get_scored_collections] = lambda: frozenset({"people"})
+        client = TestClient(app)
+        rule = client.post("/api/v1/create/", json={"name": "Adults", "rule_string": "age >= 18"}).json()
+
+        allowed = client.post("/api/v1/match/count/", json={"rule_id": rule["id"], "collection": "people"})
+        assert allowed.json()["count"] == 1
+
+        for collection in ("rules", "other"):
+            for endpoint in ("/api/v1/match/count/", "/api/v1/match/stream/"):
+                refused = client.post(endpoint, json={"rule_id": rule["id"], "collection": collection})
+                assert refused.status_code == 403
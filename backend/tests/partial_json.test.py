@@ -0,0 +1,48 @@
+import orjson
+import pytest
+from backend.engine.partial_json import PartialJSONExtractor, extract_fields
+
+RECORD = {
+    "blob": "x\\\"y{[" * 20,
+    "nested": [[1, {"a": "}]\\"}], [], "q\"{"],
+    "age": 30,
+    "name": "a\"b",
+    "profile": {"address": {"city": "Pune"}, "tags": [1, 2, {"z": None}]},
+    "active": True,
+    "salary": -1.5e3,
+    "last": "end"
+}
+
+def chunked(raw, size):
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+class TestPartialJSON:
+    def test_extracts_wanted_keys_across_chunk_boundaries(self):
+        raw = orjson.dumps(RECORD, option=orjson.OPT_INDENT_2)
+        keys = ["age", "name", "profile", "active", "salary", "last"]
+        expected = {key: RECORD[key] for key in keys}
+
+        for size in range(1, 24):
+            assert extract_fields(chunked(raw, size), keys) == expected
+
+    def test_missing_keys_are_absent(self):
+        raw = orjson.dumps(RECORD)
+        assert extract_fields([raw], ["age", "missing"]) == {"age": 30}
+        assert extract_fields([b"{}"], ["age"]) == {}
+
+    def test_stops_once_every_key_is_found(self):
+        extractor = PartialJSONExtractor(["age"])
+        extractor.feed(b'{"age": 41, "blob": [1, 2')
+
+        assert extractor.done
+        assert extractor.close() == {"age": 41}
+
+    def test_first_occurrence_wins(self):
+        assert extract_fields([b'{"age": 1, "age": 2}'], ["age"]) == {"age": 1}
+
+    @pytest.mark.parametrize("raw", [
+        b'[1, 2]', b'{"age" 1}', b'{"age": 1', b'{"age": }', b'{"age": tru}', b'{age: 1}'
+    ])
+    def test_malformed(self, raw):
+        with pytest.raises(ValueError):
+            extract_fields([raw], ["age"])
@@ -0,0 +1,87 @@
+import pytest
+from backend.engine.rule_engine import RuleEngine
+
+RULE = "(age > 30 AND department = 'Sales') OR salary > 50000"
+
+RECORDS = [
+    {"age": 35, "department": "Sales", "salary": 10000},
+    {"age": 35, "department": "HR", "salary": 60000},
+    {"age": 20, "department": "Sales", "salary": 10000},
+    {"age": 20, "department": "IT", "salary": 90000}
+]
+
+@pytest.fixture
+def rule_engine():
+    return RuleEngine()
+
+def by_label(tree, label):
+    if tree["label"] == label:
+        return tree
+    for child in tree.get("children", []):
+        found = by_label(child, label)
+        if found:
+            return found
+    return None
+
+class TestRuleProfiler:
+    def test_counts_follow_short_circuiting(self, rule_engine):
+        node = rule_engine.create_rule(RULE)
+        profiler = rule_engine.profile_rule(node)
+        profiler.run(RECORDS)
+        report = profiler.report()
+
+        assert report["records"] == 4
+        assert report["matched"] == sum(rule_engine.evaluate_rule(node, r) for r in RECORDS) == 3
+        tree = report["tree"]
+        assert (tree["label"], tree["calls"], tree["true"], tree["false"]) == ("OR", 4, 3, 1)
+
+        age = by_label(tree, "age > 30")
+        department = by_label(tree, "department = 'Sales'")
+        salary = by_label(tree, "salary > 50000")
+        assert (age["calls"], age["true"], age["true_rate"]) == (4, 2, 0.5)
+        # Only reached when age > 30 holds
+        assert (department["calls"], department["true"]) == (2, 1)
+        # Only reached when the AND fails
+        assert (salary["calls"], salary["true"]) == (3, 2)
+
+        assert tree["total_ns"] >= tree["children"][0]["total_ns"] + tree["children"][1]["total_ns"]
+        assert tree["total_ns"] == report["total_ns"]
+        assert "children" not in age
+
+    def test_collapsed_stacks(self, rule_engine):
+        profiler = rule_engine.profile_rule(rule_engine.create_rule(RULE))
+        profiler.run(RECORDS * 10)
+        lines = profiler.collapsed().splitlines()
+
+        paths = {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in lines}
+        assert "OR;AND;age > 30" in paths
+        assert "OR;salary > 50000" in paths
+        assert all(weight > 0 for weight in paths.values())
+        self_total = sum(paths.values())
+        assert self_total <= profiler.report()["total_ns"]
+
+    def test_errors_and_labels(self, rule_engine):
+        node = rule_engine.create_rule(
+            "age > 30 AND department IN ['HR', 'IT'] AND joined_at < '2023-01-01'"
+        )
+        profiler = rule_engine.profile_rule(node)
+        profiler.run([
+            {"age": "old", "department": "HR", "joined_at": "2022-05-01"},
+            {"age": 40, "department": "HR", "joined_at": "2022-05-01"}
+        ])
+        report = profiler.report()
+
+        assert (report["matched"], report["errors"]) == (1, 1)
+        age = by_label(report["tree"], "age > 30")
+        assert (age["calls"], age["true"], age["false"], age["errors"]) == (2, 1, 0, 1)
+        assert by_label(report["tree"], "department IN ['HR', 'IT']")["calls"] == 1
+        assert by_label(report["tree"], "joined_at < '2023-01-01T00:00:00'")["true"] == 1
+
+    def test_compiled_rules_stay_uninstrumented(self, rule_engine):
+        node = rule_engine.create_rule(RULE)
+        profiler = rule_engine.profile_rule(node)
+        compiled = rule_engine.compile_rule(node)
+        for record in RECORDS:
+            compiled(record)
+
+        assert profiler.report()["tree"]["calls"] == 0
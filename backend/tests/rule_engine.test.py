@@ -83,4 +83,209 @@ class TestRuleEngine:
             "department": "Sales",
             "salary": 60000
         }
-        assert rule_engine.evaluate_rule(node, test_data) == True
\ No newline at end of file
+        assert rule_engine.evaluate_rule(node, test_data) == True
+
+    def test_create_membership_rule(self, rule_engine):
+        node = rule_engine.create_rule("department IN ['Sales', 'HR'] AND age NOT IN (18, 19)")
+
+        assert node.left.operator.value == "IN"
+        assert node.left.right.value == ["Sales", "HR"]
+        assert node.right.operator.value == "NOT IN"
+        assert node.right.right.value == [18, 19]
+
+    def test_evaluate_membership_rule(self, rule_engine):
+        node = rule_engine.create_rule("department IN ['Sales', 'HR'] AND age NOT IN (18, 19)")
+
+        assert rule_engine.evaluate_rule(node, {"department": "HR", "age": 30}) == True
+        assert rule_engine.evaluate_rule(node, {"department": "HR", "age": 18}) == False
+        assert rule_engine.evaluate_rule(node, {"department": "IT", "age": 30}) == False
+        assert rule_engine.evaluate_rule(node, {"age": 30}) == False
+
+    def test_unterminated_membership_list(self, rule_engine):
+        with pytest.raises(ValueError):
+            rule_engine.create_rule("department IN ['Sales', 'HR'")
+
+    def test_or_of_equalities_rewritten_to_membership(self, rule_engine):
+        node = rule_engine.create_rule(
+            "department = 'Sales' OR age > 30 OR department = 'HR' OR department = 'Sales'"
+        )
+
+        assert node.to_compact() == ["OR", ["IN", "department", ["Sales", "HR"]], [">", "age", 30]]
+        assert rule_engine.evaluate_rule(node, {"department": "HR"}) == True
+        assert rule_engine.evaluate_rule(node, {"department": "IT", "age": 35}) == True
+        assert rule_engine.evaluate_rule(node, {"department": "IT", "age": 25}) == False
+
+    def test_or_of_lower_bounds_keeps_loosest(self, rule_engine):
+        node = rule_engine.create_rule("age > 30 OR age > 20")
+
+        assert node.right.value == 20
+        assert rule_engine.evaluate_rule(node, {"age": 25}) == True
+
+    def test_evaluate_dotted_fields(self, rule_engine):
+        node = rule_engine.create_rule(
+            "profile.address.city = 'Pune' AND employment.salary > 50000 AND tags.0 = 'vip'"
+        )
+        record = {
+            "profile": {"address": {"city": "Pune"}},
+            "employment": {"salary": 60000},
+            "tags": ["vip"]
+        }
+
+        assert rule_engine.evaluate_rule(node, record) == True
+        assert rule_engine.compile_rule(node)(record) == True
+        assert rule_engine.evaluate_rule(node, {"profile": {"address": None}}) == False
+
+    def test_dotted_fields_accept_flattened_records(self, rule_engine):
+        node = rule_engine.create_rule("employment.salary > 50000")
+
+        assert rule_engine.evaluate_rule(node, {"employment.salary": 60000}) == True
+        assert rule_engine.compile_rule(node)({"employment.salary": 40000}) == False
+
+    def test_shared_path_resolved_once(self, rule_engine):
+        class CountingRecord(dict):
+            lookups = 0
+
+            def get(self, key, default=None):
+                CountingRecord.lookups += 1
+                return super().get(key, default)
+
+        node = rule_engine.create_rule("employment.salary > 50000 AND employment.salary < 90000")
+        compiled = rule_engine.compile_rule(node)
+
+        assert compiled(CountingRecord(employment={"salary": 60000})) == True
+        # One flat-key check and one step into "employment"
+        assert CountingRecord.lookups == 2
+
+
+class TestPatternOperators:
+    def test_create_pattern_rule(self, rule_engine):
+        node = rule_engine.create_rule("email MATCHES '^[a-z]+@(corp|example)\\.com$' AND name STARTSWITH 'Al'")
+
+        assert node.left.operator.value == "MATCHES"
+        # Parentheses inside quotes stay part of the pattern
+        assert node.left.right.value == "^[a-z]+@(corp|example)\\.com$"
+        # Compiled once when the rule is parsed
+        assert node.left.right.compiled.pattern == node.left.right.value
+        assert node.right.right.compiled == "Al"
+
+    def test_evaluate_pattern_rule(self, rule_engine):
+        node = rule_engine.create_rule(
+            "(email MATCHES '@corp\\.com$' AND name STARTSWITH 'Al') OR notes CONTAINS 'vip (gold)'"
+        )
+        compiled = rule_engine.compile_rule(node)
+
+        for record, expected in [
+            ({"email": "al@corp.com", "name": "Alice"}, True),
+            ({"email": "al@corp.com", "name": "Bob"}, False),
+            ({"notes": "a vip (gold) customer"}, True),
+            ({"email": "al@corp.org", "name": "Alice", "notes": "vip"}, False)
+        ]:
+            assert rule_engine.evaluate_rule(node, record) == expected
+            assert compiled(record) == expected
+
+    def test_patterns_match_str_of_numbers(self, rule_engine):
+        node = rule_engine.create_rule("zip STARTSWITH '41'")
+        assert rule_engine.evaluate_rule(node, {"zip": 411001}) == True
+
+    def test_stored_pattern_rule_compiles_lazily(self, rule_engine):
+        from backend.engine.rule_engine import Node as EngineNode
+        stored = rule_engine.create_rule("code MATCHES '^A[0-9]+$'").to_dict()
+        node = EngineNode.from_dict(stored)
+
+        assert node.right.compiled is None
+        assert rule_engine.evaluate_rule(node, {"code": "A12"}) == True
+        assert node.right.compiled is not None
+
+    def test_invalid_regex(self, rule_engine):
+        with pytest.raises(ValueError):
+            rule_engine.create_rule("code MATCHES '(['")
+
+    def test_backtracking_regex_refused(self, rule_engine):
+        for pattern in ["(a+)+$", "(\\w+\\s?)*x", "a" * 300]:
+            with pytest.raises(ValueError):
+                rule_engine.create_rule(f"code MATCHES '{pattern}'")
+
+        # Checked again for stored rules, compiled on first use
+        from backend.engine.rule_engine import Node as EngineNode
+        stored = rule_engine.create_rule("code MATCHES 'a'").to_dict()
+        stored["right"]["value"] = "(a*)*b"
+        with pytest.raises(ValueError):
+            rule_engine.evaluate_rule(EngineNode.from_dict(stored), {"code": "a" * 40})
+
+class TestDateComparisons:
+    def test_date_literals_become_epoch_constants(self, rule_engine):
+        node = rule_engine.create_rule("joined_at < '2023-01-01' AND seen >= '2023-01-01T09:30:00+05:30'")
+        assert (node.left.right.value, node.left.right.attribute) == (1672531200000000, "datetime")
+        assert node.right.right.value == 1672531200000000 + 4 * 3600 * 10 ** 6
+        # Only full ISO dates, other quoted strings are left alone
+        for literal in ["2023-13", "20230101", "2023-01-01 soon"]:
+            assert rule_engine.create_rule(f"code = '{literal}'").right.value == literal
+
+    def test_evaluate_dates(self, rule_engine):
+        from datetime import date, datetime, timezone
+        node = rule_engine.create_rule("joined_at < '2023-01-01' AND age > 30")
+        compiled = rule_engine.compile_rule(node)
+        records = [
+            ({"joined_at": "2022-12-31T23:59:59Z", "age": 35}, True),
+            ({"joined_at": "2023-01-01T04:00:00+05:30", "age": 35}, True),
+            ({"joined_at": datetime(2023, 1, 1), "age": 35}, False),
+            ({"joined_at": datetime(2022, 12, 31, 20, tzinfo=timezone.utc), "age": 35}, True),
+            ({"joined_at": date(2022, 5, 1), "age": 35}, True),
+            ({"joined_at": "2024-02-29", "age": 35}, False)
+        ]
+        for record, expected in records:
+            assert rule_engine.evaluate_rule(node, record) is expected
+            assert compiled(record) is expected
+
+        with pytest.raises(ValueError):
+            compiled({"joined_at": "soon", "age": 35})
+        equality = rule_engine.create_rule("joined_at = '2023-01-01'")
+        assert rule_engine.evaluate_rule(equality, {"joined_at": "2023-01-01T00:00:00"}) is True
+        assert rule_engine.evaluate_rule(equality, {"joined_at": "soon"}) is False
+
+    def test_date_bounds_merge_only_with_dates(self, rule_engine):
+        node = rule_engine.create_rule("d > '2023-01-01' OR d > '2022-01-01'")
+        assert node.to_compact() == [">", "d", {"datetime": 1640995200000000}]
+        node = rule_engine.create_rule("d > '2023-01-01' OR d > 5")
+        assert node.to_compact()[0] == "OR"
+        # Equal dates are compared as instants, not folded into a str() IN list
+        node = rule_engine.create_rule("d = '2023-01-01' OR d = '2022-01-01'")
+        assert node.to_compact()[0] == "OR"
+
+    def test_stored_date_rule(self, rule_engine):
+        from backend.engine.rule_engine import Node as EngineNode
+        stored = rule_engine.create_rule("d >= '2023-01-01'").to_dict()
+        node = EngineNode.from_dict(stored)
+        assert rule_engine.compile_rule(node)({"d": "2023-01-01"}) is True
+        assert EngineNode.from_compact(node.to_compact()).to_dict() == stored
+
+
+class TestCompiledFragments:
+    def test_structural_keys(self, rule_engine):
+        from backend.engine.structural_hash import subtree_key
+        node = rule_engine.create_rule("(age > 30 AND dept = 'Sales') OR salary > 50000")
+        same = rule_engine.create_rule("salary > 50000 OR (age > 30 AND dept = 'Sales')")
+
+        assert subtree_key(node.left) == subtree_key(same.right)
+        assert subtree_key(node) != subtree_key(same)
+        # Constants are typed, a number, a string and a date never share a key
+        assert (subtree_key(rule_engine.create_rule("age > 30"))
+                != subtree_key(rule_engine.create_rule("age > '30'")))
+        date = rule_engine.create_rule("d > '2023-01-01'")
+        number = rule_engine.create_rule(f"d > {date.right.value}")
+        assert subtree_key(date) != subtree_key(number)
+
+    def test_edit_compiles_only_changed_subtrees(self):
+        from backend.services.eval_cache import TTLCache
+        fragments = TTLCache(ttl=None)
+        engine = RuleEngine(fragments)
+        rule = "age > 30 AND (dept = 'Sales' OR salary > 50000)"
+        evaluate = engine.compile_rule(engine.create_rule(rule))
+        assert len(fragments) == 5
+
+        edited = engine.compile_rule(engine.create_rule(rule.replace("30", "40")))
+        # The new comparison and the AND above it, the OR subtree is reused
+        assert len(fragments) == 7
+        assert evaluate({"age": 35, "dept": "Sales"}) is True
+        assert edited({"age": 35, "dept": "Sales"}) is False
+        assert edited({"age": 45, "salary": 60000}) is True
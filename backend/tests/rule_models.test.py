@@ -120,4 +120,26 @@ class TestRuleModels:
             updated_at="2024-01-01T00:00:00"
         )
         assert response.description is None
-        assert response.parent_rules == []
\ No newline at end of file
+        assert response.parent_rules == []
+
+    def test_node_compact_round_trip(self):
+        node = Node(
+            type=NodeType.OPERATOR,
+            operator=Operator.AND,
+            left=Node(
+                type=NodeType.COMPARISON,
+                operator=Operator.GT,
+                left=Node(type=NodeType.OPERAND, value="age"),
+                right=Node(type=NodeType.OPERAND, value=30)
+            ),
+            right=Node(
+                type=NodeType.COMPARISON,
+                operator=Operator.EQ,
+                left=Node(type=NodeType.OPERAND, value="department"),
+                right=Node(type=NodeType.OPERAND, value="Sales")
+            )
+        )
+
+        compact = node.to_compact()
+        assert compact == ["AND", [">", "age", 30], ["=", "department", "Sales"]]
+        assert Node.from_compact(compact).to_dict() == node.to_dict()
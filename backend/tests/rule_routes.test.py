@@ -1,7 +1,9 @@
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, patch
+from datetime import datetime
 from main import app
+from routes.rule_routes import get_rule_service
 from backend.models.rule_models import RuleCreate, RuleCombine, Operator
 
 client = TestClient(app)
@@ -133,4 +135,97 @@ class TestRuleRoutes:
         assert response.status_code == 200
         assert "rules" in response.json()
         assert "total" in response.json()
-        assert "page" in response.json()
\ No newline at end of file
+        assert "page" in response.json()
+
+class TestRuleRoutesResponses:
+    @pytest.fixture(autouse=True)
+    def override_service(self, mock_rule_service):
+        app.dependency_overrides[get_rule_service] = lambda: mock_rule_service
+        yield
+        app.dependency_overrides.clear()
+
+    def test_create_rule_ast_format(self, mock_rule_service):
+        mock_rule_service.create_rule.return_value = {"id": "123"}
+
+        response = client.post(
+            "/api/v1/create/?ast=none",
+            json={"name": "Test Rule", "rule_string": "age > 30"}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"id": "123"}
+        assert mock_rule_service.create_rule.call_args[0][1].value == "none"
+
+    def test_get_rule_serializes_datetimes(self, mock_rule_service):
+        mock_rule_service.get_rule.return_value = {
+            "id": "123",
+            "version": 1,
+            "created_at": datetime(2024, 1, 1)
+        }
+
+        response = client.get("/api/v1/rule/123")
+
+        assert response.status_code == 200
+        assert response.json()["created_at"] == "2024-01-01T00:00:00"
+
+    def test_get_rule_conditional(self, mock_rule_service):
+        mock_rule_service.get_rule.return_value = {"id": "123", "version": 4}
+
+        response = client.get("/api/v1/rule/123")
+        assert response.headers["etag"] == '"123-4"'
+
+        cached = client.get("/api/v1/rule/123", headers={"If-None-Match": '"123-4"'})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        mock_rule_service.get_rule.return_value = {"id": "123", "version": 5}
+        changed = client.get("/api/v1/rule/123", headers={"If-None-Match": '"123-4"'})
+        assert changed.status_code == 200
+        assert changed.json()["version"] == 5
+
+    def test_list_rules_conditional(self, mock_rule_service):
+        mock_rule_service.get_rules.return_value = {
+            "rules": [{"id": "123", "version": 7}],
+            "total": 1,
+            "page": 1,
+            "pages": 1,
+            "latest_version": 7
+        }
+
+        response = client.get("/api/v1/fetch/?since=3")
+        assert mock_rule_service.get_rules.call_args[0] == (1, 10, 3)
+
+        cached = client.get(
+            "/api/v1/fetch/?since=3", 
+            headers={"If-None-Match": response.headers["etag"]}
+        )
+        assert cached.status_code == 304
+
+    def test_diagram_max_nodes_bounded(self, mock_rule_service):
+        mock_rule_service.get_decision_diagram_report.return_value = {"id": "123"}
+
+        assert client.get("/api/v1/rule/123/diagram?max_nodes=500").status_code == 200
+        assert mock_rule_service.get_decision_diagram_report.call_args[0] == ("123", 500)
+        for max_nodes in (0, 100001):
+            response = client.get(f"/api/v1/rule/123/diagram?max_nodes={max_nodes}")
+            assert response.status_code == 422
+
+    def test_profile_formats(self, mock_rule_service):
+        mock_rule_service.profile_rule.return_value = ({"id": "123", "records": 1}, "AND;age > 30 120\n")
+        app.dependency_overrides[get_rule_service] = lambda: mock_rule_service
+        try:
+            response = client.post("/api/v1/rule/123/profile", json={"records": [{"age": 35}]})
+            assert response.json() == {"id": "123", "records": 1}
+
+            response = client.post(
+                "/api/v1/rule/123/profile?format=collapsed", json={"records": [{"age": 35}]}
+            )
+            assert response.headers["content-type"].startswith("text/plain")
+            assert response.text == "AND;age > 30 120\n"
+
+            assert client.post("/api/v1/rule/123/profile", json={"records": []}).status_code == 422
+            # At most 100000 evaluations per request
+            too_many = {"records": [{"age": 35}] * 2000, "repeat": 100}
+            assert client.post("/api/v1/rule/123/profile", json=too_many).status_code == 422
+        finally:
+            app.dependency_overrides.pop(get_rule_service, None)
@@ -2,8 +2,10 @@ import pytest
 from unittest.mock import Mock, AsyncMock
 from datetime import datetime
 from bson import ObjectId
-from backend.models.rule_models import RuleCreate, RuleCombine, Operator
-from backend.services.rule_service import RuleService
+from fastapi import HTTPException
+from backend.models.rule_models import RuleCreate, RuleCombine, RuleProfile, Operator
+from backend.services.rule_service import RuleService, AstFormat
+from backend.testing.memory_collection import MemoryCollection
 
 @pytest.fixture
 def mock_collection():
@@ -170,4 +172,192 @@ class TestRuleService:
         assert len(result["rules"]) == 1
         assert "total" in result
         assert "page" in result
-        assert "pages" in result
\ No newline at end of file
+        assert "pages" in result
+
+    async def test_create_rule_ast_formats(self, rule_service):
+        rule_data = RuleCreate(
+            name="Test Rule",
+            rule_string="age > 30"
+        )
+        rule_service.collection.insert_one.return_value = AsyncMock(
+            inserted_id=ObjectId()
+        )
+
+        compact = await rule_service.create_rule(rule_data, AstFormat.COMPACT)
+        assert compact["ast"] == [">", "age", 30]
+
+        bare = await rule_service.create_rule(rule_data, AstFormat.NONE)
+        assert "ast" not in bare
+
+        stored = rule_service.collection.insert_one.call_args[0][0]
+        assert stored["ast"]["operator"] == ">"
+
+
+@pytest.mark.asyncio
+class TestRuleVersions:
+    async def test_versions_increase_and_list_changes(self):
+        service = RuleService(MemoryCollection())
+        first = await service.create_rule(RuleCreate(name="First", rule_string="age > 30"))
+        second = await service.create_rule(RuleCreate(name="Second", rule_string="age < 20"))
+        edited = await service.edit_rule(
+            first["id"], RuleCreate(name="First", rule_string="age > 35")
+        )
+
+        assert first["version"] < second["version"] < edited["version"]
+        assert (await service.get_rule(first["id"]))["version"] == edited["version"]
+
+        changes = await service.get_rules(since=second["version"] - 1)
+        assert [rule["id"] for rule in changes["rules"]] == [second["id"], first["id"]]
+        assert changes["latest_version"] == edited["version"]
+
+        unchanged = await service.get_rules(since=edited["version"])
+        assert unchanged["rules"] == []
+        assert unchanged["latest_version"] == edited["version"]
+
+        listing = await service.get_rules()
+        assert listing["total"] == 2
+
+    async def test_no_op_edit_keeps_version(self):
+        service = RuleService(MemoryCollection())
+        created = await service.create_rule(RuleCreate(name="Rule", rule_string="age > 30"))
+
+        with pytest.raises(HTTPException) as error:
+            await service.edit_rule(created["id"], RuleCreate(name="Rule", rule_string="age > 30"))
+
+        assert error.value.status_code == 404
+        assert (await service.get_rule(created["id"]))["version"] == created["version"]
+
+    async def test_changes_wait_for_writes_in_flight(self):
+        service = RuleService(MemoryCollection())
+        first = await service.create_rule(RuleCreate(name="First", rule_string="age > 30"))
+
+        # Another worker has taken the next version but not yet written its rule
+        in_flight, token = await service.store._begin_write()
+        later = await service.create_rule(RuleCreate(name="Later", rule_string="age < 20"))
+        assert later["version"] > in_flight
+
+        changes = await service.get_rules(since=first["version"])
+        assert changes["rules"] == []
+        assert changes["latest_version"] == first["version"]
+        assert await service.latest_version() == in_flight - 1
+
+        await service.store._end_write(token)
+        changes = await service.get_rules(since=first["version"])
+        assert [rule["id"] for rule in changes["rules"]] == [later["id"]]
+        assert changes["latest_version"] == later["version"]
+
+    async def test_settled_version_advances_under_overlapping_writes(self):
+        store = RuleService(MemoryCollection()).store
+        # Some write is always in flight, as under steady load from several workers
+        previous, previous_token = await store._begin_write()
+        for _ in range(5):
+            version, token = await store._begin_write()
+            await store._end_write(previous_token)
+            assert await store.current_version() == version - 1
+            previous, previous_token = version, token
+
+        await store._end_write(previous_token)
+        assert await store.current_version() == previous
+        counter = await store.collection.find_one({"_id": "rule_version"})
+        assert (counter["pending"], counter["versions"]) == ([], [])
+
+@pytest.mark.asyncio
+class TestRecombination:
+    async def test_edit_recombines_descendants(self):
+        service = RuleService(MemoryCollection())
+        first = await service.create_rule(RuleCreate(name="First", rule_string="age > 30"))
+        second = await service.create_rule(RuleCreate(name="Second", rule_string="dept = 'Sales'"))
+        both = await service.combine_rules(RuleCombine(
+            rule_ids=[second["id"], first["id"]], name="Both", operator="AND"
+        ))
+        either = await service.combine_rules(RuleCombine(
+            rule_ids=[both["id"], first["id"]], name="Either", operator="OR"
+        ))
+        assert both["rule_string"] == "(dept = 'Sales') AND (age > 30)"
+
+        edited = await service.edit_rule(first["id"], RuleCreate(name="First", rule_string="age > 40"))
+        assert [rule["id"] for rule in edited["recombined"]] == [both["id"], either["id"]]
+        assert (await service.get_rule(both["id"]))["rule_string"] == "(dept = 'Sales') AND (age > 40)"
+        assert (await service.get_rule(either["id"]))["rule_string"] == (
+            "((dept = 'Sales') AND (age > 40)) OR (age > 40)"
+        )
+
+        record = {"age": 35, "dept": "Sales"}
+        assert (await service.evaluate_rule(both["id"], record))["result"] is False
+        assert (await service.evaluate_rule(either["id"], record))["result"] is False
+
+        edited = await service.edit_rule(second["id"], RuleCreate(name="Second", rule_string="dept = 'HR'"))
+        assert [rule["id"] for rule in edited["recombined"]] == [both["id"], either["id"]]
+        # A rule without children recombines nothing
+        edited = await service.edit_rule(either["id"], RuleCreate(name="Either", rule_string="age > 50"))
+        assert edited["recombined"] == []
+        # and once edited by hand, a combined rule keeps its own rule string
+        edited = await service.edit_rule(first["id"], RuleCreate(name="First", rule_string="age > 45"))
+        assert [rule["id"] for rule in edited["recombined"]] == [both["id"]]
+        assert (await service.get_rule(either["id"]))["rule_string"] == "age > 50"
+
+    async def test_failed_recombination_leaves_rules_unchanged(self):
+        service = RuleService(MemoryCollection())
+        first = await service.create_rule(RuleCreate(name="First", rule_string="age > 30"))
+        second = await service.create_rule(RuleCreate(name="Second", rule_string="dept = 'Sales'"))
+        both = await service.combine_rules(RuleCombine(
+            rule_ids=[first["id"], second["id"]], name="Both", operator="AND"
+        ))
+        # A derived rule that can no longer be combined
+        await service.store.update(both["id"], {"operator": "XOR"})
+
+        with pytest.raises(HTTPException) as error:
+            await service.edit_rule(first["id"], RuleCreate(name="First", rule_string="age > 40"))
+        assert error.value.status_code == 400
+        assert both["id"] in error.value.detail
+        assert (await service.get_rule(first["id"]))["rule_string"] == "age > 30"
+        assert (await service.get_rule(both["id"]))["rule_string"] == "(age > 30) AND (dept = 'Sales')"
+
+
+@pytest.mark.asyncio
+class TestRawEvaluation:
+    async def test_evaluate_raw_reads_only_rule_fields(self):
+        service = RuleService(MemoryCollection())
+        rule = await service.create_rule(RuleCreate(
+            name="Raw", rule_string="age > 30 AND profile.city = 'Pune'"
+        ))
+        body = (b'{"blob": "' + b"x" * 100000 + b'", "age": 35, '
+                b'"profile": {"city": "Pune"}, "history": [[1, 2], {"a": "]"}]}')
+
+        async def chunks():
+            for start in range(0, len(body), 4096):
+                yield body[start:start + 4096]
+
+        result = await service.evaluate_raw(rule["id"], chunks())
+        assert result["result"] is True
+
+    async def test_evaluate_raw_malformed_body(self):
+        service = RuleService(MemoryCollection())
+        rule = await service.create_rule(RuleCreate(name="Raw", rule_string="age > 30"))
+
+        async def chunks():
+            yield b'{"age": '
+
+        with pytest.raises(Exception):
+            await service.evaluate_raw(rule["id"], chunks())
+
+
+@pytest.mark.asyncio
+class TestProfiling:
+    async def test_profile_rule(self):
+        service = RuleService(MemoryCollection())
+        rule = await service.create_rule(RuleCreate(
+            name="Profiled", rule_string="age > 30 AND department = 'Sales'"
+        ))
+        sample = RuleProfile(records=[{"age": 35, "department": "Sales"}, {"age": 20}], repeat=3)
+
+        report, collapsed = await service.profile_rule(rule["id"], sample)
+        assert (report["records"], report["matched"], report["repeat"]) == (6, 3, 3)
+        assert report["tree"]["children"][1]["calls"] == 3
+        assert "AND;age > 30 " in collapsed
+
+    async def test_profile_missing_rule(self):
+        service = RuleService(MemoryCollection())
+        with pytest.raises(HTTPException) as error:
+            await service.profile_rule("0" * 24, RuleProfile(records=[{}]))
+        assert error.value.status_code == 404
@@ -0,0 +1,68 @@
+import pytest
+from backend.engine.rule_engine import RuleEngine
+from backend.engine.rule_set import PrefixTrie
+from backend.services.rule_service import RuleService, RuleCreate
+from backend.testing.memory_collection import MemoryCollection
+
+@pytest.fixture
+def rule_engine():
+    return RuleEngine()
+
+class TestPrefixTrie:
+    def test_matches_every_prefix(self):
+        trie = PrefixTrie()
+        for prefix in ["", "4", "41", "4110", "52"]:
+            trie.add(prefix)
+
+        assert trie.matches("411001") == {"", "4", "41", "4110"}
+        assert trie.matches("5") == {""}
+
+class TestRuleSet:
+    def test_shares_trie_per_field(self, rule_engine):
+        rules = {
+            "pune": rule_engine.create_rule("zip STARTSWITH '411' AND age > 30"),
+            "west": rule_engine.create_rule("zip STARTSWITH '4' OR zip STARTSWITH '3'"),
+            "delhi": rule_engine.create_rule("zip STARTSWITH '110'"),
+            "sales": rule_engine.create_rule("department = 'Sales'")
+        }
+        rule_set = rule_engine.compile_rule_set(rules)
+
+        assert list(rule_set.tries) == ["zip"]
+        assert rule_set.prefix_matches({"zip": 411001}) == {"zip": {"411", "4"}}
+
+        record = {"zip": "411001", "age": 35, "department": "Sales"}
+        assert rule_set.evaluate(record) == {"pune": True, "west": True, "delhi": False, "sales": True}
+        assert rule_set.evaluate({"age": 35}) == {"pune": False, "west": False, "delhi": False, "sales": False}
+
+    def test_matches_individual_evaluation(self, rule_engine):
+        rules = {
+            "a": rule_engine.create_rule("code STARTSWITH 'AB' AND name CONTAINS 'x'"),
+            "b": rule_engine.create_rule("code STARTSWITH 'A' OR name MATCHES '^y'")
+        }
+        rule_set = rule_engine.compile_rule_set(rules)
+
+        for record in [{"code": "ABC", "name": "axe"}, {"code": "AC", "name": "yes"},
+                       {"code": "B", "name": "y"}, {"name": "x"}]:
+            assert rule_set.evaluate(record) == {
+                rule_id: rule_engine.evaluate_rule(node, record) for rule_id, node in rules.items()
+            }
+
+@pytest.mark.asyncio
+class TestEvaluateRules:
+    async def test_evaluate_rules(self):
+        service = RuleService(MemoryCollection())
+        pune = await service.create_rule(RuleCreate(name="Pune", rule_string="zip STARTSWITH '411'"))
+        adult = await service.create_rule(RuleCreate(name="Adult", rule_string="age >= 18"))
+
+        result = await service.evaluate_rules([pune["id"], adult["id"]], {"zip": "560001", "age": 20})
+        assert result == {
+            "results": {pune["id"]: False, adult["id"]: True},
+            "matched": [adult["id"]]
+        }
+
+    async def test_missing_rule(self):
+        service = RuleService(MemoryCollection())
+        adult = await service.create_rule(RuleCreate(name="Adult", rule_string="age >= 18"))
+
+        with pytest.raises(Exception):
+            await service.evaluate_rules([adult["id"], "0" * 24], {"age": 20})
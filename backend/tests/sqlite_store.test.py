@@ -0,0 +1,154 @@
+import pytest
+import dotenv.main
+from datetime import datetime
+from fastapi.testclient import TestClient
+from bson import ObjectId
+from bson.errors import InvalidId
+from backend.services.rule_service import RuleService, RuleCreate, RuleCombine
+from backend.storage.sqlite_store import SQLiteRuleStore
+from main import app
+# The app imports its modules without the backend prefix
+import database as route_database
+
+def rule_doc(name, version):
+    return {
+        "name": name,
+        "description": None,
+        "rule_string": "age > 30",
+        "ast": {"type": "comparison", "operator": ">"},
+        "version": version,
+        "created_at": datetime(2024, 1, 1, 12, 30),
+        "updated_at": datetime(2024, 1, 1, 12, 30)
+    }
+
+@pytest.mark.asyncio
+class TestSQLiteRuleStore:
+    async def test_insert_and_find_one(self):
+        store = SQLiteRuleStore()
+        rule_id = await store.insert(rule_doc("Rule 1", 1))
+
+        rule = await store.find_one(rule_id)
+        assert rule["_id"] == rule_id
+        assert rule["name"] == "Rule 1"
+        assert rule["ast"] == {"type": "comparison", "operator": ">"}
+        assert rule["created_at"] == datetime(2024, 1, 1, 12, 30)
+        assert await store.find_one(str(ObjectId())) is None
+
+    async def test_invalid_id_raises(self):
+        with pytest.raises(InvalidId):
+            await SQLiteRuleStore().find_one("not-an-id")
+
+    async def test_find_many_batches_and_keeps_request_order(self):
+        store = SQLiteRuleStore()
+        ids = [await store.insert(rule_doc(f"Rule {i}", i)) for i in range(600)]
+        requested = ids[::-1] + [str(ObjectId())]
+
+        rules = await store.find_many(requested)
+        assert [rule["_id"] for rule in rules] == ids[::-1]
+        assert [rule["_id"] for rule in await store.find_many(ids[:3])] == ids[:3]
+
+    async def test_update(self):
+        store = SQLiteRuleStore()
+        rule_id = await store.insert(rule_doc("Rule 1", 1))
+
+        assert await store.update(rule_id, {"name": "Renamed", "updated_at": datetime(2024, 2, 1)}) == 2
+        # Only the timestamp differs, so nothing changes and no version is taken
+        assert await store.update(rule_id, {"name": "Renamed", "updated_at": datetime(2024, 3, 1)}) is None
+        assert await store.update(str(ObjectId()), {"name": "Missing"}) is None
+
+        rule = await store.find_one(rule_id)
+        assert (rule["name"], rule["version"]) == ("Renamed", 2)
+        assert await store.current_version() == 2
+
+    async def test_find_page_and_since(self):
+        store = SQLiteRuleStore()
+        ids = [await store.insert(rule_doc(f"Rule {i}", 0)) for i in range(3)]
+        await store.update(ids[0], {"name": "Renamed"})
+
+        total, rules = await store.find_page(1, 1)
+        assert total == 3
+        assert [rule["_id"] for rule in rules] == [ids[1]]
+
+        total, rules = await store.find_page(0, 10, since=1)
+        assert total == 3
+        assert [rule["version"] for rule in rules] == [2, 3, 4]
+
+        total, rules = await store.find_page(0, 10, since=1, until=3)
+        assert [rule["_id"] for rule in rules] == [ids[1], ids[2]]
+
+    async def test_find_children(self):
+        store = SQLiteRuleStore()
+        parent, other = [await store.insert(rule_doc(f"Rule {i}", 0)) for i in range(2)]
+        child = await store.insert({**rule_doc("Both", 0), "parent_rules": [parent, other]})
+
+        assert [rule["_id"] for rule in await store.find_children(parent)] == [child]
+        assert await store.find_children(child) == []
+
+    async def test_versions_persist(self, tmp_path):
+        path = str(tmp_path / "rules.db")
+        store = SQLiteRuleStore(path)
+        for i in range(3):
+            await store.insert(rule_doc(f"Rule {i}", 0))
+        store.close()
+
+        reopened = SQLiteRuleStore(path)
+        doc = rule_doc("Rule 3", 0)
+        await reopened.insert(doc)
+        assert doc["version"] == 4 == await reopened.current_version()
+
+
+@pytest.mark.asyncio
+class TestRuleServiceOnSQLite:
+    async def test_rule_lifecycle(self):
+        service = RuleService(SQLiteRuleStore())
+        first = await service.create_rule(RuleCreate(name="First", rule_string="age > 30"))
+        second = await service.create_rule(
+            RuleCreate(name="Second", rule_string="department = 'Sales'")
+        )
+        combined = await service.combine_rules(RuleCombine(
+            rule_ids=[first["id"], second["id"]], name="Both", operator="AND"
+        ))
+
+        result = await service.evaluate_rule(combined["id"], {"age": 35, "department": "Sales"})
+        assert result["result"] is True
+
+        edited = await service.edit_rule(first["id"], RuleCreate(name="First", rule_string="age > 40"))
+        result = await service.evaluate_rule(first["id"], {"age": 35})
+        assert result["result"] is False
+        # The combined rule follows its edited parent
+        assert [rule["id"] for rule in edited["recombined"]] == [combined["id"]]
+        result = await service.evaluate_rule(combined["id"], {"age": 35, "department": "Sales"})
+        assert result["result"] is False
+
+        listing = await service.get_rules()
+        assert listing["total"] == 3
+        assert (await service.get_rule(combined["id"]))["parent_rules"] == [first["id"], second["id"]]
+
+        changes = await service.get_rules(since=combined["version"])
+        assert [rule["id"] for rule in changes["rules"]] == [first["id"], combined["id"]]
+
+
+class TestSQLiteApp:
+    def test_runs_without_mongo_settings(self, monkeypatch, tmp_path):
+        for name in ("MONGODB_URL", "DATABASE_NAME", "COLLECTION_NAME"):
+            monkeypatch.delenv(name, raising=False)
+        monkeypatch.setenv("RULE_STORE", "sqlite")
+        monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "rules.db"))
+        # No .env file either
+        monkeypatch.setattr(dotenv.main, "find_dotenv", lambda *args, **kwargs: "")
+        route_database.close_clients()
+        route_database.get_settings.cache_clear()
+        try:
+            with TestClient(app) as client:
+                created = client.post("/api/v1/create/", json={"name": "Edge", "rule_string": "age > 30"})
+                assert created.status_code == 200
+                evaluated = client.post(
+                    "/api/v1/evaluate/", json={"rule_id": created.json()["id"], "data": {"age": 35}}
+                )
+                assert evaluated.json()["result"] is True
+                assert client.get("/api/v1/fetch/").json()["total"] == 1
+                # No Mongo client was created
+                assert route_database._client is None
+        finally:
+            route_database.close_clients()
+            route_database.get_settings.cache_clear()
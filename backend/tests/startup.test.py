@@ -0,0 +1,18 @@
+from backend.benchmarks.startup import measure_startup, check_budget
+
+
+class TestStartupBenchmark:
+    def test_app_imports_without_deferred_modules(self):
+        report = measure_startup(runs=1)
+
+        assert report["import_ms"] > 0
+        assert report["eager"] == []
+        assert "routes.rule_routes" in report["heaviest"]
+
+    def test_budget_gate(self):
+        report = {"import_ms": 500.0, "eager": []}
+
+        assert check_budget(report, 1000) == []
+        assert check_budget(report, None) == []
+        assert check_budget(report, 100)
+        assert check_budget({"import_ms": 1.0, "eager": ["motor"]}, None)